@@ -1,18 +1,29 @@
 from __future__ import annotations
 
-import uuid
+import copy
+import inspect
 import typing
-
-import dill
-
+import logging
+import importlib
+import itertools
+import functools
+import collections
+
+from . import cache
+from . import metrics
+from . import tracing
+from .engine.edge import codecs
+from .engine.edge.base import AbstractBaseEdge
+from .engine.edge.partition import PartitionedEdge, partition_ids
 from .engine.runners.local import LocalRunner
-from .engine.runners.utils import compatible
+from .engine.runners.utils import compatible, ordered
 from .exceptions import UniqueNodeError, GraphExecutionError
+from .plan import Plan
 
 
 if typing.TYPE_CHECKING:
+    import numpy
     from .engine.runners.base import AbstractRunner
-    from .engine.edge.base import AbstractBaseEdge
     from typing import *
 
 
@@ -22,6 +33,12 @@ T = typing.TypeVar('T')
 
 DEFAULT_RUNNER = LocalRunner()
 
+logger = logging.getLogger(__name__)
+
+# exceptions that end a node without it having failed, so its streams aren't
+# marked as failed
+_INTERRUPTS = (KeyboardInterrupt, GeneratorExit)
+
 
 class _BasePort(object):
 
@@ -30,17 +47,123 @@ class _BasePort(object):
     def __init__(self, id_, type_):
         self.id = id_
         self.type = type_
+        self.options = {}
 
     def __repr__(self):
         return '<{}[{}]>'.format(self.__class__.__name__, self.type)
 
+    def configure(self, **options):
+        """
+        Set keyword arguments passed to the edge created for this port.
+
+        e.g. `node['outflow'].configure(max_size=1000, batch_size=100)`
+        """
+        self.options.update(options)
+        return self
+
 
 class Out(_BasePort, typing.Generic[T]):
 
-    def send(self, data: T) -> None:
+    # every consumer of the port gets every record sent from it
+    BROADCAST = 'broadcast'
+    # consumers of the port split the records sent from it between them,
+    # each record going to exactly one of them
+    PARTITIONED = 'partitioned'
+
+    # explicitly chosen codec name or `Codec`
+    _codec = None
+
+    # how records are shared between the consumers of the port
+    fanout = BROADCAST
+
+    # number of streams the records sent from the port are partitioned
+    # between by key, see `partition`
+    partitions = 1
+
+    @property
+    def ids(self) -> List[str]:
+        """
+        Ids of the streams records sent from the port go to.
+        """
+        return partition_ids(self.id, self.partitions)
+
+    def partition(self, count: int) -> Out:
+        """
+        Partition the records sent from the port between `count` streams by
+        the key they're sent with, e.g. to scale out a stateful node:
+
+            node.init(inflow=upstream['outflow'].partition(4))
+
+        Consumers of the port get `count` replicas, each consuming one of
+        the streams, so records with the same key always go to the same
+        replica.
+        """
+        if count < 1:
+            raise ValueError('A port needs at least one partition')
+        self.partitions = count
+        return self
+
+    # number of nodes connected to the port, when known
+    consumers = None  # type: Optional[int]
+
+    # number of replicas sending from the port, when known
+    producers = None  # type: Optional[int]
+
+    @property
+    def codec(self) -> codecs.Codec:
+        """
+        Codec used by edges that serialize records sent from this port.
+        """
+        return codecs.get(self._codec, self.type, port=self.id)
+
+    def configure(self, codec=None, fanout=None, **options):
+        """
+        Same as `_BasePort.configure`, optionally overriding the codec chosen
+        from the port's type (see `flo.engine.edge.codecs`) or how records
+        are shared between the port's consumers, either `Out.BROADCAST` (the
+        default) or `Out.PARTITIONED`.
+        """
+        if codec is not None:
+            self._codec = codec
+        if fanout is not None:
+            if fanout not in (self.BROADCAST, self.PARTITIONED):
+                raise ValueError('Unknown fanout {!r}'.format(fanout))
+            self.fanout = fanout
+        return super(Out, self).configure(**options)
+
+    def send(
+            self,
+            data: T,
+            key: Any = None,
+    ) -> Optional[Awaitable[None]]:
+        """
+        Send `data` downstream. Returns an awaitable when the port's edge is
+        asynchronous, e.g. `await outflow.send(data)` in an `async def` node.
+
+        Records sent from a partitioned port need a `key`, which picks the
+        partition they go to: a `str`, `bytes` or `int`, or a tuple of them.
+        See `partition`.
+        """
+        if self.edge is None:
+            raise RuntimeError('No edge')
+        if key is None or self.partitions == 1:
+            return self.edge.push(data)
+        return self.edge.push(data, route=key)
+
+    def send_many(
+            self,
+            items: Iterable[T],
+            key: Optional[Callable[[T], Any]] = None,
+    ) -> Optional[Awaitable[None]]:
+        """
+        Send each of `items` downstream. The records sent from a partitioned
+        port each go to the partition of `key(record)`.
+        """
         if self.edge is None:
             raise RuntimeError('No edge')
-        self.edge.send(data)
+        if key is None or self.partitions == 1:
+            return self.edge.push_many(items)
+        return self.edge.push_many(items, route=key)
 
 
 class In(_BasePort, typing.Iterable, typing.Generic[T]):
@@ -50,12 +173,68 @@ class In(_BasePort, typing.Iterable, typing.Generic[T]):
             return
         yield from self.edge
 
+    def batches(
+            self,
+            max_size: int = 1000,
+            max_wait: float = 0.0,
+            array: bool = False,
+    ) -> Iterator[Union[List[T], numpy.ndarray]]:
+        """
+        Iterate over the records in batches, e.g. to process them with
+        vectorized numpy operations.
+
+        Parameters
+        ----------
+        max_size : int
+            Maximum number of records per batch.
+        max_wait : float
+            Seconds a batch that isn't full waits for more records. By
+            default a batch holds the records already waiting.
+        array : bool
+            Get each batch as a numpy array, for ports of numeric types, e.g.
+            `In[float]`.
+        """
+        if self.edge is None:
+            return
+        if max_size < 1:
+            raise ValueError('A batch needs at least one record')
+        batches = self.edge.pull_batches(max_size, max_wait)
+        if not array:
+            yield from batches
+            return
+
+        import numpy
+
+        if self.type not in (int, float, bool, complex):
+            raise TypeError(
+                'Cannot batch {!r} records as arrays'.format(self.type))
+        dtype = numpy.dtype(self.type)
+        for batch in batches:
+            yield numpy.fromiter(batch, dtype=dtype, count=len(batch))
+
+    async def __aiter__(self) -> T:
+        if self.edge is None:
+            return
+        async for x in self.edge:
+            yield x
+
 
 class Connection(typing.List[_BasePort]):
     def __init__(self, *args):
         super(Connection, self).__init__(args)
 
 
+def _resolve(result):
+    """
+    Run `result` to completion if it's awaitable, e.g. when it came from an
+    asynchronous edge.
+    """
+    if inspect.isawaitable(result):
+        import asyncio
+        return asyncio.run(result)
+    return result
+
+
 def validate_types(left, right):
     # FIXME: improve this...
     if left.type == typing.Any:
@@ -71,6 +250,44 @@ def validate_types(left, right):
     return False
 
 
+def _import(module, name):
+    obj = importlib.import_module(module)
+    for part in name.split('.'):
+        obj = getattr(obj, part)
+    return obj
+
+
+def _dill():
+    """
+    Get the `dill` module, imported on first use.
+    """
+    import dill
+    return dill
+
+
+def _dump_function(fn):
+    """
+    Reference `fn` by its qualified name when it can be imported, otherwise
+    serialize it with dill, e.g. closures and functions defined in __main__.
+    """
+    module = getattr(fn, '__module__', None)
+    name = getattr(fn, '__qualname__', None)
+    if module not in (None, '__main__') and name \
+            and '<locals>' not in name:
+        try:
+            if _import(module, name) is fn:
+                return module, name
+        except (ImportError, AttributeError):
+            pass
+    return _dill().dumps(fn)
+
+
+def _load_function(payload):
+    if isinstance(payload, tuple):
+        return _import(*payload)
+    return _dill().loads(payload)
+
+
 class Node(object):
 
     def __init__(self, fn, name=None):
@@ -91,29 +308,43 @@ class Node(object):
 
         self.initializations = {}
         self._runner = None
+        self._replicas = 1
+        # which of the replicas this is
+        self._index = 0
+        self._instances = []
+        # whether what the node sends is cached, see `flo.cache`
+        self._cached = False
 
     @property
     def name(self):
         return self.id
 
     def __getstate__(self):
+        # The runner is left out so shipping a node doesn't ship the runner's
+        # state with it; whatever runs the node in another process sets its
+        # runner again. Ports and initializations go in one payload, as
+        # downstream nodes share upstream ports.
         return (
             self.id,
-            dill.dumps(self.fn),
-            dill.dumps(self.inports),
-            dill.dumps(self.outports),
-            dill.dumps(self.initializations),
-            dill.dumps(self._runner)
+            _dump_function(self.fn),
+            _dill().dumps(
+                (self.inports, self.outports, self.initializations)),
+            self._replicas,
+            self._index,
+            self._cached,
         )
 
     def __setstate__(self, state):
-        id_, fn, inports, outports, initializations, runner = state
+        id_, fn, ports, replicas, index, cached = state
         self.id = id_
-        self.fn = dill.loads(inports)
-        self.inports = dill.loads(inports)
-        self.outports = dill.loads(outports)
-        self.initializations = dill.loads(initializations)
-        self._runner = dill.loads(runner)
+        self.fn = _load_function(fn)
+        self.inports, self.outports, self.initializations = \
+            _dill().loads(ports)
+        self._runner = None
+        self._replicas = replicas
+        self._index = index
+        self._instances = []
+        self._cached = cached
 
     def __repr__(self):
         # <Node[fn1](fn(foo='bar'))>
@@ -127,11 +358,75 @@ class Node(object):
     def __getitem__(self, item):
         return self.outports[item]
 
-    def get_kwargs(self):
+    def replicas(self, count: int):
+        """
+        Execute `count` copies of the node in parallel.
+
+        The records sent to the node are load balanced between the copies,
+        each going to exactly one of them, and the node's out ports are only
+        done once every copy has finished. This is only useful for nodes that
+        process each record independently of the others.
+        """
+        if count < 1:
+            raise ValueError('A node needs at least one replica')
+        self._replicas = count
+        return self
+
+    def cached(self, enabled: bool = True):
+        """
+        Replay what the node sent the last time it was run on the same
+        inputs rather than running it again, while `flo.cache` is enabled.
+
+        This is only correct for nodes whose records depend on nothing but
+        their code, initializations and the records they receive.
+        """
+        self._cached = enabled
+        return self
+
+    def instances(self) -> List[Node]:
+        """
+        Get the nodes a runner should execute in place of this one; `self`
+        unless it has multiple replicas.
+        """
+        if self._replicas == 1 or self in self._instances:
+            return [self]
+        if len(self._instances) != self._replicas:
+            self._instances = [self._replica(i)
+                               for i in range(self._replicas)]
+        return self._instances
+
+    def _replica(self, index):
+        node = Node.__new__(Node)
+        node.id = self.id
+        node.fn = self.fn
+        node.inports = {k: copy.copy(v) for k, v in self.inports.items()}
+        node.outports = {k: copy.copy(v) for k, v in self.outports.items()}
+        for port in itertools.chain(
+                node.inports.values(), node.outports.values()):
+            port.edge = None
+        node.initializations = self.initializations
+        node._runner = self._runner
+        node._replicas = self._replicas
+        node._index = index
+        node._instances = [node]
+        node._cached = self._cached
+        return node
+
+    def get_kwargs(self, edges=None):
+        """
+        Parameters
+        ----------
+        edges : Optional[Dict[str, AbstractBaseEdge]]
+            Edges to use for some of the ports, by port name, instead of
+            getting them from the runner.
+        """
         kwargs = self.initializations.copy()
+        edges = edges or {}
 
         runner = self.runner or DEFAULT_RUNNER
 
+        group = self.id if self._replicas > 1 else None
+
         # add edges to in/out ports
         for name, port in self.inports.items():
             try:
@@ -139,25 +434,65 @@ class Node(object):
             except KeyError:
                 pass
             else:
+                if name in edges:
+                    port.edge = edges[name]
+                    kwargs[name] = port
+                    continue
                 assert isinstance(connection, Connection)
-                port.edge = runner.edge(*(x.id for x in connection))
+                fanouts = set(x.fanout for x in connection)
+                if len(fanouts) > 1:
+                    raise ValueError(
+                        'In port {!r} mixes broadcast and partitioned '
+                        'connections'.format(port.id))
+                options = dict(group=group, name=port.id)
+                if Out.PARTITIONED in fanouts:
+                    # consumers of these streams are one group
+                    options['group'] = Out.PARTITIONED
+                options.update(port.options)
+                # we only consume our own partition of partitioned ports
+                ids = [x.ids[self._index] if x.partitions > 1 else x.id
+                       for x in connection]
+                port.edge = runner.edge(
+                    *ids,
+                    codecs={i: x.codec for i, x in zip(ids, connection)},
+                    **options)
             kwargs[name] = port
         for name, port in self.outports.items():
-            port.edge = runner.edge(port.id)
+            if name in edges:
+                port.edge = edges[name]
+            else:
+                port.edge = self._edge(runner, port)
             kwargs[name] = port
 
         return kwargs
 
+    def _edge(self, runner, port):
+        """
+        Get the edge records sent from the out `port` go to.
+        """
+        edges = [runner.edge(
+            x, codecs={x: port.codec}, producers=self._replicas,
+            consumers=port.consumers, **port.options) for x in port.ids]
+        if port.partitions == 1:
+            return edges[0]
+        return PartitionedEdge(edges)
+
     def validate(self):
         for k in self.inports:
             if k not in self.initializations:
                 raise ValueError('In port {!r} not initialized'.format(k))
+            for port in self.initializations[k]:
+                if port.partitions not in (1, self._replicas):
+                    raise ValueError(
+                        '{!r} has {} partitions but {!r} has {} '
+                        'replicas'.format(port.id, port.partitions, self.id,
+                                          self._replicas))
 
-    def __call__(self):
+    def _prepare(self, edges=None):
 
         self.validate()
 
-        kwargs = self.get_kwargs()
+        kwargs = self.get_kwargs(edges)
 
         for k in self.inports:
             if k not in kwargs:
@@ -167,23 +502,83 @@ class Node(object):
             if k not in kwargs:
                 raise ValueError('Out port {!r} not initialized'.format(k))
 
-        # FIXME: remove testing code
-        _mod = self.fn.__module__ + '.' if self.fn.__module__ != '__main__' \
-            else ''
-        print('{}{}({})'.format(
-            _mod,
-            self.fn.__name__,
-            ', '.join('{}={!r}'.format(k, v) for k, v in kwargs.items())))
+        tracer = tracing.get()
+        if tracer is not None:
+            tracing.instrument(self, kwargs, tracer)
+
+        registry = metrics.get()
+        if registry is not None:
+            metrics.instrument(self, kwargs, registry)
+
+        return kwargs
+
+    def _call(self, kwargs):
+        store = cache.get()
+        if store is not None and self._cached:
+            return store.call(self, kwargs, self._run)
+        return self._run(kwargs)
+
+    def _run(self, kwargs):
+        registry = metrics.get()
+        if registry is None:
+            return self.fn(**kwargs)
+        with metrics.timed(self, registry):
+            return self.fn(**kwargs)
+
+    async def _call_async(self, kwargs):
+        registry = metrics.get()
+        if registry is None:
+            return await self.fn(**kwargs)
+        with metrics.timed(self, registry):
+            return await self.fn(**kwargs)
+
+    def __call__(self, edges=None):
+
+        kwargs = self._prepare(edges)
 
         outports = [x for x in kwargs.values() if isinstance(x, Out)]
 
         for port in outports:
             port.edge.start()
         try:
-            self.fn(**kwargs)
-        finally:
+            self._call(kwargs)
+        except _INTERRUPTS:
+            raise
+        except BaseException:
             for port in outports:
-                port.edge.stop()
+                try:
+                    port.edge.stop(failed=True)
+                except Exception:
+                    # don't hide the error the node failed with
+                    logger.exception('Error stopping %r', port.id)
+            raise
+        for port in outports:
+            port.edge.stop()
+
+    async def call_async(self):
+        """
+        Coroutine counterpart of calling the node, for `async def` functions
+        whose ports have asynchronous edges.
+        """
+        kwargs = self._prepare()
+
+        outports = [x for x in kwargs.values() if isinstance(x, Out)]
+
+        for port in outports:
+            await port.edge.start()
+        try:
+            await self._call_async(kwargs)
+        except _INTERRUPTS:
+            raise
+        except BaseException:
+            for port in outports:
+                try:
+                    await port.edge.stop(failed=True)
+                except Exception:
+                    logger.exception('Error stopping %r', port.id)
+            raise
+        for port in outports:
+            await port.edge.stop()
 
     def init(self, **kwargs):
         for k, v in kwargs.items():
@@ -212,6 +607,10 @@ class Node(object):
                 else:
                     raise NotImplementedError(
                         'Cannot provide static values to ports.')
+                # a replica for each partition
+                for x in c:
+                    if x.partitions > 1 and self._replicas == 1:
+                        self.replicas(x.partitions)
         return self
 
     def set_runner(
@@ -219,6 +618,9 @@ class Node(object):
             value: AbstractRunner,
     ):
         self._runner = value
+        # replicas made so far
+        for node in self._instances:
+            node._runner = value
         return self
 
     @property
@@ -227,7 +629,125 @@ class Node(object):
 
     @runner.setter
     def runner(self, value):
-        self._runner = value
+        self.set_runner(value)
+
+
+class _Link(AbstractBaseEdge):
+    """
+    Edge handing the records a member of a `FusedNode` sends straight to the
+    next member, which pulls them.
+
+    Each member runs in a greenlet of its own, all on one thread. The next
+    member switches to this one's greenlet to pull a record, and it switches
+    back as it sends one. A member that returns or raises ends the records
+    of the next, as the greenlet it returns to.
+    """
+
+    def __init__(self, id_):
+        super(_Link, self).__init__(id_)
+        # greenlets of the members sending and pulling
+        self.producer = None
+        self.consumer = None
+
+    def send(self, data, key=b'NULL'):
+        self.send_many((data,), key=key)
+
+    def send_many(self, items, key=b'NULL'):
+        if key in (self.INIT, self.DONE):
+            return
+        for data in items:
+            self.consumer.switch((key, data))
+
+    def pull(self):
+        while True:
+            record = self.producer.switch()
+            if record is None:
+                return
+            self.key, data = record
+            yield data
+
+
+class FusedNode(Node):
+    """
+    A linear chain of nodes executed as one. Each node runs in a greenlet on
+    the thread executing the chain, and records are handed from one to the
+    next as they're sent, rather than through the runner's edges.
+
+    See `Graph.optimize`.
+    """
+
+    def __init__(self, nodes):
+        head, tail = nodes[0], nodes[-1]
+        self.nodes = nodes
+        # nodes downstream of the chain know it by its tail
+        self.id = tail.id
+        self.fn = None
+        self.inports = head.inports
+        self.outports = tail.outports
+        self.initializations = head.initializations
+        self._runner = tail.runner
+        self._replicas = 1
+        self._index = 0
+        self._instances = []
+        self._cached = False
+
+    def __getstate__(self):
+        return self.nodes
+
+    def __setstate__(self, state):
+        self.__init__(state)
+
+    def __repr__(self):
+        return '<{}({})>'.format(
+            self.__class__.__name__, ' -> '.join(repr(x) for x in self.nodes))
+
+    def validate(self):
+        for node in self.nodes:
+            node.validate()
+
+    def __call__(self):
+        import greenlet
+
+        links = [_Link(next(iter(x.outports.values())).id)
+                 for x in self.nodes[:-1]]
+
+        glets = []
+        for i, node in enumerate(self.nodes):
+            edges = {}
+            if i > 0:
+                edges[next(iter(node.inports))] = links[i - 1]
+            if i < len(links):
+                edges[next(iter(node.outports))] = links[i]
+            glets.append(greenlet.greenlet(functools.partial(node, edges)))
+        for i, link in enumerate(links):
+            link.producer, link.consumer = glets[i], glets[i + 1]
+            glets[i].parent = glets[i + 1]
+
+        try:
+            glets[-1].switch()
+            # members whose records weren't all pulled still run to the end.
+            # what they send now comes back here, as the rest have finished.
+            for glet in reversed(glets[:-1]):
+                while not glet.dead:
+                    glet.switch()
+        finally:
+            # those started but unfinished, e.g. upstream of a member that
+            # failed, are stopped
+            for glet in glets:
+                if glet:
+                    glet.throw()
+
+    def set_runner(
+            self,
+            value: AbstractRunner,
+    ):
+        for node in self.nodes:
+            node.set_runner(value)
+        return super(FusedNode, self).set_runner(value)
+
+    @Node.runner.setter
+    def runner(self, value):
+        self.set_runner(value)
 
 
 class Graph(object):
@@ -236,10 +756,26 @@ class Graph(object):
             self,
             id_=None,
             default_runner: Optional[AbstractRunner] = None,
+            fuse: bool = False,
     ):
-        self.id = id_ or str(uuid.uuid4())
+        """
+        Parameters
+        ----------
+        id_ : Optional[str]
+        default_runner : Optional[AbstractRunner]
+            Runner of nodes that aren't given one.
+        fuse : bool
+            Execute linear chains of nodes as one. See `optimize`.
+        """
+        if id_ is None:
+            import uuid
+            id_ = str(uuid.uuid4())
+        self.id = id_
         self.nodes = {}
+        self.fuse = fuse
         self._default_runner = default_runner
+        # previously fused chains, by the ids of their nodes
+        self._fused = {}  # type: Dict[Tuple[str, ...], FusedNode]
 
     def __repr__(self):
         return '<{}({!r})>'.format(self.__class__.__name__, self.id)
@@ -259,6 +795,7 @@ class Graph(object):
             self,
             fn: Callable,
             nodeid: Optional[str] = None,
+            replicas: int = 1,
     ):
         if nodeid is None:
             nodeid = self._get_unique_node_name(fn)
@@ -266,20 +803,191 @@ class Graph(object):
             raise UniqueNodeError(
                 '{!r} already exists in the graph'.format(nodeid))
 
-        node = Node(fn, '/'.join((self.id, nodeid)))
+        node = Node(fn, '/'.join((self.id, nodeid))).replicas(replicas)
         self.nodes[nodeid] = node
 
         return node
 
-    def get_runners(self):
+    def _edges(self, node):
+        """
+        Get an edge for each of the out ports of `node`.
+        """
+        runner = node.runner or self._default_runner or DEFAULT_RUNNER
+        return [runner.edge(*x.ids, producers=node._replicas, **x.options)
+                for x in node.outports.values()]
+
+    def _resume(self):
+        """
+        Get the nodes a previous execution completed that don't need to run
+        again, and reset the out ports of the rest so they can be resumed.
+        """
+        byid = {x.id: x for x in self.nodes.values()}
+        finished = set()
+        # nodes downstream of any that run again must also run again, since
+        # they'll be sent more records
+        for node in ordered(list(self.nodes.values())):
+            upstream = set(
+                byid.get(x.id.rsplit('/', 1)[0]) for name in node.inports
+                for x in node.initializations.get(name, ()))
+            edges = self._edges(node)
+            if edges and upstream <= finished \
+                    and all(_resolve(x.done()) for x in edges):
+                finished.add(node)
+            else:
+                for edge in edges:
+                    _resolve(edge.reset())
+        return finished
+
+    def plan(
+            self,
+            costs: Optional[Mapping[str, float]] = None,
+    ) -> Plan:
+        """
+        Analyze the structure of the graph: how its nodes are connected,
+        their topological order and levels, any cycles or in ports connected
+        to nothing, and its critical path.
+
+        Parameters
+        ----------
+        costs : Optional[Mapping[str, float]]
+            Estimated cost of each node, by node id, used to find the
+            critical path. Nodes not in it cost 1.
+
+        Returns
+        -------
+        Plan
+        """
+        return Plan(list(self.nodes.values()), costs=costs)
+
+    def optimize(self) -> List[Node]:
+        """
+        Get the nodes to execute, fusing linear chains of nodes on the same
+        runner into `FusedNode`s.
+
+        A node is fused with the next when its only out port feeds nothing
+        but that node's only in port, which is fed by nothing else, e.g.
+        `init -> log -> sleep`, so edges are only needed where the graph fans
+        in or out or changes runner.
+        Replicated and `async def` nodes, and nodes on runners that aren't
+        `FUSIBLE`, aren't fused. Nothing is fused unless greenlet (the
+        `cooperative` extra) is installed.
+        """
+        default_runner = self._default_runner or DEFAULT_RUNNER
+        nodes = list(self.nodes.values())
+
+        try:
+            import greenlet  # noqa: F401
+        except ImportError:
+            # the nodes of a fused chain each run in a greenlet
+            return nodes
+
+        # connections to each out port and the last node connected to it
+        counts = collections.Counter()
+        consumer = {}
+        for node in nodes:
+            for name in node.inports:
+                for port in node.initializations.get(name, ()):
+                    counts[port.id] += 1
+                    consumer[port.id] = node
+
+        def fusible(node):
+            return node._replicas == 1 \
+                and (node.runner or default_runner).FUSIBLE \
+                and not inspect.iscoroutinefunction(node.fn)
+
+        def successor(node):
+            if not fusible(node) or len(node.outports) != 1:
+                return None
+            port, = node.outports.values()
+            if counts[port.id] != 1:
+                return None
+            child = consumer[port.id]
+            if child is node or not fusible(child) \
+                    or len(child.inports) != 1 \
+                    or len(child.initializations.get(
+                        next(iter(child.inports)), ())) != 1 \
+                    or (child.runner or default_runner) \
+                    is not (node.runner or default_runner):
+                return None
+            return child
+
+        successors = {x: successor(x) for x in nodes}
+        fused = set(x for x in successors.values() if x is not None)
+
+        results = []
+        for node in nodes:
+            if node in fused:
+                continue
+            chain = [node]
+            while successors[chain[-1]] is not None \
+                    and successors[chain[-1]] not in chain:
+                chain.append(successors[chain[-1]])
+            fused.update(chain)
+            results.append(chain[0] if len(chain) == 1 else self._fuse(chain))
+        # a cycle has nowhere to start a chain
+        results.extend(x for x in nodes if x not in fused)
+
+        return results
+
+    def _fuse(self, chain):
+        key = tuple(x.id for x in chain)
+        node = self._fused.get(key)
+        if node is None or node.nodes != chain:
+            node = self._fused[key] = FusedNode(chain)
+        return node
+
+    def get_runners(
+            self,
+            resume: bool = False,
+    ):
 
         results = []
 
         default_runner = self._default_runner or DEFAULT_RUNNER
 
+        # fail now rather than hang until the timeout
+        plan = self.plan()
+        plan.validate()
+        rank = {x: i for i, x in enumerate(plan.schedule())}
+
+        consumers = collections.Counter()
         for node in self.nodes.values():
+            consumers.update(set(
+                x.id for name in node.inports
+                for x in node.initializations.get(name, ())))
+
+        for node in self.nodes.values():
+            runner = node.runner or default_runner
+            for port in node.outports.values():
+                port.producers = node._replicas
+                port.consumers = consumers[port.id]
+                if port.fanout == Out.PARTITIONED:
+                    # they're one group
+                    port.consumers = min(port.consumers, 1)
+                elif port.consumers > 1 and not runner._edge.BROADCAST:
+                    raise ValueError(
+                        '{} cannot broadcast {!r} to its {} consumers, '
+                        'configure it to be partitioned'.format(
+                            runner._edge.__name__, port.id,
+                            port.consumers))
+
+        finished = self._resume() if resume else set()
+
+        nodes = self.optimize() if self.fuse else self.nodes.values()
+
+        for node in sorted(nodes, key=lambda x: min(
+                rank[n] for n in getattr(x, 'nodes', [x]))):
             node.validate()
             runner = node.runner or default_runner
+            members = getattr(node, 'nodes', [node])
+            for x in members:
+                # only executed as part of the fused node
+                if x is not node and x in runner.nodes:
+                    runner.nodes.remove(x)
+            if all(x in finished for x in members):
+                if node in runner.nodes:
+                    runner.nodes.remove(node)
+                continue
             runner.add(node)
             if runner not in results:
                 results.append(runner)
@@ -291,10 +999,29 @@ class Graph(object):
     def submit(
             self,
             timeout: Optional[float] = None,
+            resume: bool = False,
     ):
+        """
+        Execute the graph, blocking until it's done.
+
+        Parameters
+        ----------
+        timeout : Optional[float]
+        resume : bool
+            Pick up where a previous, failed submission left off. Nodes that
+            finished are skipped and the rest resume consuming from their
+            last checkpoint, where their edges support it. Records processed
+            after a checkpoint may be sent downstream again. Otherwise
+            anything left in the graph's streams by a previous submission
+            is deleted first.
+        """
         from concurrent.futures import ThreadPoolExecutor, wait
 
-        runners = self.get_runners()
+        if not resume:
+            # e.g. the `DONE` markers of a failed submission
+            self.cleanup()
+
+        runners = self.get_runners(resume=resume)
 
         executor = ThreadPoolExecutor(len(runners))
         futures = []
@@ -311,6 +1038,11 @@ class Graph(object):
             e = future.exception()
             if e:
                 errors.append(e)
+
+        # keep the streams of a failed graph around to resume it
+        if not errors and not result.not_done:
+            self.cleanup()
+
         if errors:
             raise GraphExecutionError(errors)
 
@@ -318,3 +1050,13 @@ class Graph(object):
             raise TimeoutError('Some nodes were still executing.')
 
         executor.shutdown(wait=False)
+
+    def cleanup(self):
+        """
+        Delete everything the edges of the graph's nodes stored for their
+        streams. Called once a submitted graph has executed successfully, and
+        before it's submitted again without resuming.
+        """
+        for node in self.nodes.values():
+            for edge in self._edges(node):
+                _resolve(edge.delete())
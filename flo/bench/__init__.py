@@ -0,0 +1,8 @@
+"""
+Benchmarks of flo's runners and edges, runnable offline.
+
+    python -m flo.bench --output results.json
+    python -m flo.bench --compare results.json
+
+See `flo.bench.suite`.
+"""
@@ -0,0 +1,603 @@
+"""
+In-process stand-in for a Redis server, so `RedisEdge`s can be benchmarked on
+a machine without Docker or network access.
+
+Only the subset of commands used by the edges is implemented: streams (with
+consumer groups), hashes, counters and a few connection commands. Everything
+is kept in memory of the process that started the server, which processes
+connect to over TCP just like a real server.
+"""
+import time
+import bisect
+import socket
+import threading
+import socketserver
+import collections
+
+from typing import *
+
+
+class CommandError(Exception):
+    """
+    Error replied to the client, e.g. `ERR unknown command`. The first word
+    is the error code.
+    """
+
+
+def _msgid(value) -> Tuple[int, int]:
+    if isinstance(value, tuple):
+        return value
+    ms, _, seq = value.partition(b'-')
+    return int(ms), int(seq) if seq else 0
+
+
+def _bytes(msgid: Tuple[int, int]) -> bytes:
+    return '{}-{}'.format(*msgid).encode()
+
+
+class _Group(object):
+
+    __slots__ = ('last', 'pending')
+
+    def __init__(self, last):
+        self.last = last
+        # consumer of each delivered, unacknowledged entry
+        self.pending = \
+            collections.OrderedDict()  # type: Dict[Tuple[int, int], bytes]
+
+
+class _Stream(object):
+
+    __slots__ = ('ids', 'entries', 'last', 'groups')
+
+    def __init__(self):
+        # entry ids in order, and the fields of each
+        self.ids = []  # type: List[Tuple[int, int]]
+        self.entries = {}  # type: Dict[Tuple[int, int], List[bytes]]
+        self.last = (0, 0)
+        self.groups = {}  # type: Dict[bytes, _Group]
+
+    def add(self, msgid, fields):
+        self.ids.append(msgid)
+        self.entries[msgid] = fields
+        self.last = msgid
+
+    def remove(self, msgid):
+        if self.entries.pop(msgid, None) is None:
+            return False
+        del self.ids[bisect.bisect_left(self.ids, msgid)]
+        return True
+
+    def trim(self, count):
+        """
+        Remove the first `count` entries.
+        """
+        for msgid in self.ids[:count]:
+            del self.entries[msgid]
+        del self.ids[:count]
+        return count
+
+    def after(self, msgid, count=None):
+        """
+        Entries with ids greater than `msgid`.
+        """
+        start = bisect.bisect_right(self.ids, msgid)
+        stop = None if count is None else start + count
+        return [(x, self.entries[x]) for x in self.ids[start:stop]]
+
+
+class Store(object):
+    """
+    The data of a `StreamServer` and its commands.
+    """
+
+    def __init__(self):
+        self.data = {}  # type: Dict[bytes, Any]
+        # notified whenever a stream is added to
+        self.cond = threading.Condition()
+
+    def execute(self, args: List[bytes]):
+        name = args[0].decode().lower()
+        method = getattr(self, 'cmd_' + name, None)
+        if method is None:
+            raise CommandError(
+                'ERR unknown command {!r}'.format(args[0].decode()))
+        with self.cond:
+            return method(*args[1:])
+
+    def _get(self, key, type_):
+        value = self.data.get(key)
+        if value is not None and not isinstance(value, type_):
+            raise CommandError('WRONGTYPE Operation against a key holding '
+                               'the wrong kind of value')
+        return value
+
+    def _stream(self, key, create=False):
+        stream = self._get(key, _Stream)
+        if stream is None and create:
+            stream = self.data[key] = _Stream()
+        return stream
+
+    # connection
+
+    def cmd_ping(self, message=None):
+        return message if message is not None else _Status(b'PONG')
+
+    def cmd_echo(self, message):
+        return message
+
+    def cmd_select(self, db):
+        return _OK
+
+    def cmd_client(self, *args):
+        return _OK
+
+    def cmd_flushall(self, *args):
+        self.data.clear()
+        return _OK
+
+    cmd_flushdb = cmd_flushall
+
+    # keys
+
+    def cmd_del(self, *keys):
+        return sum(self.data.pop(x, None) is not None for x in keys)
+
+    def cmd_exists(self, *keys):
+        return sum(x in self.data for x in keys)
+
+    def cmd_keys(self, pattern):
+        import fnmatch
+        pattern = pattern.decode()
+        return [x for x in self.data
+                if fnmatch.fnmatchcase(x.decode(), pattern)]
+
+    # strings
+
+    def cmd_get(self, key):
+        return self._get(key, bytes)
+
+    def cmd_set(self, key, value, *args):
+        self.data[key] = value
+        return _OK
+
+    def cmd_incrby(self, key, amount):
+        value = int(self._get(key, bytes) or 0) + int(amount)
+        self.data[key] = str(value).encode()
+        return value
+
+    def cmd_incr(self, key):
+        return self.cmd_incrby(key, b'1')
+
+    # hashes
+
+    def _hash(self, key):
+        value = self._get(key, dict)
+        if value is None:
+            value = self.data[key] = {}
+        return value
+
+    def cmd_hget(self, key, field):
+        return (self._get(key, dict) or {}).get(field)
+
+    def cmd_hset(self, key, *pairs):
+        value = self._hash(key)
+        added = 0
+        for field, x in zip(pairs[::2], pairs[1::2]):
+            added += field not in value
+            value[field] = x
+        return added
+
+    def cmd_hincrby(self, key, field, amount):
+        value = self._hash(key)
+        result = int(value.get(field, 0)) + int(amount)
+        value[field] = str(result).encode()
+        return result
+
+    def cmd_hvals(self, key):
+        return list((self._get(key, dict) or {}).values())
+
+    def cmd_hlen(self, key):
+        return len(self._get(key, dict) or {})
+
+    def cmd_hgetall(self, key):
+        return _Map(self._get(key, dict) or {})
+
+    def cmd_hdel(self, key, *fields):
+        value = self._get(key, dict) or {}
+        return sum(value.pop(x, None) is not None for x in fields)
+
+    # streams
+
+    def _trim(self, stream, args):
+        """
+        Apply `MAXLEN|MINID [=|~] threshold [LIMIT count]` to `stream`.
+        """
+        kind = args.pop(0).upper()
+        if args[0] in (b'=', b'~'):
+            args.pop(0)
+        threshold = args.pop(0)
+        if args and args[0].upper() == b'LIMIT':
+            del args[:2]
+        if kind == b'MAXLEN':
+            return stream.trim(max(len(stream.ids) - int(threshold), 0))
+        elif kind == b'MINID':
+            return stream.trim(
+                bisect.bisect_left(stream.ids, _msgid(threshold)))
+        raise CommandError('ERR syntax error')
+
+    def cmd_xadd(self, key, *args):
+        args = list(args)
+        nomkstream = False
+        trim = []
+        while args:
+            option = args[0].upper()
+            if option == b'NOMKSTREAM':
+                nomkstream = True
+                args.pop(0)
+            elif option in (b'MAXLEN', b'MINID'):
+                n = 3 if args[1] in (b'=', b'~') else 2
+                if len(args) > n and args[n].upper() == b'LIMIT':
+                    n += 2
+                trim, args = args[:n], args[n:]
+            else:
+                break
+        msgid, fields = args[0], args[1:]
+        if not fields or len(fields) % 2:
+            raise CommandError('ERR wrong number of arguments for XADD')
+
+        stream = self._stream(key, create=not nomkstream)
+        if stream is None:
+            return None
+        if msgid == b'*':
+            ms = int(time.time() * 1000)
+            if ms > stream.last[0]:
+                msgid = (ms, 0)
+            else:
+                msgid = (stream.last[0], stream.last[1] + 1)
+        else:
+            msgid = _msgid(msgid)
+            if msgid <= stream.last:
+                raise CommandError(
+                    'ERR The ID specified in XADD is equal or smaller than '
+                    'the target stream top item')
+        stream.add(msgid, list(fields))
+        if trim:
+            self._trim(stream, trim)
+        self.cond.notify_all()
+        return _bytes(msgid)
+
+    def cmd_xlen(self, key):
+        stream = self._stream(key)
+        return len(stream.entries) if stream is not None else 0
+
+    def _range(self, key, start, end, args, reverse=False):
+        stream = self._stream(key)
+        if stream is None:
+            return []
+        count = int(args[1]) if len(args) > 1 else None
+
+        def bound(value, default):
+            if value in (b'-', b'+'):
+                return default
+            exclusive = value.startswith(b'(')
+            value = _msgid(value.lstrip(b'('))
+            return value, exclusive
+
+        low, lowx = bound(start, ((0, 0), False))
+        high, highx = bound(end, ((2 ** 64, 0), False))
+        ids = reversed(stream.ids) if reverse else stream.ids
+        results = []
+        for msgid in ids:
+            fields = stream.entries[msgid]
+            if msgid < low or msgid > high \
+                    or (lowx and msgid == low) or (highx and msgid == high):
+                continue
+            results.append([_bytes(msgid), fields])
+            if count is not None and len(results) >= count:
+                break
+        return results
+
+    def cmd_xrange(self, key, start, end, *args):
+        return self._range(key, start, end, args)
+
+    def cmd_xrevrange(self, key, end, start, *args):
+        return self._range(key, start, end, args, reverse=True)
+
+    def cmd_xdel(self, key, *ids):
+        stream = self._stream(key)
+        if stream is None:
+            return 0
+        return sum(stream.remove(_msgid(x)) for x in ids)
+
+    def cmd_xtrim(self, key, *args):
+        stream = self._stream(key)
+        if stream is None:
+            return 0
+        return self._trim(stream, list(args))
+
+    def cmd_xgroup(self, subcommand, key, group, *args):
+        subcommand = subcommand.upper()
+        if subcommand == b'CREATE':
+            msgid, options = args[0], [x.upper() for x in args[1:]]
+            stream = self._stream(key, create=b'MKSTREAM' in options)
+            if stream is None:
+                raise CommandError(
+                    'ERR The XGROUP subcommand requires the key to exist')
+            if group in stream.groups:
+                raise CommandError(
+                    'BUSYGROUP Consumer Group name already exists')
+            last = stream.last if msgid == b'$' else _msgid(msgid)
+            stream.groups[group] = _Group(last)
+            return _OK
+        elif subcommand == b'DESTROY':
+            stream = self._stream(key)
+            return int(stream is not None
+                       and stream.groups.pop(group, None) is not None)
+        raise CommandError('ERR unknown XGROUP subcommand')
+
+    def cmd_xack(self, key, group, *ids):
+        stream = self._stream(key)
+        if stream is None or group not in stream.groups:
+            return 0
+        pending = stream.groups[group].pending
+        return sum(pending.pop(_msgid(x), None) is not None for x in ids)
+
+    def _parse_read(self, args):
+        count = block = None
+        noack = False
+        args = list(args)
+        while args:
+            option = args.pop(0).upper()
+            if option == b'COUNT':
+                count = int(args.pop(0))
+            elif option == b'BLOCK':
+                block = int(args.pop(0))
+            elif option == b'NOACK':
+                noack = True
+            elif option == b'STREAMS':
+                break
+            else:
+                raise CommandError('ERR syntax error')
+        half = len(args) // 2
+        return count, block, noack, list(zip(args[:half], args[half:]))
+
+    def _wait(self, block, read):
+        """
+        Call `read` until it returns something or `block` milliseconds pass.
+        """
+        deadline = None if not block else time.monotonic() + block / 1000.0
+        while True:
+            result = read()
+            if result or block is None:
+                return result or None
+            remaining = None if deadline is None \
+                else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return None
+            self.cond.wait(remaining)
+
+    def cmd_xread(self, *args):
+        count, block, _, streams = self._parse_read(args)
+        # `$` means entries added after the command was received
+        positions = []
+        for key, msgid in streams:
+            if msgid == b'$':
+                stream = self._stream(key)
+                msgid = stream.last if stream is not None else (0, 0)
+            positions.append((key, _msgid(msgid)))
+
+        def read():
+            results = _Map()
+            for key, msgid in positions:
+                stream = self._stream(key)
+                if stream is None:
+                    continue
+                entries = stream.after(msgid, count)
+                if entries:
+                    results[key] = [[_bytes(k), v] for k, v in entries]
+            return results
+
+        return self._wait(block, read)
+
+    def cmd_xreadgroup(self, group_, group, consumer, *args):
+        count, block, noack, streams = self._parse_read(args)
+        for key, _ in streams:
+            stream = self._stream(key)
+            if stream is None or group not in stream.groups:
+                raise CommandError(
+                    'NOGROUP No such key {!r} or consumer group {!r}'.format(
+                        key.decode(), group.decode()))
+
+        def read():
+            results = _Map()
+            for key, msgid in streams:
+                stream = self._stream(key)
+                state = stream.groups[group]
+                if msgid == b'>':
+                    entries = stream.after(state.last, count)
+                    if entries:
+                        state.last = entries[-1][0]
+                    if not noack:
+                        for k, _ in entries:
+                            state.pending[k] = consumer
+                else:
+                    # this consumer's pending entries
+                    start = _msgid(msgid)
+                    entries = [(k, stream.entries.get(k))
+                               for k, c in state.pending.items()
+                               if c == consumer and k > start]
+                    entries = entries[:count] if count else entries
+                if entries:
+                    results[key] = [[_bytes(k), v] for k, v in entries]
+            return results
+
+        return self._wait(block, read)
+
+
+class _Status(bytes):
+    """
+    Simple string reply.
+    """
+
+
+_OK = _Status(b'OK')
+
+
+class _Map(dict):
+    """
+    Map reply, e.g. of `XREAD`. An array of key/value pairs in RESP2, like
+    `HGETALL`'s flattened array.
+    """
+
+
+def _encode(value, resp3=False, array=None) -> bytes:
+    """
+    Encode `value` as a reply.
+
+    Parameters
+    ----------
+    value : Any
+    resp3 : bool
+        Whether the client speaks RESP3 rather than RESP2.
+    array : Optional[bool]
+        Whether `value` is a null array rather than a null bulk string.
+    """
+    if value is None:
+        if resp3:
+            return b'_\r\n'
+        return b'*-1\r\n' if array else b'$-1\r\n'
+    if isinstance(value, _Status):
+        return b'+' + value + b'\r\n'
+    if isinstance(value, CommandError):
+        return '-{}\r\n'.format(value).encode()
+    if isinstance(value, bool):
+        value = int(value)
+    if isinstance(value, int):
+        return ':{}\r\n'.format(value).encode()
+    if isinstance(value, str):
+        value = value.encode()
+    if isinstance(value, bytes):
+        return b'$' + str(len(value)).encode() + b'\r\n' + value + b'\r\n'
+    if isinstance(value, _Map):
+        if resp3:
+            return b'%' + str(len(value)).encode() + b'\r\n' + b''.join(
+                _encode(x, resp3) for item in value.items() for x in item)
+        # `XREAD` replies with pairs, `HGETALL` with a flat array
+        pairs = [list(x) for x in value.items()]
+        if pairs and isinstance(pairs[0][1], bytes):
+            pairs = [x for pair in pairs for x in pair]
+        value = pairs
+    return b'*' + str(len(value)).encode() + b'\r\n' + b''.join(
+        _encode(x, resp3) for x in value)
+
+
+class _Handler(socketserver.StreamRequestHandler):
+
+    def _command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b'*'):
+            # inline command
+            return line.split()
+        args = []
+        for _ in range(int(line[1:])):
+            size = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(size + 2)[:-2])
+        return args
+
+    def _hello(self, version=None, *args):
+        if version is not None:
+            if version not in (b'2', b'3'):
+                raise CommandError(
+                    'NOPROTO unsupported protocol version')
+            self.resp3 = version == b'3'
+        return _Map([
+            (b'server', b'redis'),
+            (b'version', b'7.0.0'),
+            (b'proto', 3 if self.resp3 else 2),
+            (b'id', id(self)),
+            (b'mode', b'standalone'),
+            (b'role', b'master'),
+            (b'modules', []),
+        ])
+
+    def handle(self):
+        store = self.server.store
+        self.resp3 = False
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        while True:
+            try:
+                args = self._command()
+            except (ConnectionError, ValueError):
+                return
+            if args is None:
+                return
+            if not args:
+                continue
+            try:
+                if args[0].lower() == b'hello':
+                    reply = self._hello(*args[1:])
+                else:
+                    reply = store.execute(args)
+            except CommandError as e:
+                reply = e
+            except (TypeError, IndexError, ValueError):
+                reply = CommandError(
+                    'ERR wrong arguments for {!r} command'.format(
+                        args[0].decode()))
+            # a blocking read that timed out replies with a null array
+            data = _encode(reply, self.resp3, array=args[0].lower() in (
+                b'xread', b'xreadgroup'))
+            try:
+                self.wfile.write(data)
+                self.wfile.flush()
+            except ConnectionError:
+                return
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class StreamServer(object):
+    """
+    Serve a `Store` on a local port from a background thread.
+
+    e.g.
+        with StreamServer() as server:
+            os.environ['FLO_REDIS_URL'] = server.url
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0):
+        self._server = _Server((host, port), _Handler)
+        self._server.store = Store()
+        self._thread = None  # type: Optional[threading.Thread]
+
+    @property
+    def url(self) -> str:
+        """
+        Address of the server in the form of `FLO_REDIS_URL`.
+        """
+        return '{}:{}/0'.format(*self._server.server_address)
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
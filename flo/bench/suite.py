@@ -0,0 +1,419 @@
+"""
+Benchmarks of every runner and edge combination on a few graph topologies.
+
+Each case executes in its own process and measures:
+
+- `records_per_sec`: records delivered to the sinks per second of
+  `Graph.submit`.
+- `latency_p50`/`latency_p99`: seconds between a source sending a record and
+  a sink receiving it.
+- `max_rss_kb`: peak resident memory of the case's process and any processes
+  it started.
+
+Unless given the url of a real server, `RedisEdge`s use an in-process
+`StreamServer`, so the benchmarks run without Docker or network access.
+"""
+import os
+import json
+import time
+import platform
+import resource
+import threading
+import contextlib
+import multiprocessing
+
+import flo
+import flo.api
+from flo.engine.runners.local import LocalRunner
+from flo.engine.runners.multiproc import SubProcessRunner, ProcessPoolRunner
+from flo.engine.edge.local import InMemoryEdge
+from flo.engine.edge.redis import RedisEdge
+from flo.engine.edge.shm import SharedMemoryEdge
+from flo.engine.edge.segment import SegmentEdge
+
+from .server import StreamServer
+
+from typing import *
+
+
+SUPPORTED = [
+    (LocalRunner, InMemoryEdge),
+    (LocalRunner, RedisEdge),
+    (LocalRunner, SharedMemoryEdge),
+    (LocalRunner, SegmentEdge),
+    (SubProcessRunner, RedisEdge),
+    (SubProcessRunner, SharedMemoryEdge),
+    (SubProcessRunner, SegmentEdge),
+    (ProcessPoolRunner, RedisEdge),
+    (ProcessPoolRunner, SharedMemoryEdge),
+    (ProcessPoolRunner, SegmentEdge),
+]  # type: List[Tuple[Type, Type]]
+
+try:
+    from flo.engine.runners.cooperative import CooperativeRunner, \
+        CooperativeEdge
+    SUPPORTED.append((CooperativeRunner, CooperativeEdge))
+except ImportError:
+    pass
+
+try:
+    from flo.engine.runners.gevent import GeventRunner, GeventEdge
+    SUPPORTED.append((GeventRunner, GeventEdge))
+except ImportError:
+    pass
+
+
+# seconds a case may take before it's considered failed
+TIMEOUT = 300
+
+
+def _name(runner, edge):
+    return '{}({})'.format(runner.__name__, edge.__name__)
+
+
+def source(count: int, outflow: flo.api.Out[float]):
+    for _ in range(count):
+        outflow.send(time.monotonic())
+
+
+def relay(inflow: flo.api.In[float], outflow: flo.api.Out[float]):
+    for x in inflow:
+        outflow.send(x)
+
+
+def _sink(results):
+
+    def sink(inflow: flo.api.In[float]):
+        latencies = [time.monotonic() - x for x in inflow]
+        results.put(latencies)
+
+    return sink
+
+
+def chain(graph, records, results, length=4):
+    """
+    A source feeding a sink through `length` relays.
+    """
+    node = graph.add(source).init(count=records)
+    for _ in range(length):
+        node = graph.add(relay).init(inflow=node['outflow'])
+    graph.add(_sink(results), 'sink').init(inflow=node['outflow'])
+    return 1
+
+
+def fan_out(graph, records, results, width=8):
+    """
+    A source sending every record to each of `width` sinks.
+    """
+    node = graph.add(source).init(count=records)
+    for i in range(width):
+        graph.add(_sink(results), 'sink{}'.format(i)).init(
+            inflow=node['outflow'])
+    return width
+
+
+def fan_in(graph, records, results, width=8):
+    """
+    `width` sources sending their share of the records to one sink.
+    """
+    nodes = [graph.add(source).init(count=records // width)
+             for _ in range(width)]
+    graph.add(_sink(results), 'sink').init(
+        inflow=[x['outflow'] for x in nodes])
+    return 1
+
+
+TOPOLOGIES = {
+    'chain': chain,
+    'fan_out': fan_out,
+    'fan_in': fan_in,
+    # many small graphs submitted one after another
+    'many_graphs': None,
+}
+
+# number of graphs submitted by `many_graphs`
+GRAPHS = 20
+
+
+def _percentile(values, q):
+    if not values:
+        return None
+    return values[min(int(len(values) * q), len(values) - 1)]
+
+
+def _execute(topology, runner_cls, edge_cls, records, timeout, conn):
+    """
+    Run a single case and send its result, or error, to `conn`.
+    """
+    try:
+        result = _measure(topology, runner_cls, edge_cls, records, timeout)
+    except Exception as e:
+        result = {'error': '{}: {}'.format(e.__class__.__name__, e)}
+    conn.send(result)
+
+
+def _measure(topology, runner_cls, edge_cls, records, timeout):
+    # a proxy, so it can be sent to the workers of a `ProcessPoolRunner`
+    manager = multiprocessing.Manager()
+    results = manager.Queue()
+    runner = runner_cls(edge=edge_cls)
+    try:
+        if topology == 'many_graphs':
+            graphs = []
+            for _ in range(GRAPHS):
+                graph = flo.api.Graph(default_runner=runner)
+                expected = chain(graph, records // GRAPHS, results, length=0)
+                graphs.append(graph)
+            expected *= GRAPHS
+        else:
+            graphs = [flo.api.Graph(default_runner=runner)]
+            expected = TOPOLOGIES[topology](graphs[0], records, results)
+
+        if isinstance(runner, ProcessPoolRunner):
+            # every node streams concurrently, so each needs its own worker
+            runner.workers = max(
+                runner.workers, max(len(x.nodes) for x in graphs))
+
+        # read the results while the graphs execute, so sinks in other
+        # processes don't block flushing them to a full pipe
+        latencies = []
+        reader = threading.Thread(target=lambda: [
+            latencies.extend(results.get(timeout=timeout))
+            for _ in range(expected)])
+        reader.start()
+
+        started = time.perf_counter()
+        for graph in graphs:
+            # runners execute every node they've been given
+            runner.nodes = []
+            graph.submit(timeout=timeout)
+        elapsed = time.perf_counter() - started
+
+        reader.join()
+        latencies.sort()
+    finally:
+        runner.shutdown()
+        manager.shutdown()
+
+    rss = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+              resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return {
+        'records': len(latencies),
+        'seconds': elapsed,
+        'records_per_sec': len(latencies) / elapsed if elapsed else None,
+        'latency_p50': _percentile(latencies, 0.5),
+        'latency_p99': _percentile(latencies, 0.99),
+        'max_rss_kb': rss,
+    }
+
+
+def run_case(
+        topology: str,
+        runner: Type,
+        edge: Type,
+        records: int,
+        timeout: float = TIMEOUT,
+) -> Dict[str, Any]:
+    """
+    Benchmark a single combination in a new process.
+    """
+    result = {
+        'topology': topology,
+        'runner': runner.__name__,
+        'edge': edge.__name__,
+        'name': '{}:{}'.format(topology, _name(runner, edge)),
+    }
+    ctx = multiprocessing.get_context('fork')
+    parent, child = ctx.Pipe(duplex=False)
+    proc = ctx.Process(
+        target=_execute,
+        args=(topology, runner, edge, records, timeout, child))
+    proc.start()
+    child.close()
+    try:
+        if not parent.poll(timeout):
+            raise TimeoutError('Timed out after {}s'.format(timeout))
+        result.update(parent.recv())
+    except (EOFError, TimeoutError) as e:
+        result['error'] = str(e) or 'exited with {}'.format(proc.exitcode)
+    finally:
+        if proc.is_alive():
+            proc.terminate()
+        proc.join()
+    return result
+
+
+@contextlib.contextmanager
+def _redis(url=None):
+    """
+    Point `RedisEdge`s at `url`, or at a new `StreamServer`.
+    """
+    previous = os.environ.get('FLO_REDIS_URL')
+    server = None
+    if url is None:
+        server = StreamServer().start()
+        url = server.url
+    os.environ['FLO_REDIS_URL'] = url
+    try:
+        yield url
+    finally:
+        if previous is None:
+            os.environ.pop('FLO_REDIS_URL', None)
+        else:
+            os.environ['FLO_REDIS_URL'] = previous
+        if server is not None:
+            server.stop()
+
+
+def run(
+        records: int = 10000,
+        topologies: Optional[Iterable[str]] = None,
+        runners: Optional[Iterable[str]] = None,
+        redis_url: Optional[str] = None,
+        timeout: float = TIMEOUT,
+        log: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Run the benchmarks.
+
+    Parameters
+    ----------
+    records : int
+        Number of records sent by the sources of each case.
+    topologies : Optional[Iterable[str]]
+        Names of the `TOPOLOGIES` to run, by default all of them.
+    runners : Optional[Iterable[str]]
+        Runner and edge combinations to run, e.g. 'LocalRunner(RedisEdge)',
+        by default all of `SUPPORTED`.
+    redis_url : Optional[str]
+        Server for `RedisEdge`s, by default an in-process `StreamServer`.
+    timeout : float
+        Seconds each case may take before it's considered failed.
+    log : Optional[Callable[[Dict[str, Any]], None]]
+        Called with the result of each case once it's done.
+
+    Returns
+    -------
+    Dict[str, Any]
+        Details of the environment and the result of each case, all of which
+        can be serialized as JSON.
+    """
+    topologies = list(topologies or TOPOLOGIES)
+    unknown = set(topologies) - set(TOPOLOGIES)
+    if unknown:
+        raise ValueError('Unknown topologies: {}'.format(sorted(unknown)))
+
+    combinations = SUPPORTED
+    if runners is not None:
+        runners = set(runners)
+        combinations = [x for x in SUPPORTED if _name(*x) in runners]
+        unknown = runners - set(_name(*x) for x in SUPPORTED)
+        if unknown:
+            raise ValueError('Unknown runners: {}'.format(sorted(unknown)))
+
+    results = []
+    with _redis(redis_url):
+        for topology in topologies:
+            for runner, edge in combinations:
+                if topology == 'fan_out' and not edge.BROADCAST:
+                    # its consumers would compete for the records
+                    continue
+                result = run_case(topology, runner, edge, records, timeout)
+                results.append(result)
+                if log is not None:
+                    log(result)
+
+    return {
+        'version': flo.__version__,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'time': time.time(),
+        'records': records,
+        'results': results,
+    }
+
+
+def compare(
+        current: Dict[str, Any],
+        baseline: Dict[str, Any],
+        threshold: float = 0.1,
+) -> List[str]:
+    """
+    Get the cases of `current` whose throughput is more than `threshold`
+    (a fraction) lower than in `baseline`, or that failed.
+    """
+    previous = {x['name']: x for x in baseline['results']}
+    regressions = []
+    for result in current['results']:
+        before = previous.get(result['name'])
+        if before is None or before.get('error'):
+            continue
+        if result.get('error'):
+            regressions.append(
+                '{}: {}'.format(result['name'], result['error']))
+            continue
+        ratio = result['records_per_sec'] / before['records_per_sec']
+        if ratio < 1 - threshold:
+            regressions.append('{}: {:.0f} records/sec, was {:.0f} ({:+.0%})'
+                               .format(result['name'],
+                                       result['records_per_sec'],
+                                       before['records_per_sec'], ratio - 1))
+    return regressions
+
+
+def _format(result):
+    if result.get('error'):
+        return '{:<45} ERROR {}'.format(result['name'], result['error'])
+    return '{:<45} {:>10.0f} rec/s  p50 {:>8.2f}ms  p99 {:>8.2f}ms  ' \
+           '{:>8.1f}MB'.format(
+               result['name'], result['records_per_sec'],
+               result['latency_p50'] * 1000, result['latency_p99'] * 1000,
+               result['max_rss_kb'] / 1024.0)
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog='python -m flo.bench', description=__doc__.strip(),
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--records', type=int, default=10000,
+                        help='records sent by the sources of each case')
+    parser.add_argument('--topology', action='append',
+                        choices=sorted(TOPOLOGIES),
+                        help='topology to run, may be repeated')
+    parser.add_argument('--runner', action='append',
+                        choices=[_name(*x) for x in SUPPORTED],
+                        help='runner and edge to run, may be repeated')
+    parser.add_argument('--redis-url',
+                        help='use this Redis server instead of a stand-in')
+    parser.add_argument('--timeout', type=float, default=TIMEOUT,
+                        help='seconds each case may take')
+    parser.add_argument('--output', '-o',
+                        help='write the results as JSON to this file')
+    parser.add_argument('--compare',
+                        help='JSON results of a previous run to compare to')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='fraction of throughput lost that counts as a '
+                             'regression')
+    args = parser.parse_args(argv)
+
+    results = run(
+        records=args.records, topologies=args.topology, runners=args.runner,
+        redis_url=args.redis_url, timeout=args.timeout,
+        log=lambda x: print(_format(x), flush=True))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for line in regressions:
+            print('REGRESSION', line)
+        if regressions:
+            return 1
+
+    return 0 if not any(x.get('error') for x in results['results']) else 1
@@ -0,0 +1,441 @@
+"""
+Content-addressed cache of the records nodes send, replayed in place of
+running a node again when its inputs haven't changed, e.g.
+
+    flo.cache.enable('/tmp/flo-cache', max_size=10 * 2 ** 30)
+    graph.add(expensive).cached()
+    graph.submit()
+
+Only nodes marked `cached` are cached. Before running one, its in ports are
+read to the end and the node is keyed by:
+
+- its name within its graph and the code of its function,
+- the values it was initialized with that aren't connections, and
+- a digest of the records of each in port, regardless of their order when
+  the port has several producers, as it varies from run to run.
+
+When a run with the same key has completed before, the records it sent from
+each out port are sent again and the function isn't called. Otherwise the
+function is called with the records read, and what it sends is stored once
+it returns.
+
+Nodes without in ports are keyed by their code and initializations alone,
+so nodes reading external data shouldn't be cached. A cached node holds its
+in ports' records in memory while it runs, and only starts once every
+upstream node has finished; `async def` nodes aren't cached.
+
+Entries are stored in the `path` directory shared by every process, e.g. of a
+`SubProcessRunner`. Once they total more than `max_size` bytes, those used
+least recently are evicted.
+"""
+import os
+import pickle
+import hashlib
+import inspect
+import tempfile
+
+from .engine.edge import codecs
+from .engine.edge.base import AbstractBaseEdge
+
+from typing import *
+
+
+if TYPE_CHECKING:
+    from .api import Node
+
+
+def _code(fn: Callable) -> bytes:
+    """
+    Digest of the code of `fn`, which changes when it's edited.
+    """
+    h = hashlib.sha256()
+
+    def _update(code):
+        h.update(code.co_code)
+        h.update(repr(code.co_names).encode())
+        for const in code.co_consts:
+            if inspect.iscode(const):
+                _update(const)
+            else:
+                h.update(repr(const).encode())
+
+    fn = inspect.unwrap(fn)
+    _update(fn.__code__)
+    h.update(repr((fn.__defaults__, fn.__kwdefaults__)).encode())
+    return h.digest()
+
+
+def _value(value: Any) -> bytes:
+    try:
+        return pickle.dumps(value, protocol=4)
+    except Exception:
+        # objects without a stable repr are never found in the cache
+        return repr(value).encode()
+
+
+def _name(node: Union['Node', str]) -> str:
+    """
+    Name of `node` (or node id) within its graph, which unlike its id is the
+    same from one graph to the next.
+    """
+    id_ = node if isinstance(node, str) else node.id
+    return id_.rsplit('/', 1)[-1]
+
+
+def _producers(node: 'Node', name: str) -> int:
+    """
+    Number of producers of the in port `name` of `node`.
+    """
+    return sum(x.producers or 1 for x in node.initializations[name])
+
+
+def _digest(
+        records: List[Any],
+        codec: codecs.Codec,
+        ordered: bool = True,
+) -> bytes:
+    """
+    Digest of the `records` of a stream, which doesn't depend on their order
+    unless `ordered`.
+    """
+    def _encode(data):
+        try:
+            return codec.encode(data)
+        except TypeError:
+            # e.g. sent in-process, so never encoded by the port's codec
+            return _value(data)
+
+    if ordered:
+        h = hashlib.sha256()
+        for data in records:
+            encoded = _encode(data)
+            h.update(str(len(encoded)).encode() + b':')
+            h.update(encoded)
+        return h.digest() + str(len(records)).encode()
+    total = 0
+    for data in records:
+        total += int.from_bytes(
+            hashlib.sha256(_encode(data)).digest(), 'big')
+    total %= 1 << 256
+    return total.to_bytes(32, 'big') + str(len(records)).encode()
+
+
+class _Records(AbstractBaseEdge):
+    """
+    Edge of an in port that was read before its node was called.
+    """
+
+    def __init__(self, records):
+        super(_Records, self).__init__()
+        self.records = records
+
+    def pull(self):
+        yield from self.records
+
+    def pull_batches(self, max_size, max_wait=0.0):
+        for i in range(0, len(self.records), max_size):
+            yield self.records[i:i + max_size]
+
+
+class _Recorder(object):
+    """
+    Proxy of an out port's edge recording the records sent to it, along with
+    their partitioning key.
+    """
+
+    def __init__(self, edge: AbstractBaseEdge):
+        self.edge = edge
+        self.records = []  # type: List[Tuple[Any, Any]]
+
+    def __repr__(self):
+        return '<{}({!r})>'.format(self.__class__.__name__, self.edge)
+
+    def __getattr__(self, item):
+        return getattr(self.edge, item)
+
+    def _record(self, items, route):
+        if callable(route):
+            self.records.extend((x, route(x)) for x in items)
+        else:
+            self.records.extend((x, route) for x in items)
+
+    def send(self, data, route=None, **kwargs):
+        self._record((data,), route)
+        return self.edge.send(data, **_route(kwargs, route))
+
+    def send_many(self, items, route=None, **kwargs):
+        items = list(items)
+        self._record(items, route)
+        return self.edge.send_many(items, **_route(kwargs, route))
+
+    def push(self, data, route=None):
+        self._record((data,), route)
+        return self.edge.push(data, **_route({}, route))
+
+    def push_many(self, items, route=None):
+        items = list(items)
+        self._record(items, route)
+        return self.edge.push_many(items, **_route({}, route))
+
+
+def _route(kwargs, route):
+    if route is not None:
+        kwargs['route'] = route
+    return kwargs
+
+
+def _replay(edge, records):
+    """
+    Send `records` recorded by a `_Recorder` to `edge` again.
+    """
+    batch = []
+    for data, route in records:
+        if route is None:
+            batch.append(data)
+            continue
+        if batch:
+            edge.push_many(batch)
+            batch = []
+        edge.push(data, route=route)
+    if batch:
+        edge.push_many(batch)
+
+
+class Cache(object):
+    """
+    On-disk store of the records sent by cached nodes.
+    """
+
+    # extension of the files of entries
+    SUFFIX = '.pkl'
+
+    def __init__(
+            self,
+            path: str,
+            max_size: Optional[int] = None,
+    ):
+        """
+        Parameters
+        ----------
+        path : str
+            Directory of the entries.
+        max_size : Optional[int]
+            Bytes the entries may take up before the least recently used are
+            evicted.
+        """
+        self.path = path
+        self.max_size = max_size
+        # lookups by this process
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(path, exist_ok=True)
+
+    def __repr__(self):
+        return '<{}(path={!r}, max_size={!r})>'.format(
+            self.__class__.__name__, self.path, self.max_size)
+
+    def _prefix(self, node: Union['Node', str]) -> str:
+        return hashlib.sha256(_name(node).encode()).hexdigest()[:16]
+
+    def _filename(self, node, key):
+        return os.path.join(
+            self.path, '{}-{}{}'.format(self._prefix(node), key, self.SUFFIX))
+
+    def _entries(self) -> List[Tuple[float, int, str]]:
+        """
+        Last use, size and filename of each entry.
+        """
+        results = []
+        for name in os.listdir(self.path):
+            if not name.endswith(self.SUFFIX):
+                continue
+            filename = os.path.join(self.path, name)
+            try:
+                stat = os.stat(filename)
+            except FileNotFoundError:
+                # evicted by another process
+                continue
+            results.append((stat.st_mtime, stat.st_size, filename))
+        return results
+
+    def size(self) -> int:
+        """
+        Bytes taken up by the entries.
+        """
+        return sum(x[1] for x in self._entries())
+
+    def key(
+            self,
+            node: 'Node',
+            inputs: Dict[str, List[Any]],
+    ) -> str:
+        """
+        Get the key of running `node` on the records of each of its in ports
+        in `inputs`.
+        """
+        h = hashlib.sha256()
+        h.update('{}#{}'.format(_name(node), node._index).encode())
+        h.update(_code(node.fn))
+        for name, value in sorted(node.initializations.items()):
+            if name not in node.inports:
+                h.update(name.encode())
+                h.update(_value(value))
+        for name, records in sorted(inputs.items()):
+            port = node.inports[name]
+            h.update(name.encode())
+            h.update(_digest(records, codecs.get(type_=port.type),
+                             ordered=_producers(node, name) == 1))
+        return h.hexdigest()
+
+    def load(
+            self,
+            node: 'Node',
+            key: str,
+    ) -> Optional[Dict[str, List[Tuple[Any, Any]]]]:
+        """
+        Get the records `node` sent from each of its out ports when it was
+        run with `key`, if stored.
+        """
+        filename = self._filename(node, key)
+        try:
+            with open(filename, 'rb') as f:
+                result = pickle.load(f)
+            # mark it as recently used
+            os.utime(filename)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        return result
+
+    def save(
+            self,
+            node: 'Node',
+            key: str,
+            outputs: Dict[str, List[Tuple[Any, Any]]],
+    ):
+        """
+        Store the records `node` sent from each of its out ports when it was
+        run with `key`. Records that can't be pickled aren't stored.
+        """
+        fd, tmp = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(outputs, f, protocol=pickle.HIGHEST_PROTOCOL)
+            if self.max_size is not None \
+                    and os.path.getsize(tmp) > self.max_size:
+                return
+            # readers never see a partial entry
+            os.replace(tmp, self._filename(node, key))
+        except (pickle.PicklingError, TypeError, AttributeError):
+            return
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        self.evict()
+
+    def evict(self):
+        """
+        Remove the least recently used entries until they fit `max_size`.
+        """
+        if self.max_size is None:
+            return
+        entries = sorted(self._entries())
+        total = sum(x[1] for x in entries)
+        for _, size, filename in entries:
+            if total <= self.max_size:
+                break
+            try:
+                os.remove(filename)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def invalidate(
+            self,
+            node: Optional[Union['Node', str]] = None,
+    ):
+        """
+        Remove the entries of `node` (or node name or id), or every entry.
+        """
+        prefix = '' if node is None else self._prefix(node) + '-'
+        for _, _, filename in self._entries():
+            if os.path.basename(filename).startswith(prefix):
+                try:
+                    os.remove(filename)
+                except FileNotFoundError:
+                    pass
+
+    def call(
+            self,
+            node: 'Node',
+            kwargs: Dict[str, Any],
+            run: Callable[[Dict[str, Any]], Any],
+    ):
+        """
+        Replay what `node` sent when it was last run on the same inputs, or
+        `run` it with its prepared `kwargs` and store what it sends.
+        """
+        inputs = {}
+        for name in node.inports:
+            port = kwargs[name]
+            inputs[name] = list(port)
+            port.edge = _Records(inputs[name])
+
+        key = self.key(node, inputs)
+        outports = {k: kwargs[k] for k in node.outports}
+
+        outputs = self.load(node, key)
+        if outputs is not None:
+            self.hits += 1
+            for name, records in outputs.items():
+                _replay(outports[name].edge, records)
+            return None
+
+        self.misses += 1
+        recorders = {}
+        for name, port in outports.items():
+            port.edge = recorders[name] = _Recorder(port.edge)
+        result = run(kwargs)
+        self.save(node, key, {k: v.records for k, v in recorders.items()})
+        return result
+
+
+_cache = None  # type: Optional[Cache]
+
+
+def enable(
+        path: str,
+        max_size: Optional[int] = None,
+) -> Cache:
+    """
+    Start caching the nodes marked `cached` that are run from now on.
+
+    Parameters
+    ----------
+    path : str
+        Directory of the entries.
+    max_size : Optional[int]
+        Bytes the entries may take up before the least recently used are
+        evicted.
+
+    Returns
+    -------
+    Cache
+    """
+    global _cache
+    _cache = Cache(path, max_size=max_size)
+    return _cache
+
+
+def disable():
+    """
+    Stop caching nodes run from now on.
+    """
+    global _cache
+    _cache = None
+
+
+def get() -> Optional[Cache]:
+    """
+    Get the cache nodes are being cached in, if enabled.
+    """
+    return _cache
@@ -0,0 +1,172 @@
+"""
+Edges for nodes defined with `async def` and run by an `AsyncioRunner`.
+
+Their `start`, `stop`, `send`, `push` and `flush` methods are coroutines and
+they're consumed with `async for`.
+"""
+import asyncio
+import inspect
+import itertools
+import collections
+
+from .local import InMemoryEdge
+
+
+class AsyncEdgeMixin(object):
+    """
+    Asynchronous counterparts of the `AbstractBaseEdge` methods. Must come
+    before the edge class it's mixed into.
+    """
+
+    async def start(self):
+        await self.send(b'NULL', key=self.INIT)
+
+    async def stop(self, failed=False):
+        await self.flush()
+        last = self._release()
+        if inspect.isawaitable(last):
+            last = await last
+        if last:
+            await self.send(self.FAILED if failed else b'NULL', key=self.DONE)
+
+    async def send(self, data, key=b'NULL'):
+        raise NotImplementedError
+
+    async def send_many(self, items, key=b'NULL'):
+        for data in items:
+            await self.send(data, key=key)
+
+    def _flush_lock(self):
+        # created lazily so it belongs to the running loop
+        lock = getattr(self, '_async_batch_lock', None)
+        if lock is None:
+            lock = self._async_batch_lock = asyncio.Lock()
+        return lock
+
+    async def push(self, data, key=b'NULL'):
+        if self.batch_size is None and self.batch_latency is None:
+            await self.send(data, key=key)
+            return
+        self._batch.append((key, data))
+        if self.batch_size is not None and len(self._batch) >= self.batch_size:
+            await self.flush()
+        elif self.batch_latency is not None and self._batch_timer is None:
+            loop = asyncio.get_running_loop()
+            self._batch_timer = loop.call_later(
+                self.batch_latency,
+                lambda: loop.create_task(self.flush()))
+
+    async def push_many(self, items, key=b'NULL'):
+        size = self.batch_size or self.BATCH_SIZE
+        items = iter(items)
+        async with self._flush_lock():
+            await self._flush()
+            while True:
+                batch = list(itertools.islice(items, size))
+                if not batch:
+                    break
+                await self.send_many(batch, key=key)
+
+    async def flush(self):
+        async with self._flush_lock():
+            await self._flush()
+
+    async def _flush(self):
+        if self._batch_timer is not None:
+            self._batch_timer.cancel()
+            self._batch_timer = None
+        batch, self._batch = self._batch, []
+        for key, records in itertools.groupby(batch, lambda x: x[0]):
+            await self.send_many([x[1] for x in records], key=key)
+
+    def __aiter__(self):
+        return self.pull()
+
+
+class _AsyncWaiter(object):
+    """
+    `InMemoryEdge` waiter for a coroutine. It may be notified from any
+    thread.
+    """
+
+    def __init__(self):
+        self.loop = asyncio.get_running_loop()
+        self.event = asyncio.Event()
+        self.notified = False
+
+    def notify(self):
+        if not self.notified:
+            self.notified = True
+            self.loop.call_soon_threadsafe(self.event.set)
+
+    async def wait(self):
+        await self.event.wait()
+        self.event.clear()
+
+
+class AsyncInMemoryEdge(AsyncEdgeMixin, InMemoryEdge):
+    """
+    In-memory edge for coroutine nodes. It shares its streams with
+    `InMemoryEdge`, so nodes on an `AsyncioRunner` can be connected to nodes
+    on a `LocalRunner`.
+    """
+
+    async def send(self, data, key=b'NULL'):
+        await self.send_many((data,), key=key)
+
+    async def send_many(self, items, key=b'NULL'):
+        if len(self.ids) > 1:
+            items = list(items)
+        throttle = self.max_size is not None \
+            and key not in (self.INIT, self.DONE)
+        waiter = None
+        for id_ in self.ids:
+            for data in items:
+                while True:
+                    with self._lock:
+                        stream = self._stream(id_)
+                        if self.consumers:
+                            stream.consumers = self.consumers
+                        if not throttle \
+                                or len(stream.records) < self.max_size:
+                            stream.records.append((key, data))
+                            self._notify(stream.readers)
+                            break
+                        if waiter is None:
+                            waiter = _AsyncWaiter()
+                        waiter.notified = False
+                        stream.writers.add(waiter)
+                    try:
+                        await waiter.wait()
+                    finally:
+                        with self._lock:
+                            stream.writers.discard(waiter)
+
+    async def pull(self):
+        waiter = _AsyncWaiter()
+        active = collections.deque(self.ids)
+        pending = {}
+
+        while active:
+            streams = None
+            with self._lock:
+                waiter.notified = False
+                # the record we last yielded has been processed
+                self._commit(pending)
+                found, data = self._next(active, pending)
+                if not found and active:
+                    streams = [self._stream(x) for x in active]
+                    for stream in streams:
+                        stream.readers.add(waiter)
+            if found:
+                yield data
+            elif streams:
+                # wait until one of our streams receives something
+                try:
+                    await waiter.wait()
+                finally:
+                    with self._lock:
+                        for stream in streams:
+                            stream.readers.discard(waiter)
+        with self._lock:
+            self._commit(pending)
@@ -1,24 +1,222 @@
+import time
+import itertools
+import threading
+
+from . import codecs
+
+from typing import *
+
 
 class AbstractBaseEdge(object):
 
     INIT = b'<INIT>'
     DONE = b'<DONE>'
 
-    def __init__(self, *ids):
+    # data of the `DONE` marker sent by a producer that failed
+    FAILED = b'<FAILED>'
+
+    # number of records per `send_many` call when no `batch_size` is set
+    BATCH_SIZE = 1000
+
+    # whether consumers outside a `group` each get every record of a stream
+    BROADCAST = True
+
+    # key of the last record pulled. Records sent with any key other than
+    # the default pass it on to their consumers, e.g. `flo.tracing` contexts.
+    key = b'NULL'
+
+    def __init__(self, *ids, max_size=None, batch_size=None,
+                 batch_latency=None, codecs=None, group=None, producers=1,
+                 consumers=None, name=None):
+        """
+        Parameters
+        ----------
+        ids : *str
+            Ids of the streams this edge sends to or pulls from.
+        max_size : Optional[int]
+            High-water mark for the number of records waiting to be consumed
+            from each stream. Once reached, `send` blocks until the consumers
+            catch up. Note that a stream nobody consumes will block forever
+            once it fills up.
+        batch_size : Optional[int]
+            Buffer records given to `push` and send them with `send_many` once
+            this many have accumulated.
+        batch_latency : Optional[float]
+            Maximum number of seconds a record given to `push` may wait in the
+            buffer before it's sent.
+        codecs : Optional[Dict[str, Codec]]
+            Codec used to encode the records of each stream. Only used by
+            edges that serialize records.
+        group : Optional[str]
+            Consumers pulling with the same group split the records between
+            them, each record going to exactly one of them.
+        producers : int
+            Number of edges sending to our streams, e.g. replicas of a node.
+            Only the last of them to stop sends `DONE`.
+        consumers : Optional[int]
+            Number of consumers (or groups of them) of our streams, when
+            known. Edges that keep records after they're read use it to
+            discard those every consumer has read.
+        name : Optional[str]
+            Name of the consumer pulling with this edge that stays the same
+            between executions, e.g. its in port's id. Edges with durable
+            streams use it to resume from where the consumer left off.
+        """
         self.ids = ids
+        self.codecs = codecs or {}
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.batch_latency = batch_latency
+        self.group = group
+        self.producers = producers
+        self.consumers = consumers
+        self.name = name
+
+        self._batch = []
+        self._batch_lock = threading.RLock()
+        self._batch_timer = None  # type: threading.Timer
 
     def start(self):
         self.send(b'NULL', key=self.INIT)
 
-    def stop(self):
-        self.send(b'NULL', key=self.DONE)
+    def stop(self, failed=False):
+        """
+        Send anything buffered and, once every producer has stopped, mark
+        the end of our streams. Streams ended by a `failed` producer are not
+        considered `done`.
+        """
+        self.flush()
+        if self._release():
+            self.send(self.FAILED if failed else b'NULL', key=self.DONE)
+
+    def _release(self):
+        """
+        Record that one of the `producers` of our streams has finished.
+
+        Returns
+        -------
+        bool
+            Whether it was the last one, and so whether to send `DONE`.
+        """
+        if self.producers > 1:
+            raise NotImplementedError(
+                '{} does not support multiple producers'.format(
+                    self.__class__.__name__))
+        return True
 
     def send(self, data, key=b'NULL'):
         raise NotImplementedError
 
+    def send_many(self, items, key=b'NULL'):
+        """
+        Send each of `items`. Subclasses should override this when they're
+        able to send a batch of records cheaper than one at a time.
+        """
+        for data in items:
+            self.send(data, key=key)
+
+    def push(self, data, key=b'NULL'):
+        """
+        Send `data`, buffering it first if batching is enabled.
+        """
+        if self.batch_size is None and self.batch_latency is None:
+            self.send(data, key=key)
+            return
+        with self._batch_lock:
+            self._batch.append((key, data))
+            if self.batch_size is not None \
+                    and len(self._batch) >= self.batch_size:
+                self.flush()
+            elif self.batch_latency is not None and self._batch_timer is None:
+                self._batch_timer = threading.Timer(
+                    self.batch_latency, self.flush)
+                self._batch_timer.daemon = True
+                self._batch_timer.start()
+
+    def push_many(self, items, key=b'NULL'):
+        """
+        Send all of `items` in batches, after anything already buffered.
+        """
+        size = self.batch_size or self.BATCH_SIZE
+        items = iter(items)
+        with self._batch_lock:
+            self.flush()
+            while True:
+                batch = list(itertools.islice(items, size))
+                if not batch:
+                    break
+                self.send_many(batch, key=key)
+
+    def flush(self):
+        """
+        Send any records buffered by `push`.
+        """
+        with self._batch_lock:
+            if self._batch_timer is not None:
+                self._batch_timer.cancel()
+                self._batch_timer = None
+            batch, self._batch = self._batch, []
+            # records pushed with the same key in a row are sent together
+            for key, records in itertools.groupby(batch, lambda x: x[0]):
+                self.send_many([x[1] for x in records], key=key)
+
     def pull(self):
         raise NotImplementedError
 
+    def pull_batches(self, max_size, max_wait=0.0):
+        """
+        Pull records in lists of up to `max_size`. Each holds the records
+        already waiting when it's started, topped up with any that arrive
+        within `max_wait` seconds if it isn't full yet.
+
+        Subclasses should override this when they can tell which records are
+        waiting. Here a batch that isn't full is only yielded once `max_wait`
+        has passed and the `backlog` is empty (or unknown) as a record
+        arrives, or our streams end.
+        """
+        batch = []
+        started = None
+        for data in self.pull():
+            if not batch:
+                started = time.monotonic()
+            batch.append(data)
+            if len(batch) >= max_size or (
+                    time.monotonic() - started >= max_wait
+                    and not self.backlog()):
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def backlog(self) -> Optional[int]:
+        """
+        Number of records waiting to be consumed from our streams, or None
+        when the edge can't tell.
+        """
+        return None
+
+    def done(self):
+        """
+        Whether all of our streams have already been ended by producers that
+        didn't fail, e.g. in a previous execution. False when the edge can't
+        tell.
+        """
+        return False
+
+    def reset(self):
+        """
+        Prepare our streams to be produced to again after a failed
+        execution, keeping the records they hold.
+        """
+        pass
+
+    def delete(self):
+        """
+        Remove everything stored for our streams. Only safe once nothing is
+        sending to or pulling from them.
+        """
+        pass
+
     def __iter__(self):
         yield from self.pull()
 
@@ -27,4 +225,11 @@ class AbstractRemoteEdge(AbstractBaseEdge):
     """
     An edge that can be used across processes.
     """
-    pass
+
+    def _codec(self, id_):
+        """
+        Get the codec used to serialize records of the stream `id_`.
+        """
+        if isinstance(id_, bytes):
+            id_ = id_.decode()
+        return self.codecs.get(id_) or codecs.get()
@@ -0,0 +1,317 @@
+"""
+Codecs used by edges that need to serialize records, e.g. `RedisEdge`.
+
+The codec for a stream is chosen by the `Out` port that produces it. Unless
+the port is configured with one explicitly, it's looked up from the port's
+type:
+
+    def fn(outflow: Out[bytes]):  # raw bytes, no pickling
+    def fn(outflow: Out[float]):  # struct packed float64
+    def fn(outflow: Out[Any]):    # pickle
+
+Records a typed port's codec can't encode as they are, e.g. an `int` sent
+from an `Out[float]`, raise a `TypeError` naming the port rather than being
+converted.
+
+    node['outflow'].configure(codec='msgpack')
+    node['outflow'].configure(codec=Compressed('pickle', threshold=4096))
+"""
+import zlib
+import pickle
+import struct
+import typing
+import reprlib
+
+
+class Codec(object):
+    """
+    Converts records to and from bytes.
+    """
+
+    name = None  # type: str
+
+    # id of the port whose records are encoded, named in errors
+    port = None  # type: typing.Optional[str]
+
+    def encode(self, data: typing.Any) -> bytes:
+        raise NotImplementedError
+
+    def _invalid(self, data: typing.Any, reason: str) -> TypeError:
+        """
+        Error for a record `data` that can't be encoded.
+        """
+        source = '' if self.port is None else ' from {!r}'.format(self.port)
+        return TypeError(
+            'Cannot encode {}{} with the {!r} codec: {} (configure the '
+            "port with codec='pickle' to send anything)".format(
+                reprlib.repr(data), source, self.name, reason))
+
+    def decode(self, data: bytes) -> typing.Any:
+        raise NotImplementedError
+
+    def split(
+            self,
+            data: typing.Any,
+            threshold: int,
+    ) -> typing.Tuple[bytes, typing.List[memoryview]]:
+        """
+        Encode `data`, leaving out its buffers of at least `threshold` bytes
+        so edges that support it can send them without copying them into
+        the encoded record. Codecs without such buffers encode everything.
+
+        Returns
+        -------
+        Tuple[bytes, List[memoryview]]
+            The encoded record and the buffers left out of it.
+        """
+        return self.encode(data), []
+
+    def join(
+            self,
+            data: bytes,
+            buffers: typing.List[memoryview],
+    ) -> typing.Any:
+        """
+        Decode a record split by `split`.
+        """
+        if buffers:
+            raise NotImplementedError
+        return self.decode(data)
+
+    def __repr__(self):
+        return '<{}({!r})>'.format(self.__class__.__name__, self.name)
+
+
+class PickleCodec(Codec):
+    """
+    With protocol 5 or later, large buffers of the records, e.g. the data of
+    numpy arrays, can be sent out-of-band (see `Codec.split`).
+    """
+
+    name = 'pickle'
+
+    def __init__(self, protocol=pickle.HIGHEST_PROTOCOL):
+        self.protocol = protocol
+
+    def encode(self, data):
+        return pickle.dumps(data, protocol=self.protocol)
+
+    def decode(self, data):
+        return pickle.loads(data)
+
+    def split(self, data, threshold):
+        if self.protocol < 5:
+            return self.encode(data), []
+
+        buffers = []
+
+        def _callback(buf):
+            try:
+                raw = buf.raw()
+            except BufferError:
+                # not contiguous
+                return True
+            if raw.nbytes < threshold:
+                return True
+            buffers.append(raw)
+            return False
+
+        data = pickle.dumps(data, protocol=self.protocol,
+                            buffer_callback=_callback)
+        return data, buffers
+
+    def join(self, data, buffers):
+        return pickle.loads(data, buffers=buffers)
+
+
+class BytesCodec(Codec):
+    """
+    Passes `bytes` records through untouched.
+    """
+
+    name = 'bytes'
+
+    def encode(self, data):
+        if not isinstance(data, bytes):
+            raise self._invalid(data, 'not bytes')
+        return data
+
+    def decode(self, data):
+        return data
+
+
+class StructCodec(Codec):
+    """
+    Packs single numeric values of `type_` with `struct`.
+
+    Values of other types (including `bool`), or that don't fit the format
+    (e.g. an `int` larger than 64 bits), raise `TypeError` when sent.
+    """
+
+    def __init__(self, name, fmt, type_):
+        self.name = name
+        self.type = type_
+        self._struct = struct.Struct(fmt)
+
+    def encode(self, data):
+        if not isinstance(data, self.type) or isinstance(data, bool):
+            raise self._invalid(
+                data, 'not {}'.format(self.type.__name__))
+        try:
+            return self._struct.pack(data)
+        except struct.error as e:
+            raise self._invalid(data, e)
+
+    def decode(self, data):
+        return self._struct.unpack(data)[0]
+
+
+class MsgpackCodec(Codec):
+    """
+    Requires the optional `msgpack` package.
+    """
+
+    name = 'msgpack'
+
+    def __init__(self):
+        import msgpack
+        self._packb = msgpack.packb
+        self._unpackb = msgpack.unpackb
+
+    def encode(self, data):
+        return self._packb(data, use_bin_type=True)
+
+    def decode(self, data):
+        return self._unpackb(data, raw=False)
+
+
+class Compressed(Codec):
+    """
+    Compresses the output of another codec once it's larger than `threshold`
+    bytes.
+
+    Each encoded record is prefixed with a single byte flagging whether it
+    was compressed.
+
+    Parameters
+    ----------
+    codec : Union[str, Codec]
+    method : str
+        'zlib' or 'lz4'. The latter requires the optional `lz4` package.
+    threshold : int
+    level : Optional[int]
+        Compression level passed to `method`.
+    """
+
+    _RAW = b'\x00'
+    _COMPRESSED = b'\x01'
+
+    def __init__(self, codec, method='zlib', threshold=1024, level=None):
+        self.codec = get(codec)
+        self.name = '{}+{}'.format(self.codec.name, method)
+        self.threshold = threshold
+
+        if method == 'zlib':
+            level = -1 if level is None else level
+            self._compress = lambda x: zlib.compress(x, level)
+            self._decompress = zlib.decompress
+        elif method == 'lz4':
+            import lz4.frame
+            level = 0 if level is None else level
+            self._compress = \
+                lambda x: lz4.frame.compress(x, compression_level=level)
+            self._decompress = lz4.frame.decompress
+        else:
+            raise ValueError('Unknown compression method {!r}'.format(method))
+
+    def encode(self, data):
+        data = self.codec.encode(data)
+        if len(data) > self.threshold:
+            return self._COMPRESSED + self._compress(data)
+        return self._RAW + data
+
+    def decode(self, data):
+        flag, data = data[:1], data[1:]
+        if flag == self._COMPRESSED:
+            data = self._decompress(data)
+        return self.codec.decode(data)
+
+
+DEFAULT = 'pickle'
+
+# codec name -> factory
+_codecs = {
+    'pickle': PickleCodec,
+    'bytes': BytesCodec,
+    'msgpack': MsgpackCodec,
+    'int64': lambda: StructCodec('int64', '<q', int),
+    'float64': lambda: StructCodec('float64', '<d', float),
+}
+
+# port type -> codec name
+_types = {
+    bytes: 'bytes',
+    int: 'int64',
+    float: 'float64',
+}
+
+_cache = {}  # type: typing.Dict[str, Codec]
+
+
+def register(name, factory, *types):
+    """
+    Register a codec `factory` under `name`, optionally making it the
+    default codec for ports of `types`.
+
+    Parameters
+    ----------
+    name : str
+    factory : Callable[[], Codec]
+    types : *type
+    """
+    _codecs[name] = factory
+    _cache.pop(name, None)
+    for type_ in types:
+        _types[type_] = name
+
+
+def get(codec=None, type_=None, port=None) -> Codec:
+    """
+    Get the codec to use for a port.
+
+    Parameters
+    ----------
+    codec : Optional[Union[str, Codec]]
+        Explicitly chosen codec or codec name.
+    type_ : Optional[type]
+        The port's type, used when `codec` isn't given.
+    port : Optional[str]
+        The port's id, named in the errors of a codec chosen by its type.
+
+    Returns
+    -------
+    Codec
+    """
+    if isinstance(codec, Codec):
+        return codec
+    if codec is None:
+        try:
+            codec = _types.get(type_, DEFAULT)
+        except TypeError:
+            # unhashable typing constructs
+            codec = DEFAULT
+        if port is not None and codec != DEFAULT:
+            result = _factory(codec)()
+            result.port = port
+            return result
+    result = _cache.get(codec)
+    if result is None:
+        result = _cache[codec] = _factory(codec)()
+    return result
+
+
+def _factory(codec):
+    try:
+        return _codecs[codec]
+    except KeyError:
+        raise ValueError('Unknown codec {!r}'.format(codec))
@@ -1,32 +1,339 @@
+import time
+import threading
+import itertools
+import collections
+
 from .base import AbstractBaseEdge
 
+from typing import *
+
+
+class _Stream(object):
+    """
+    Buffered records for a single stream id along with the waiters of any
+    consumers currently waiting for it to receive data, and of producers
+    waiting for it to drain.
+
+    Each consumer (or group of them) reads the records through its own
+    cursor. Records are discarded once every consumer has read them.
+    """
+
+    __slots__ = ('records', 'offset', 'cursors', 'consumers', 'readers',
+                 'writers')
+
+    def __init__(self):
+        self.records = collections.deque()
+        # position of the first of `records` in the stream
+        self.offset = 0
+        # position of the next record of each consumer
+        self.cursors = {}  # type: Dict[Optional[str], int]
+        # number of consumers, when known
+        self.consumers = None  # type: Optional[int]
+        self.readers = set()
+        self.writers = set()
+
+    def cursor(self, reader):
+        """
+        Get the position of the next record of `reader`, which starts at the
+        first record still held.
+        """
+        cursor = self.cursors.get(reader)
+        if cursor is None:
+            cursor = self.cursors[reader] = self.offset
+        return cursor
+
+    def advance(self, reader, cursor):
+        """
+        Move the cursor of `reader` to `cursor`, discarding the records every
+        consumer has now read.
+
+        Returns
+        -------
+        bool
+            Whether any records were discarded.
+        """
+        self.cursors[reader] = cursor
+        # a consumer that hasn't read anything yet may still need everything
+        if len(self.cursors) < (self.consumers or 1):
+            return False
+        end = min(self.cursors.values())
+        if end <= self.offset:
+            return False
+        for _ in range(end - self.offset):
+            self.records.popleft()
+        self.offset = end
+        return True
+
 
 class InMemoryEdge(AbstractBaseEdge):
     """
     Edge that can only be used when all runners are being executed by local
     threads.
+
+    Consumers of a stream each get all of its records, from one buffer they
+    share, unless they're in the same `group`. Edges that aren't given a
+    `name` or `group` are all treated as one consumer, so they compete for
+    the records. Producers should be given the number of `consumers` so
+    records aren't discarded before the last of them starts reading.
+
+    Streams outlive the edges using them, so a `resumable` consumer pulling
+    again with the same `name`, e.g. after a failed execution, picks up from
+    the first record it hadn't finished processing.
     """
 
-    _state = {}
+    _state = {}  # type: Dict[str, _Stream]
+    _lock = threading.Lock()
+    # number of producers that have stopped sending to each stream
+    _finished = collections.Counter()
+
+    @classmethod
+    def _stream(cls, id_):
+        # NOTE: `_lock` must be held by the caller.
+        stream = cls._state.get(id_)
+        if stream is None:
+            stream = cls._state[id_] = _Stream()
+        return stream
+
+    def _waiter(self):
+        """
+        Get an object to wait on for a stream to change.
+
+        It must provide `wait()`, which is called with `_lock` held and
+        releases it while waiting, and `notify()`, which is also called with
+        `_lock` held.
+        """
+        return threading.Condition(self._lock)
 
     def send(self, data, key=b'NULL'):
-        for id_ in self.ids:
-            store = self._state.get(id_, [])
-            store.append((key, data))
-            self._state[id_] = store
+        self.send_many((data,), key=key)
+
+    def send_many(self, items, key=b'NULL'):
+        if len(self.ids) > 1:
+            items = list(items)
+        throttle = self.max_size is not None \
+            and key not in (self.INIT, self.DONE)
+        with self._lock:
+            for id_ in self.ids:
+                stream = self._stream(id_)
+                if self.consumers:
+                    stream.consumers = self.consumers
+                for data in items:
+                    if throttle and len(stream.records) >= self.max_size:
+                        self._notify(stream.readers)
+                        waiter = self._waiter()
+                        stream.writers.add(waiter)
+                        try:
+                            while len(stream.records) >= self.max_size:
+                                waiter.wait()
+                        finally:
+                            stream.writers.discard(waiter)
+                    stream.records.append((key, data))
+                self._notify(stream.readers)
+
+    def backlog(self):
+        count = 0
+        with self._lock:
+            for id_ in self.ids:
+                stream = self._state.get(id_)
+                if stream is None:
+                    continue
+                # only what this consumer (or group) has yet to read
+                start = stream.cursors.get(self._reader, stream.offset)
+                unread = itertools.islice(
+                    stream.records, max(start - stream.offset, 0), None)
+                count += sum(1 for key, _ in unread
+                             if key not in (self.INIT, self.DONE))
+        return count
+
+    def done(self):
+        with self._lock:
+            for id_ in self.ids:
+                stream = self._state.get(id_)
+                if stream is None or not stream.records \
+                        or stream.records[-1] != (self.DONE, b'NULL'):
+                    return False
+            return True
+
+    def reset(self):
+        with self._lock:
+            for id_ in self.ids:
+                records = self._stream(id_).records
+                while records and records[-1][0] == self.DONE:
+                    records.pop()
+                self._finished.pop(id_, None)
+
+    def delete(self):
+        with self._lock:
+            for id_ in self.ids:
+                self._state.pop(id_, None)
+                self._finished.pop(id_, None)
+
+    def _release(self):
+        if self.producers == 1:
+            return True
+        with self._lock:
+            last = True
+            for id_ in self.ids:
+                self._finished[id_] += 1
+                last = last and self._finished[id_] >= self.producers
+            return last
+
+    @staticmethod
+    def _notify(waiters):
+        for waiter in waiters:
+            waiter.notify()
+
+    @property
+    def _reader(self):
+        """
+        Key of the cursor we read our streams with.
+        """
+        return self.group or self.name
+
+    @property
+    def resumable(self):
+        """
+        Whether our cursors only pass records once we've processed them.
+        Consumers in a group share their cursors, which move as records are
+        given to any of them.
+        """
+        return self.name is not None and self.group is None
+
+    def _advance(self, id_, cursor, pending):
+        """
+        Move our cursor of the stream `id_` to `cursor`, or leave it to
+        `_commit` when we're `resumable`.
+        """
+        if self.resumable:
+            pending[id_] = cursor
+            return
+        stream = self._stream(id_)
+        if stream.advance(self._reader, cursor):
+            self._notify(stream.writers)
+
+    def _commit(self, pending):
+        """
+        Move our cursors to the `pending` positions, once the records before
+        them have been processed.
+        """
+        for id_, cursor in pending.items():
+            stream = self._stream(id_)
+            if stream.advance(self._reader, cursor):
+                self._notify(stream.writers)
+        pending.clear()
+
+    def _next(self, active, pending):
+        """
+        Get the next available record from the `active` stream ids.
+
+        Streams are visited round robin so a busy upstream can't starve the
+        others. Streams that have reached `DONE` are removed from `active`.
+        The `DONE` marker itself is left in place for any other consumers.
+
+        Parameters
+        ----------
+        active : collections.deque
+        pending : Dict[str, int]
+            Positions our cursors are moved to by `_commit`, see `_advance`.
+
+        Returns
+        -------
+        Tuple[bool, Any]
+            Whether a record was found and the record data.
+        """
+        reader = self._reader
+        remaining = len(active)
+        while remaining:
+            remaining -= 1
+            id_ = active[0]
+            stream = self._stream(id_)
+            records = stream.records
+            cursor = pending.get(id_)
+            if cursor is None:
+                cursor = stream.cursor(reader)
+            while cursor - stream.offset < len(records) \
+                    and records[cursor - stream.offset][0] == self.INIT:
+                cursor += 1
+            if cursor - stream.offset >= len(records):
+                self._advance(id_, cursor, pending)
+                active.rotate(-1)
+                continue
+            key, data = records[cursor - stream.offset]
+            if key == self.DONE:
+                self._advance(id_, cursor, pending)
+                active.popleft()
+                continue
+            self._advance(id_, cursor + 1, pending)
+            active.rotate(-1)
+            self.key = key
+            return True, data
+        return False, None
 
     def pull(self):
-        streams = {k: v for k, v in self._state.items() if k in self.ids}
-        while streams:
-            for id_, stream in streams.copy().items():
-                for k, v in stream:
-                    if k == self.INIT:
-                        continue
-                    elif k == self.DONE:
-                        streams.pop(id_)
+        waiter = self._waiter()
+        active = collections.deque(self.ids)
+        pending = {}
+
+        while active:
+            with self._lock:
+                # the record we last yielded has been processed
+                self._commit(pending)
+                found, data = self._next(active, pending)
+                while not found and active:
+                    # sleep until one of our streams receives something
+                    streams = [self._stream(x) for x in active]
+                    for stream in streams:
+                        stream.readers.add(waiter)
+                    try:
+                        waiter.wait()
+                    finally:
+                        for stream in streams:
+                            stream.readers.discard(waiter)
+                    found, data = self._next(active, pending)
+            if found:
+                yield data
+        with self._lock:
+            self._commit(pending)
+
+    def pull_batches(self, max_size, max_wait=0.0):
+        waiter = self._waiter()
+        active = collections.deque(self.ids)
+        pending = {}
+
+        while active:
+            batch = []
+            deadline = None
+            with self._lock:
+                # the batch we last yielded has been processed
+                self._commit(pending)
+                while active and len(batch) < max_size:
+                    found, data = self._next(active, pending)
+                    if found:
+                        batch.append(data)
                         continue
+                    if not active:
+                        break
+                    if batch:
+                        if deadline is None:
+                            deadline = time.monotonic() + max_wait
+                        timeout = deadline - time.monotonic()
+                        if timeout <= 0:
+                            break
                     else:
-                        stream.remove((k, v))
-                        yield v
-                    # allows for round robin
-                    break
\ No newline at end of file
+                        timeout = None
+                    # sleep until one of our streams receives something
+                    streams = [self._stream(x) for x in active]
+                    for stream in streams:
+                        stream.readers.add(waiter)
+                    try:
+                        if timeout is None:
+                            waiter.wait()
+                        else:
+                            waiter.wait(timeout)
+                    finally:
+                        for stream in streams:
+                            stream.readers.discard(waiter)
+            if batch:
+                yield batch
+        with self._lock:
+            self._commit(pending)
@@ -0,0 +1,147 @@
+import zlib
+import inspect
+import collections
+
+from .base import AbstractBaseEdge
+
+from typing import *
+
+
+def partition_ids(id_: str, partitions: int) -> List[str]:
+    """
+    Ids of the streams the records sent from port `id_` are partitioned
+    between.
+    """
+    if partitions == 1:
+        return [id_]
+    return ['{}#{}'.format(id_, i) for i in range(partitions)]
+
+
+def _stable(route: Any) -> bool:
+    """
+    Whether the key `route` is the same in any process, i.e. a `str`,
+    `bytes` or `int`, or a tuple of them.
+    """
+    if isinstance(route, tuple):
+        return all(_stable(x) for x in route)
+    return isinstance(route, (str, bytes, bytearray, int))
+
+
+def partition(route: Any, partitions: int) -> int:
+    """
+    Index of the partition records sent with the key `route` go to. The same
+    key always goes to the same partition, in any process.
+
+    Raises
+    ------
+    TypeError
+        If `route` isn't a `str`, `bytes` or `int`, or a tuple of them, whose
+        representation could differ between processes (e.g. an object's
+        default repr holds its id, and a set's order depends on hashing).
+    """
+    if isinstance(route, str):
+        route = route.encode()
+    elif not isinstance(route, (bytes, bytearray)):
+        if not _stable(route):
+            raise TypeError(
+                'Cannot partition records by a key of type {!r}: use a str, '
+                'bytes or int, or a tuple of them'.format(type(route)))
+        route = repr(route).encode()
+    return zlib.crc32(route) % partitions
+
+
+def _all(results):
+    """
+    Combine the results of calling a method of each edge, awaiting them in
+    order if the edges are asynchronous.
+    """
+    pending = [x for x in results if inspect.isawaitable(x)]
+    if not pending:
+        return None
+
+    async def _wait():
+        for x in pending:
+            await x
+
+    return _wait()
+
+
+class PartitionedEdge(object):
+    """
+    Producer side of a port whose records are partitioned by key between
+    streams, e.g. so each replica of a stateful node always gets the records
+    with the same keys. See `Out.partition`.
+
+    It has an edge for each partition, and otherwise behaves like an edge of
+    all of them.
+    """
+
+    def __init__(self, edges: Sequence[AbstractBaseEdge]):
+        self.edges = list(edges)
+
+    def __repr__(self):
+        return '<{}({!r})>'.format(self.__class__.__name__, self.ids)
+
+    @property
+    def ids(self):
+        return tuple(id_ for edge in self.edges for id_ in edge.ids)
+
+    def route(self, route: Any) -> AbstractBaseEdge:
+        """
+        Get the edge of the partition of the key `route`.
+        """
+        return self.edges[partition(route, len(self.edges))]
+
+    def start(self):
+        return _all([x.start() for x in self.edges])
+
+    def stop(self, failed=False):
+        return _all([x.stop(failed=failed) for x in self.edges])
+
+    def send(self, data, key=b'NULL', route=None):
+        if route is None:
+            raise ValueError('Records sent to partitions need a key')
+        return self.route(route).send(data, key=key)
+
+    def send_many(self, items, key=b'NULL', route=None):
+        """
+        Send `items` to the partition of the key `route`, or when it's
+        callable, each of them to the partition of `route(item)`.
+        """
+        if route is None:
+            raise ValueError('Records sent to partitions need a key')
+        if not callable(route):
+            return self.route(route).send_many(items, key=key)
+        return _all([self.edges[i].send_many(x, key=key)
+                     for i, x in self._split(items, route).items()])
+
+    def push(self, data, key=b'NULL', route=None):
+        if route is None:
+            raise ValueError('Records sent to partitions need a key')
+        return self.route(route).push(data, key=key)
+
+    def push_many(self, items, key=b'NULL', route=None):
+        """
+        Same as `send_many`, buffered like `AbstractBaseEdge.push_many`.
+        """
+        if route is None:
+            raise ValueError('Records sent to partitions need a key')
+        if not callable(route):
+            return self.route(route).push_many(items, key=key)
+        return _all([self.edges[i].push_many(x, key=key)
+                     for i, x in self._split(items, route).items()])
+
+    def _split(self, items, route):
+        partitions = collections.defaultdict(list)
+        for data in items:
+            partitions[partition(route(data), len(self.edges))].append(data)
+        return partitions
+
+    def flush(self):
+        return _all([x.flush() for x in self.edges])
+
+    def backlog(self) -> Optional[int]:
+        backlogs = [x.backlog() for x in self.edges]
+        if any(x is None for x in backlogs):
+            return None
+        return sum(backlogs)
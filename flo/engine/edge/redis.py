@@ -1,14 +1,30 @@
 import os
 import re
-import pickle
+import time
+import uuid
+import asyncio
+import itertools
 import threading
+import collections
 
 import redis
+import redis.asyncio
 
+from .aio import AsyncEdgeMixin
 from .base import AbstractRemoteEdge
 
+from typing import *
+
 
 class _ClientManager(object):
+    """
+    Redis clients of the current process, one per url, sharing a connection
+    pool.
+
+    Connections are never shared with forked processes, e.g. those of a
+    `SubProcessRunner`, which start over with clients of their own.
+    """
+
     DEFAULT_HOST = 'localhost'
     DEFAULT_PORT = 6379
     DEFAULT_DB = 0
@@ -16,13 +32,30 @@ class _ClientManager(object):
     REDIS_URL_REGEX = re.compile(
         r'(?P<host>[^:]+)(:(?P<port>[0-9]+))?(/(?P<db>[0-9]+))?')
 
-    _lock = threading.Lock()
+    # seconds a successful ping is trusted before a client is checked again
+    HEALTH_CHECK_TTL = 30.0
 
     def __init__(self):
-        self.pools = {}
+        # see `configure`
+        self.max_connections = None  # type: Optional[int]
+        self._reset()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset)
 
-    def get(self, url=None):
+    def _reset(self):
+        # NOTE: the parent's sockets are left alone, they're still in use
+        # there. The lock is replaced as it may have been held when forking.
+        self._lock = threading.Lock()
+        self.pools = {}  # type: Dict[str, redis.ConnectionPool]
+        self.clients = {}  # type: Dict[str, redis.Redis]
+        # time of the last successful ping of each client
+        self._checked = {}  # type: Dict[str, float]
 
+    def parse(self, url=None):
+        """
+        Get the connection keyword arguments for `url`, which defaults to the
+        FLO_REDIS_URL environment variable.
+        """
         if url is None:
             url = os.environ.get('FLO_REDIS_URL')
 
@@ -38,46 +71,653 @@ class _ClientManager(object):
             kwargs['port'] = int(kwargs['port'])
             kwargs['db'] = int(kwargs['db'])
 
-        with self._lock:
-            _key = '{host}:{port}/{db}'.format(**kwargs)
-            pool = self.pools.get(_key)
-            if pool is None:
-                pool = redis.ConnectionPool(**kwargs)
-                self.pools[_key] = pool
+        return kwargs
+
+    def _pool(self, kwargs):
+        max_connections = self.max_connections
+        if max_connections is None:
+            max_connections = os.environ.get('FLO_REDIS_MAX_CONNECTIONS')
+        if max_connections:
+            return redis.BlockingConnectionPool(
+                max_connections=int(max_connections), timeout=None, **kwargs)
+        return redis.ConnectionPool(**kwargs)
+
+    def get(self, url=None):
 
-        client = redis.Redis(connection_pool=pool)
+        kwargs = self.parse(url)
+        _key = '{host}:{port}/{db}'.format(**kwargs)
 
-        if not client.ping():
-            raise RuntimeError('Redis is not available at {!r}'.format(kwargs))
+        with self._lock:
+            client = self.clients.get(_key)
+            if client is None:
+                pool = self.pools[_key] = self._pool(kwargs)
+                client = self.clients[_key] = redis.Redis(
+                    connection_pool=pool)
+
+        now = time.monotonic()
+        if now - self._checked.get(_key, -self.HEALTH_CHECK_TTL) \
+                >= self.HEALTH_CHECK_TTL:
+            if not client.ping():
+                raise RuntimeError(
+                    'Redis is not available at {!r}'.format(kwargs))
+            self._checked[_key] = now
         return client
 
 
 _manager = _ClientManager()
 
 
-def serialize(data):
-    return pickle.dumps(data)
+def configure(max_connections: Optional[int] = None):
+    """
+    Configure the Redis clients of `RedisEdge`s created from now on.
+
+    Parameters
+    ----------
+    max_connections : Optional[int]
+        Maximum connections per url. Edges wait for a connection to be
+        released beyond that rather than opening more, so it should be at
+        least the number of edges reading concurrently. Defaults to the
+        FLO_REDIS_MAX_CONNECTIONS environment variable, or no maximum.
+    """
+    _manager.max_connections = max_connections
+    # clients made so far keep their pools
+    with _manager._lock:
+        _manager.clients.clear()
+        _manager.pools.clear()
+
+
+def _key(id_, name):
+    """
+    Key of some bookkeeping for the stream `id_`:
+
+    readers
+        Hash of the number of records each consumer (or consumer group) has
+        read.
+    positions
+        Hash of the id of the last record each consumer (or consumer group)
+        has read.
+    checkpoints
+        Hash of the id of the last record each named consumer has finished
+        processing.
+    finished
+        Number of producers that have stopped sending to the stream.
+    written
+        Number of entries added to the stream by every producer, kept when
+        it has several.
+    chunks
+        Hash of the chunks of the out-of-band buffers of large records, see
+        `RedisEdge.CHUNK_THRESHOLD`.
+    """
+    if isinstance(id_, bytes):
+        id_ = id_.decode()
+    return '{}:{}'.format(id_, name)
+
 
+def _keys(ids):
+    """
+    Every key stored for the streams `ids`.
+    """
+    for id_ in ids:
+        yield id_
+        for name in ('readers', 'positions', 'checkpoints', 'finished',
+                     'written', 'chunks'):
+            yield _key(id_, name)
 
-def deserialize(data):
-    return pickle.loads(data)
+
+def _msgid(value):
+    """
+    Sortable form of a stream entry id, e.g. b'1526919030474-55'.
+    """
+    ms, _, seq = value.partition(b'-')
+    return int(ms), int(seq or 0)
+
+
+class _Chunked(object):
+    """
+    Buffers of a record sent to the stream `id_` in chunks, see
+    `RedisEdge.CHUNK_THRESHOLD`, from the reference `ref` in its entry.
+
+    They're views of a single buffer each chunk is copied into as it's
+    fetched, so a record takes little more memory than its own size.
+    """
+
+    def __init__(self, id_, ref):
+        token, size, lengths = ref.decode().split(':')
+        self.id = id_
+        self.lengths = [int(x) for x in lengths.split(',')]
+        count = sum(-(-x // int(size)) for x in self.lengths)
+        # fields of the chunks in the stream's `chunks` hash, in order
+        self.fields = ['{}:{}'.format(token, i) for i in range(count)]
+        self.view = memoryview(bytearray(sum(self.lengths)))
+        self.offset = 0
+
+    def add(self, chunk: Optional[bytes]):
+        """
+        Copy in the next chunk, as fetched from the field of `fields`.
+        """
+        if chunk is None:
+            raise RuntimeError(
+                'Chunks of a record of {!r} are missing, they may have been '
+                'discarded (see `max_len`)'.format(self.id))
+        self.view[self.offset:self.offset + len(chunk)] = chunk
+        self.offset += len(chunk)
+
+    def buffers(self) -> List[memoryview]:
+        """
+        Get the buffers, once every chunk has been added.
+        """
+        results = []
+        offset = 0
+        for length in self.lengths:
+            results.append(self.view[offset:offset + length])
+            offset += length
+        return results
 
 
 class RedisEdge(AbstractRemoteEdge):
+    """
+    Edge backed by Redis streams.
+
+    The bookkeeping of our streams, e.g. the lag of their consumers, which
+    records to trim and the entries we add or read, is kept apart from the
+    commands that talk to the server, so `AsyncRedisEdge` shares it.
+    """
 
     lock = threading.RLock()
 
-    def __init__(self, *args, url=None):
-        super(RedisEdge, self).__init__(*args)
-        self.db = _manager.get(url=url)
+    # seconds to wait between lag checks while `send` is blocked
+    THROTTLE_INTERVAL = 0.05
+
+    # default maximum records claimed per read by a consumer in a group, so
+    # one consumer doesn't claim a whole backlog from the rest of the group
+    GROUP_COUNT = 10
+
+    # records sent to a stream between attempts to trim what's been consumed
+    TRIM_INTERVAL = 1000
+
+    # records processed by a named consumer between checkpoints
+    CHECKPOINT_INTERVAL = 100
+
+    # buffers of records at least this large, e.g. the data of numpy arrays
+    # sent with the `pickle` codec, are kept out of the stream entry. They're
+    # stored beside the stream in chunks and reassembled by the consumer,
+    # without copying them into one large message on either side.
+    CHUNK_THRESHOLD = 1 << 16
+
+    # maximum bytes of each chunk, well below Redis' limit on a single value
+    CHUNK_SIZE = 1 << 22
+
+    # field of a stream entry referencing the chunks of its record
+    CHUNKS = b'<CHUNKS>'
+
+    def __init__(self, *args, url=None, max_len=None, **kwargs):
+        """
+        Parameters
+        ----------
+        url : Optional[str]
+            Redis url, e.g. 'localhost:6379/0'. Defaults to the FLO_REDIS_URL
+            environment variable.
+        max_len : Optional[int]
+            Approximate maximum length of each stream, beyond which its oldest
+            records are discarded whether they've been read or not. This
+            bounds the memory used by a stream whose consumers have crashed.
+            The chunks of the records we've sent are discarded with them
+            every `TRIM_INTERVAL` records.
+        """
+        super(RedisEdge, self).__init__(*args, **kwargs)
+        self._url = url
+        self._db = self._client()
+        self.max_len = max_len
+        # records added to each stream by this edge
+        self._sent = collections.Counter()
+        # last known number of records read by the slowest consumer
+        self._consumed = collections.Counter()
+        # records added to each stream since it was last trimmed
+        self._untrimmed = collections.Counter()
+        # id of the last record we've processed from each stream, and the
+        # number processed since they were last saved
+        self._processed = {}
+        self._unsaved = 0
+        # entry id and chunks of the records we've sent in chunks to each
+        # stream, until they're trimmed
+        self._chunks = collections.defaultdict(collections.deque)
+
+    def _client(self):
+        """
+        Get a client of the server at our url, or None to make it once it's
+        first used.
+        """
+        return _manager.get(url=self._url)
+
+    @property
+    def db(self):
+        return self._db
+
+    @property
+    def resumable(self):
+        """
+        Whether we save our progress through the streams. Consumer groups
+        already keep track of what they've been given.
+        """
+        return self.name is not None and self.group is None
+
+    # bookkeeping shared with `AsyncRedisEdge`. Commands are only ever queued
+    # on a pipeline here, which is the same for either client.
+
+    def _queue_restore(self, pipe, ids):
+        """
+        Queue the commands getting our checkpoint of each of the streams
+        `ids` on `pipe`, if we're resumable.
+        """
+        if self.resumable:
+            for id_ in ids:
+                pipe.hget(_key(id_, 'checkpoints'), self.name)
+
+    def _restored(self, ids, saved):
+        """
+        Get the id to start reading each of the streams `ids` after, from
+        the results of `_queue_restore`.
+        """
+        if not self.resumable:
+            return {k: b'0-0' for k in ids}
+        return {k: v or b'0-0' for k, v in zip(ids, saved)}
+
+    def _done(self, id_, msgid):
+        """
+        Record that we've finished processing `msgid` from the stream `id_`.
+
+        Returns
+        -------
+        bool
+            Whether it's time to save a checkpoint.
+        """
+        if not self.resumable:
+            return False
+        self._processed[id_] = msgid
+        self._unsaved += 1
+        return self._unsaved >= self.CHECKPOINT_INTERVAL
+
+    def _queue_checkpoint(self, pipe):
+        """
+        Queue the commands saving our checkpoints on `pipe`.
+        """
+        for id_, msgid in self._processed.items():
+            pipe.hset(_key(id_, 'checkpoints'), self.name, msgid)
+
+    def _ended(self, last):
+        """
+        Whether `last`, the last entry of a stream, is a `DONE` marker sent
+        by producers that didn't fail.
+        """
+        return bool(last) and last[0][1].get(self.DONE) == b'NULL'
+
+    def _ending(self, last):
+        """
+        Whether `last`, the last entry of a stream, is any `DONE` marker.
+        """
+        return bool(last) and self.DONE in last[0][1]
+
+    def _lagging(self, id_):
+        """
+        Whether the stream `id_` may hold `max_size` unread records, as far
+        as we last knew.
+        """
+        return self._sent[id_] - self._consumed[id_] >= self.max_size
+
+    def _progressed(self, id_, counts):
+        """
+        Record the records read by the slowest consumer of the stream `id_`,
+        from the `counts` in its readers hash.
+
+        Returns
+        -------
+        bool
+            Whether it has read any since we last checked.
+        """
+        consumed = min(int(x) for x in counts) if counts else 0
+        moved = consumed != self._consumed[id_]
+        self._consumed[id_] = consumed
+        return moved
+
+    def _room(self):
+        """
+        Number of records that fit in every stream, as far as we last knew.
+        """
+        return self.max_size - max(
+            self._sent[x] - self._consumed[x] for x in self.ids)
+
+    def _added(self, id_, count, written=None):
+        """
+        Record that `count` records were added to the stream `id_`, which
+        makes `written` in total when it has several producers.
+
+        Returns
+        -------
+        bool
+            Whether it's time to trim the stream.
+        """
+        if written is None:
+            self._sent[id_] += count
+        else:
+            # the other producers' records are read along with ours
+            self._sent[id_] = written
+        if self.consumers is None and not (
+                self.max_len is not None and self._chunks[id_]):
+            return False
+        self._untrimmed[id_] += count
+        if self._untrimmed[id_] < self.TRIM_INTERVAL:
+            return False
+        self._untrimmed[id_] = 0
+        return True
+
+    def _trim_to(self, positions, checkpoints):
+        """
+        Get the id of the oldest entry of a stream a consumer may still need,
+        from the `positions` and `checkpoints` of its consumers, or None when
+        one that hasn't read anything yet may still need everything.
+        """
+        if not positions or len(positions) < self.consumers:
+            return None
+        # and one that's resumable needs what it hasn't processed
+        return min(positions + checkpoints, key=_msgid)
+
+    def _trimmed(self, id_, first):
+        """
+        Get the fields of the chunks of the records we've sent to the stream
+        `id_` that are older than `first`, its first entry, as they've been
+        discarded, including by `max_len`.
+        """
+        chunks = self._chunks[id_]
+        fields = []
+        while chunks and (
+                not first or _msgid(chunks[0][0]) < _msgid(first[0][0])):
+            fields.extend(chunks.popleft()[1])
+        return fields
+
+    def _entry(self, pipe, id_, key, data, codec):
+        """
+        Encode the record `data` for the stream `id_`, storing its large
+        buffers in chunks with `pipe` before the entry is added.
+
+        Returns
+        -------
+        Tuple[Dict[bytes, bytes], List[str]]
+            Fields of the stream entry, and of the chunks in the stream's
+            `chunks` hash.
+        """
+        data, buffers = codec.split(data, self.CHUNK_THRESHOLD)
+        if not buffers:
+            return {key: data}, []
+        token = uuid.uuid4().hex
+        fields = []
+        for buf in buffers:
+            for i in range(0, buf.nbytes, self.CHUNK_SIZE):
+                field = '{}:{}'.format(token, len(fields))
+                # slices of a memoryview are sent without copying
+                pipe.hset(_key(id_, 'chunks'), field,
+                          buf[i:i + self.CHUNK_SIZE])
+                fields.append(field)
+        ref = '{}:{}:{}'.format(token, self.CHUNK_SIZE,
+                                ','.join(str(x.nbytes) for x in buffers))
+        return {key: data, self.CHUNKS: ref.encode()}, fields
+
+    def _queue_send(self, pipe, items, key):
+        """
+        Queue the commands adding `items` to each of our streams on `pipe`.
+
+        Returns
+        -------
+        Tuple[Dict[str, int], List[Tuple[str, int, List[str]]], Dict[str, int]]
+            What `_sent` needs to know of the commands: the number of records
+            added to each stream, the index of the entry of each record sent
+            in chunks along with its chunks, and the index of the total
+            written to each stream by every producer.
+        """
+        if len(self.ids) > 1:
+            items = list(items)
+        marker = key in (self.INIT, self.DONE)
+        # markers bypass the codec and never displace records
+        maxlen = None if marker else self.max_len
+        counts = {}
+        chunked = []
+        written = {}
+        for id_ in self.ids:
+            codec = self._codec(id_)
+            count = 0
+            for data in items:
+                if marker:
+                    entry, chunks = {key: data}, []
+                else:
+                    entry, chunks = self._entry(pipe, id_, key, data, codec)
+                if chunks:
+                    chunked.append((id_, len(pipe), chunks))
+                pipe.xadd(id_, entry, maxlen=maxlen)
+                count += 1
+            counts[id_] = count
+            if self.producers > 1:
+                written[id_] = len(pipe)
+                pipe.incrby(_key(id_, 'written'), count)
+        return counts, chunked, written
+
+    def _sent_to(self, key, queued, results):
+        """
+        Record the records `_queue_send` added, given the `results` of its
+        commands.
+
+        Returns
+        -------
+        List[str]
+            The streams it's time to trim.
+        """
+        counts, chunked, written = queued
+        for id_, index, chunks in chunked:
+            self._chunks[id_].append((results[index], chunks))
+        trim = []
+        for id_, count in counts.items():
+            total = results[written[id_]] if id_ in written else None
+            if self._added(id_, count, total) \
+                    and key not in (self.INIT, self.DONE):
+                trim.append(id_)
+        return trim
+
+    def _reader(self):
+        """
+        Get the name used to report our progress for producer backpressure,
+        which is also our name within the consumer group.
+        """
+        return self.name if self.resumable else uuid.uuid4().hex
+
+    def _queue_report(self, pipe, id_, name, payload):
+        """
+        Queue the commands recording that the consumer `name` has read
+        `payload` from the stream `id_` on `pipe`, for producer backpressure
+        and trimming.
+        """
+        pipe.hincrby(_key(id_, 'readers'), name, len(payload))
+        pipe.hset(_key(id_, 'positions'), name, payload[-1][0])
+
+    def _parse(self, id_, payload, streams):
+        """
+        Get the records of `payload`, read from the stream `id_`, skipping
+        any markers and moving our position in `streams` past them.
+
+        Returns
+        -------
+        Tuple[List[Tuple[bytes, bytes, bytes, Optional[bytes]]],
+              Optional[bytes]]
+            Entry id, key, encoded data and reference to the chunks (see
+            `_Chunked`) of each record, and the data of a `DONE` marker to
+            pass on to the rest of our group.
+        """
+        records = []
+        done = None
+        for msgid, kv in payload:
+            streams[id_] = msgid
+            ref = kv.pop(self.CHUNKS, None)
+            # `kv` should only be 1 item
+            for k, v in kv.items():
+                if k == self.INIT:
+                    continue
+                elif k == self.DONE:
+                    streams.pop(id_)
+                    if self.group is not None:
+                        # only one of the group receives each entry, so pass
+                        # it on to the rest
+                        done = v
+                else:
+                    records.append((msgid, k, v, ref))
+            if id_ not in streams:
+                break
+        return records, done
+
+    # commands sent to the server, which `AsyncRedisEdge` awaits instead
+
+    def _restore(self, ids):
+        """
+        Get the id to start reading each of the streams `ids` after.
+        """
+        with self.db.pipeline(transaction=False) as pipe:
+            self._queue_restore(pipe, ids)
+            return self._restored(ids, pipe.execute())
 
     def checkpoint(self):
-        # TODO
-        raise NotImplementedError
+        """
+        Save the id of the last record we've processed from each stream, so
+        pulling again with the same `name` resumes after it.
+        """
+        if not self._processed:
+            return
+        with self.db.pipeline(transaction=False) as pipe:
+            self._queue_checkpoint(pipe)
+            pipe.execute()
+        self._unsaved = 0
+
+    def backlog(self):
+        # consumed records are trimmed from the streams, see `_trim`
+        with self.db.pipeline(transaction=False) as pipe:
+            for id_ in self.ids:
+                pipe.xlen(id_)
+            return sum(pipe.execute())
+
+    def done(self):
+        return all(self._ended(self.db.xrevrange(x, count=1))
+                   for x in self.ids)
+
+    def reset(self):
+        for id_ in self.ids:
+            # the `DONE` left by the failed producer, and by any consumer
+            # group passing it on
+            while True:
+                last = self.db.xrevrange(id_, count=1)
+                if not self._ending(last):
+                    break
+                self.db.xdel(id_, last[0][0])
+            self.db.delete(_key(id_, 'finished'))
+
+    def _wait(self):
+        time.sleep(self.THROTTLE_INTERVAL)
+
+    def _throttle(self):
+        """
+        Block until every stream has fewer than `max_size` unread records.
+
+        Lag is measured from the entries every producer has added to the
+        stream to those read by the slowest consumer that has registered in
+        its readers hash. With a single producer, Redis is only consulted
+        once the last known lag says the stream may be full.
+        """
+        for id_ in self.ids:
+            if self.producers > 1:
+                # the other producers may have added records since we did
+                self._sent[id_] = int(
+                    self.db.get(_key(id_, 'written')) or 0)
+            while self._lagging(id_):
+                counts = self.db.hvals(_key(id_, 'readers'))
+                if not self._progressed(id_, counts):
+                    self._wait()
+
+    def _trim(self, id_):
+        """
+        Discard the records of the stream `id_` that every consumer has read,
+        and the chunks of those discarded, including by `max_len`.
+        """
+        if self.consumers is not None:
+            minid = self._trim_to(
+                self.db.hvals(_key(id_, 'positions')),
+                self.db.hvals(_key(id_, 'checkpoints')))
+            if minid is not None:
+                self.db.xtrim(id_, minid=minid, approximate=False)
+        if not self._chunks[id_]:
+            return
+        fields = self._trimmed(id_, self.db.xrange(id_, count=1))
+        if fields:
+            self.db.hdel(_key(id_, 'chunks'), *fields)
+
+    def _fetch(self, id_, ref):
+        """
+        Get the buffers of a record sent in chunks to the stream `id_`, see
+        `_Chunked`.
+        """
+        record = _Chunked(id_, ref)
+        for field in record.fields:
+            record.add(self.db.hget(_key(id_, 'chunks'), field))
+        return record.buffers()
 
     def send(self, data, key=b'NULL'):
+        self.send_many((data,), key=key)
+
+    def send_many(self, items, key=b'NULL'):
+        if self.max_size is None or key in (self.INIT, self.DONE):
+            self._send_many(items, key)
+            return
+        # in chunks that fit in every stream, so none grows past `max_size`
+        items = iter(items)
+        for first in items:
+            self._throttle()
+            self._send_many(list(itertools.chain(
+                (first,), itertools.islice(items, self._room() - 1))), key)
+
+    def _send_many(self, items, key):
+        with self.db.pipeline(transaction=False) as pipe:
+            queued = self._queue_send(pipe, items, key)
+            results = pipe.execute()
+        for id_ in self._sent_to(key, queued, results):
+            self._trim(id_)
+
+    def delete(self):
+        self.db.delete(*_keys(self.ids))
+
+    def _release(self):
+        if self.producers == 1:
+            return True
+        last = True
         for id_ in self.ids:
-            self.db.xadd(id_, {key: serialize(data)})
+            finished = self.db.incr(_key(id_, 'finished'))
+            last = last and finished >= self.producers
+        return last
+
+    def _join(self, ids):
+        """
+        Create our consumer group on each of the streams `ids`.
+        """
+        for id_ in ids:
+            try:
+                self.db.xgroup_create(id_, self.group, id='0', mkstream=True)
+            except redis.ResponseError as e:
+                if 'BUSYGROUP' not in str(e):
+                    raise
+
+    def _read(self, streams, reader, count, block):
+        if self.group is None:
+            return self.db.xread(streams, count=count, block=block)
+        return self.db.xreadgroup(
+            self.group, reader, {k: b'>' for k in streams},
+            count=count or self.GROUP_COUNT, block=block)
+
+    def _report(self, id_, name, payload):
+        with self.db.pipeline(transaction=False) as pipe:
+            self._queue_report(pipe, id_, name, payload)
+            pipe.execute()
 
     def _pre_poll(self):
         pass
@@ -85,29 +725,314 @@ class RedisEdge(AbstractRemoteEdge):
     def _post_poll(self):
         pass
 
-    def pull(self, count=None, block=2000):
+    def _open(self):
+        """
+        Prepare to read our streams.
+
+        Returns
+        -------
+        Tuple[Dict[bytes, bytes], Dict[bytes, Codec], str]
+            Position to read each stream from, the codec of each stream, and
+            our name for reporting our progress, see `_reader`.
+        """
         active = list(bytes(x.encode()) for x in self.ids)
+        streams = self._restore(active)
+        if self.group is not None:
+            self._join(active)
+        return streams, {k: self._codec(k) for k in active}, self._reader()
+
+    def _records(self, id_, payload, streams, codecs):
+        """
+        Get the records of `payload`, read from the stream `id_`, see
+        `_parse`.
+
+        Returns
+        -------
+        List[Tuple[bytes, bytes, Any]]
+            Entry id, key and data of each record.
+        """
+        records, done = self._parse(id_, payload, streams)
+        if done is not None:
+            self.db.xadd(id_, {self.DONE: done})
+        codec = codecs[id_]
+        return [(msgid, k, codec.decode(v) if ref is None
+                 else codec.join(v, self._fetch(id_, ref)))
+                for msgid, k, v, ref in records]
+
+    def pull(self, count=None, block=2000):
+        streams, codecs, reader = self._open()
+
+        try:
+            while streams:
+
+                self._pre_poll()
+
+                for id_, payload in self._read(
+                        streams, reader, count, block):
+                    self._report(id_, self.group or reader, payload)
+                    with self.lock:
+                        for msgid, k, data in self._records(
+                                id_, payload, streams, codecs):
+                            self.key = k
+                            yield data
+                            if self._done(id_, msgid):
+                                self.checkpoint()
+                    if self.group is not None:
+                        self.db.xack(
+                            id_, self.group, *(x for x, _ in payload))
+
+                self._post_poll()
+        finally:
+            self.checkpoint()
+
+    def pull_batches(self, max_size, max_wait=0.0):
+        streams, codecs, reader = self._open()
 
-        streams = {k: b'0-0' for k in active}
+        batch = []  # type: List[Tuple[bytes, bytes, bytes, Any]]
+        acks = collections.defaultdict(list)
+        deadline = None
+        # whether the last read may have left entries waiting, e.g. when some
+        # of those it returned were markers rather than records
+        waiting = False
 
-        while active:
+        try:
+            while streams:
 
-            self._pre_poll()
+                if not batch:
+                    block = 2000
+                elif waiting:
+                    # read what's waiting without blocking
+                    block = None
+                else:
+                    # top the batch up with what arrives until the deadline
+                    block = int((deadline - time.monotonic()) * 1000)
 
-            for id_, payload in self.db.xread(
-                    streams, count=count, block=block):
-                print(id_, payload)
+                if block is None or block > 0:
+                    count = max_size - len(batch)
+                    read = 0
+                    self._pre_poll()
+                    for id_, payload in self._read(
+                            streams, reader, count, block):
+                        read += len(payload)
+                        self._report(id_, self.group or reader, payload)
+                        batch.extend(
+                            (id_,) + x for x in self._records(
+                                id_, payload, streams, codecs))
+                        if self.group is not None:
+                            acks[id_].extend(x for x, _ in payload)
+                    self._post_poll()
+                    waiting = read >= count
+                    if batch and deadline is None:
+                        deadline = time.monotonic() + max_wait
+                    if not batch or (len(batch) < max_size and streams and (
+                            waiting or time.monotonic() < deadline)):
+                        continue
+
+                # each stream read may return up to `max_size` records
                 with self.lock:
-                    for msgid, kv in payload:
-                        streams[id_] = msgid
-                        # `kv` should only be 1 item
-                        for k, v in kv.items():
-                            if k == self.INIT:
-                                continue
-                            elif k == self.DONE:
-                                active.remove(id_)
-                                continue
-                            else:
-                                yield deserialize(v)
-
-            self._post_poll()
+                    for i in range(0, len(batch), max_size):
+                        chunk = batch[i:i + max_size]
+                        self.key = chunk[-1][2]
+                        yield [x[3] for x in chunk]
+                for id_, msgid, _, _ in batch:
+                    if self._done(id_, msgid):
+                        self.checkpoint()
+                for id_, msgids in acks.items():
+                    self.db.xack(id_, self.group, *msgids)
+                batch = []
+                acks.clear()
+                deadline = None
+                waiting = False
+        finally:
+            self.checkpoint()
+
+
+class AsyncRedisEdge(AsyncEdgeMixin, RedisEdge):
+    """
+    `RedisEdge` for coroutine nodes using the `redis.asyncio` client.
+    """
+
+    def _client(self):
+        # NOTE: made lazily, so it belongs to the running loop
+        return None
+
+    @property
+    def db(self):
+        if self._db is None:
+            self._db = redis.asyncio.Redis(**_manager.parse(self._url))
+        return self._db
+
+    async def close(self):
+        if self._db is not None:
+            db, self._db = self._db, None
+            close = getattr(db, 'aclose', None) or db.close
+            await close()
+
+    async def stop(self, failed=False):
+        await super(AsyncRedisEdge, self).stop(failed=failed)
+        await self.close()
+
+    async def _restore(self, ids):
+        async with self.db.pipeline(transaction=False) as pipe:
+            self._queue_restore(pipe, ids)
+            return self._restored(ids, await pipe.execute())
+
+    async def checkpoint(self):
+        if not self._processed:
+            return
+        async with self.db.pipeline(transaction=False) as pipe:
+            self._queue_checkpoint(pipe)
+            await pipe.execute()
+        self._unsaved = 0
+
+    async def done(self):
+        try:
+            for id_ in self.ids:
+                if not self._ended(await self.db.xrevrange(id_, count=1)):
+                    return False
+            return True
+        finally:
+            await self.close()
+
+    async def backlog(self):
+        async with self.db.pipeline(transaction=False) as pipe:
+            for id_ in self.ids:
+                pipe.xlen(id_)
+            return sum(await pipe.execute())
+
+    async def reset(self):
+        try:
+            for id_ in self.ids:
+                while True:
+                    last = await self.db.xrevrange(id_, count=1)
+                    if not self._ending(last):
+                        break
+                    await self.db.xdel(id_, last[0][0])
+                await self.db.delete(_key(id_, 'finished'))
+        finally:
+            await self.close()
+
+    async def delete(self):
+        try:
+            await self.db.delete(*_keys(self.ids))
+        finally:
+            await self.close()
+
+    async def _wait(self):
+        await asyncio.sleep(self.THROTTLE_INTERVAL)
+
+    async def _throttle(self):
+        for id_ in self.ids:
+            if self.producers > 1:
+                self._sent[id_] = int(
+                    await self.db.get(_key(id_, 'written')) or 0)
+            while self._lagging(id_):
+                counts = await self.db.hvals(_key(id_, 'readers'))
+                if not self._progressed(id_, counts):
+                    await self._wait()
+
+    async def _trim(self, id_):
+        if self.consumers is not None:
+            minid = self._trim_to(
+                await self.db.hvals(_key(id_, 'positions')),
+                await self.db.hvals(_key(id_, 'checkpoints')))
+            if minid is not None:
+                await self.db.xtrim(id_, minid=minid, approximate=False)
+        if not self._chunks[id_]:
+            return
+        fields = self._trimmed(id_, await self.db.xrange(id_, count=1))
+        if fields:
+            await self.db.hdel(_key(id_, 'chunks'), *fields)
+
+    async def _fetch(self, id_, ref):
+        record = _Chunked(id_, ref)
+        for field in record.fields:
+            record.add(await self.db.hget(_key(id_, 'chunks'), field))
+        return record.buffers()
+
+    async def send(self, data, key=b'NULL'):
+        await self.send_many((data,), key=key)
+
+    async def send_many(self, items, key=b'NULL'):
+        if self.max_size is None or key in (self.INIT, self.DONE):
+            await self._send_many(items, key)
+            return
+        items = iter(items)
+        for first in items:
+            await self._throttle()
+            await self._send_many(list(itertools.chain(
+                (first,), itertools.islice(items, self._room() - 1))), key)
+
+    async def _send_many(self, items, key):
+        async with self.db.pipeline(transaction=False) as pipe:
+            queued = self._queue_send(pipe, items, key)
+            results = await pipe.execute()
+        for id_ in self._sent_to(key, queued, results):
+            await self._trim(id_)
+
+    async def _release(self):
+        if self.producers == 1:
+            return True
+        last = True
+        for id_ in self.ids:
+            finished = await self.db.incr(_key(id_, 'finished'))
+            last = last and finished >= self.producers
+        return last
+
+    async def _join(self, ids):
+        for id_ in ids:
+            try:
+                await self.db.xgroup_create(
+                    id_, self.group, id='0', mkstream=True)
+            except redis.ResponseError as e:
+                if 'BUSYGROUP' not in str(e):
+                    raise
+
+    async def _report(self, id_, name, payload):
+        async with self.db.pipeline(transaction=False) as pipe:
+            self._queue_report(pipe, id_, name, payload)
+            await pipe.execute()
+
+    async def _open(self):
+        active = list(bytes(x.encode()) for x in self.ids)
+        streams = await self._restore(active)
+        if self.group is not None:
+            await self._join(active)
+        return streams, {k: self._codec(k) for k in active}, self._reader()
+
+    async def _records(self, id_, payload, streams, codecs):
+        records, done = self._parse(id_, payload, streams)
+        if done is not None:
+            await self.db.xadd(id_, {self.DONE: done})
+        codec = codecs[id_]
+        results = []
+        for msgid, k, v, ref in records:
+            if ref is None:
+                results.append((msgid, k, codec.decode(v)))
+            else:
+                results.append(
+                    (msgid, k, codec.join(v, await self._fetch(id_, ref))))
+        return results
+
+    async def pull(self, count=None, block=2000):
+        streams, codecs, reader = await self._open()
+
+        try:
+            while streams:
+                for id_, payload in await self._read(
+                        streams, reader, count, block):
+                    await self._report(id_, self.group or reader, payload)
+                    for msgid, k, data in await self._records(
+                            id_, payload, streams, codecs):
+                        self.key = k
+                        yield data
+                        if self._done(id_, msgid):
+                            await self.checkpoint()
+                    if self.group is not None:
+                        await self.db.xack(
+                            id_, self.group, *(x for x, _ in payload))
+        finally:
+            try:
+                await self.checkpoint()
+            finally:
+                await self.close()
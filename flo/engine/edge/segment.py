@@ -0,0 +1,667 @@
+import os
+import mmap
+import time
+import uuid
+import fcntl
+import shutil
+import struct
+import hashlib
+import tempfile
+import contextlib
+import collections
+
+from .base import AbstractRemoteEdge
+
+from typing import *
+
+
+# payload length, kind
+_RECORD = struct.Struct('<IB')
+# data with a key other than the default, prefixed by the key's length, and
+# the end of a segment, continued by the next
+_DATA, _KEYED, _DONE, _ROLL = 0, 1, 2, 3
+_KEY = struct.Struct('<H')
+
+# offsets in the state file of the start of the segment being appended to,
+# the data records written, the number of producers that have finished, how
+# the stream ended (see `_ENDED_OK`), where its `DONE` record is and the
+# number of consumers of the stream, when known
+_STATE_SIZE = 64
+_ACTIVE, _WRITTEN, _FINISHED, _ENDED, _ENDED_AT, _CONSUMERS = \
+    0, 8, 16, 24, 32, 40
+_ENDED_OK, _ENDED_FAILED = 1, 2
+
+# records read by a reader and the offset of the next record it reads
+_CURSOR = struct.Struct('<QQ')
+
+_U64 = struct.Struct('<Q')
+
+
+def _default_root():
+    return os.path.join(tempfile.gettempdir(), 'flo-segments')
+
+
+def _hash(value):
+    return hashlib.sha1(value.encode()).hexdigest()
+
+
+class _Segment(object):
+    """
+    Read-only memory map of a segment file, remapped as the file grows.
+    """
+
+    def __init__(self, path, start):
+        self.start = start
+        self.fd = os.open(path, os.O_RDONLY)
+        self.mmap = None  # type: Optional[mmap.mmap]
+        self.size = 0
+        self.grow()
+
+    def grow(self):
+        """
+        Map what's been appended since the file was last mapped.
+
+        Returns
+        -------
+        bool
+            Whether the file grew.
+        """
+        size = os.fstat(self.fd).st_size
+        if size <= self.size:
+            return False
+        if self.mmap is not None:
+            self.mmap.close()
+        self.mmap = mmap.mmap(self.fd, size, access=mmap.ACCESS_READ)
+        self.size = size
+        return True
+
+    def close(self):
+        if self.mmap is not None:
+            self.mmap.close()
+        os.close(self.fd)
+
+
+class _Cursor(object):
+    """
+    Position of a reader (or a group of them) in a stream, stored in a file
+    so it can be shared by a group and outlives the reader.
+    """
+
+    def __init__(self, path):
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+
+    def get(self):
+        data = os.pread(self.fd, _CURSOR.size, 0)
+        if len(data) < _CURSOR.size:
+            return 0, 0
+        return _CURSOR.unpack(data)
+
+    def set(self, records, offset):
+        os.pwrite(self.fd, _CURSOR.pack(records, offset), 0)
+
+    @contextlib.contextmanager
+    def locked(self):
+        fcntl.flock(self.fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+    def close(self):
+        os.close(self.fd)
+
+
+class _Stream(object):
+    """
+    Append-only log of length-prefixed records in a directory of segment
+    files, each named after the offset of its first byte in the stream.
+
+    Producers append to the last segment, starting another once it's larger
+    than `segment_size` and leaving a `_ROLL` record at the end of the last.
+    When `shared` they hold an exclusive `flock` on the state file while
+    writing. Offsets only ever increase, so readers find a record by its
+    offset alone.
+    """
+
+    def __init__(self, path, segment_size, shared=False):
+        self.path = path
+        self.segment_size = segment_size
+        self.shared = shared
+
+        os.makedirs(os.path.join(path, 'readers'), exist_ok=True)
+        self.fd = os.open(
+            os.path.join(path, 'state'), os.O_RDWR | os.O_CREAT, 0o600)
+        with self._locked():
+            # the first to open the stream creates it. the zero filled state
+            # is an empty stream whose first segment starts at 0.
+            if not os.fstat(self.fd).st_size:
+                os.ftruncate(self.fd, _STATE_SIZE)
+                os.close(os.open(self._segment(0), os.O_CREAT, 0o600))
+        self.mmap = mmap.mmap(self.fd, _STATE_SIZE)
+
+        # the segment we append to, and its size
+        self._start = None  # type: Optional[int]
+        self._writer = None  # type: Optional[int]
+        self._size = 0
+        # the segment we last read from, and whether we've read past the end
+        # of a segment since the stream was last trimmed
+        self._reader = None  # type: Optional[_Segment]
+        self.rolled = False
+
+    def close(self):
+        if self._writer is not None:
+            os.close(self._writer)
+            self._writer = None
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+        self.mmap.close()
+        os.close(self.fd)
+
+    def _segment(self, start):
+        return os.path.join(self.path, '{:020d}.seg'.format(start))
+
+    def segments(self) -> List[int]:
+        """
+        Starts of the segments, in order.
+        """
+        return sorted(int(x[:-4]) for x in os.listdir(self.path)
+                      if x.endswith('.seg'))
+
+    def get(self, offset):
+        return _U64.unpack_from(self.mmap, offset)[0]
+
+    def set(self, offset, value):
+        _U64.pack_into(self.mmap, offset, value)
+
+    @contextlib.contextmanager
+    def _locked(self):
+        fcntl.flock(self.fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+    @contextlib.contextmanager
+    def writing(self):
+        if not self.shared:
+            yield
+            return
+        with self._locked():
+            yield
+
+    # writing
+
+    def _open(self):
+        """
+        Open the segment being appended to, which another producer may have
+        started.
+        """
+        start = self.get(_ACTIVE)
+        if start != self._start or self.shared:
+            if start != self._start:
+                if self._writer is not None:
+                    os.close(self._writer)
+                self._writer = os.open(
+                    self._segment(start), os.O_WRONLY | os.O_APPEND)
+                self._start = start
+            self._size = os.fstat(self._writer).st_size
+
+    def _write(self, data):
+        view = memoryview(data)
+        while view:
+            view = view[os.write(self._writer, view):]
+        self._size += len(data)
+
+    def _roll(self):
+        start = self._start + self._size + _RECORD.size
+        # readers find the next segment once they reach the `_ROLL` record
+        writer = os.open(
+            self._segment(start), os.O_WRONLY | os.O_APPEND | os.O_CREAT,
+            0o600)
+        self._write(_RECORD.pack(0, _ROLL))
+        os.close(self._writer)
+        self._writer, self._start, self._size = writer, start, 0
+        self.set(_ACTIVE, start)
+
+    def append(self, records) -> bool:
+        """
+        Append `records`, kind and payload pairs.
+
+        Returns
+        -------
+        bool
+            Whether a segment was started.
+        """
+        rolled = False
+        with self.writing():
+            self._open()
+            parts = []
+            size = 0
+            written = 0
+            for kind, payload in records:
+                length = _RECORD.size + len(payload)
+                if self._size + size + length > self.segment_size \
+                        and self._size + size:
+                    self._write(b''.join(parts))
+                    parts, size = [], 0
+                    self._roll()
+                    rolled = True
+                if kind == _DONE:
+                    self.set(_ENDED_AT, self._start + self._size + size)
+                    self.set(_ENDED, _ENDED_OK if payload == b'NULL'
+                             else _ENDED_FAILED)
+                    payload = b''
+                parts.append(_RECORD.pack(len(payload), kind))
+                parts.append(payload)
+                size += _RECORD.size + len(payload)
+                written += kind in (_DATA, _KEYED)
+            if parts:
+                self._write(b''.join(parts))
+            self.set(_WRITTEN, self.get(_WRITTEN) + written)
+        return rolled
+
+    def finish(self):
+        """
+        Record that a producer has finished writing.
+
+        Returns
+        -------
+        int
+            Number of producers that have finished.
+        """
+        with self._locked():
+            finished = self.get(_FINISHED) + 1
+            self.set(_FINISHED, finished)
+        return finished
+
+    def reset(self):
+        """
+        Remove the `DONE` record, to be produced to again.
+        """
+        with self._locked():
+            if self.get(_ENDED):
+                start = self.get(_ACTIVE)
+                os.truncate(self._segment(start), self.get(_ENDED_AT) - start)
+            self.set(_ENDED, 0)
+            self.set(_FINISHED, 0)
+        self._start = None
+
+    # reading
+
+    def cursors(self) -> List[Tuple[int, int]]:
+        """
+        Records read and position of every reader.
+        """
+        results = []
+        readers = os.path.join(self.path, 'readers')
+        for name in os.listdir(readers):
+            try:
+                with open(os.path.join(readers, name), 'rb') as f:
+                    data = f.read(_CURSOR.size)
+            except FileNotFoundError:
+                continue
+            if len(data) == _CURSOR.size:
+                results.append(_CURSOR.unpack(data))
+            else:
+                results.append((0, 0))
+        return results
+
+    def cursor(self, name) -> _Cursor:
+        return _Cursor(os.path.join(self.path, 'readers', _hash(name)))
+
+    def remove_cursor(self, name):
+        try:
+            os.unlink(os.path.join(self.path, 'readers', _hash(name)))
+        except FileNotFoundError:
+            pass
+
+    def _find(self, offset):
+        """
+        Map the segment holding `offset`.
+        """
+        segment = self._reader
+        if segment is not None and segment.start <= offset:
+            end = segment.start + segment.size
+            if offset >= end and segment.grow():
+                end = segment.start + segment.size
+            if offset < end:
+                return segment
+            # the end of it, unless it's been followed by another segment
+            if offset == end and not os.path.exists(self._segment(offset)):
+                return segment
+        starts = [x for x in self.segments() if x <= offset]
+        # a reader behind what's been trimmed starts from the oldest record
+        start = starts[-1] if starts else self.segments()[0]
+        if segment is None or segment.start != start:
+            if segment is not None:
+                segment.close()
+            segment = self._reader = _Segment(self._segment(start), start)
+        return segment
+
+    def read(self, offset, count):
+        """
+        Read up to `count` data records from `offset`.
+
+        A `DONE` record isn't read past, so any other reader of a group sees
+        it too.
+
+        Returns
+        -------
+        Tuple[List[Tuple[int, bytes]], int, bool]
+            Kind and payload of the records read, the offset of the next
+            record and whether the end of the stream was reached.
+        """
+        records = []
+        while len(records) < count:
+            segment = self._find(offset)
+            pos = offset - segment.start
+            end = pos + _RECORD.size
+            if end <= segment.size:
+                length, kind = _RECORD.unpack_from(segment.mmap, pos)
+                end += length
+            if end > segment.size:
+                # the rest of the record hasn't been written yet
+                if segment.grow():
+                    continue
+                break
+            if kind == _DONE:
+                return records, offset, True
+            if kind == _ROLL:
+                self.rolled = True
+            else:
+                records.append(
+                    (kind, segment.mmap[pos + _RECORD.size:end]))
+            offset = segment.start + end
+        return records, offset, False
+
+    def trim(self):
+        """
+        Remove the segments every consumer of the stream has read, once their
+        number is known.
+        """
+        self.rolled = False
+        consumers = self.get(_CONSUMERS)
+        if not consumers:
+            return
+        cursors = self.cursors()
+        # a consumer that hasn't read anything yet may still need everything
+        if len(cursors) < consumers:
+            return
+        position = min(x[1] for x in cursors)
+        starts = self.segments()
+        for start, following in zip(starts, starts[1:]):
+            if following > position:
+                break
+            try:
+                os.unlink(self._segment(start))
+            except FileNotFoundError:
+                pass
+
+
+class SegmentEdge(AbstractRemoteEdge):
+    """
+    Edge backed by append-only logs of records in segment files on disk, so
+    processes on the same host can exchange records without an external
+    service, and streams can grow well beyond memory.
+
+    Each stream is a directory under `root` (the system's temporary
+    directory by default). Consumers read the segments through memory maps,
+    following them as records are appended, and keep their position in a
+    file beside them: a consumer pulling with a `name` resumes from where it
+    left off, and consumers of a `group` share theirs. Segments every
+    consumer has read are removed as consumers move past them, once their
+    number is known.
+    """
+
+    # bytes per segment file, beyond which another is started
+    SEGMENT_SIZE = 64 * 1024 * 1024
+
+    # records read from a stream at a time
+    READ_COUNT = 64
+
+    # maximum seconds a consumer sleeps between checks for more records
+    POLL_INTERVAL = 0.05
+
+    # seconds to wait between lag checks while `send` is blocked
+    THROTTLE_INTERVAL = 0.05
+
+    def __init__(self, *args, segment_size=None, root=None, **kwargs):
+        """
+        Parameters
+        ----------
+        segment_size : Optional[int]
+            Bytes per segment file.
+        root : Optional[str]
+            Directory of the streams. Defaults to the FLO_SEGMENT_DIR
+            environment variable.
+        """
+        super(SegmentEdge, self).__init__(*args, **kwargs)
+        self.segment_size = segment_size or self.SEGMENT_SIZE
+        self.root = root or os.environ.get('FLO_SEGMENT_DIR') \
+            or _default_root()
+        self._streams = {}  # type: Dict[str, _Stream]
+        # records sent to each stream by this edge, and the last known number
+        # read by its slowest consumer
+        self._sent = collections.Counter()
+        self._consumed = collections.Counter()
+
+    @property
+    def resumable(self):
+        return self.name is not None and self.group is None
+
+    def _path(self, id_):
+        return os.path.join(self.root, _hash(id_))
+
+    def _stream(self, id_):
+        stream = self._streams.get(id_)
+        if stream is None:
+            stream = self._streams[id_] = _Stream(
+                self._path(id_), self.segment_size,
+                shared=self.producers > 1)
+            if self.consumers is not None:
+                # for consumers to trim the segments they've read
+                stream.set(_CONSUMERS, self.consumers)
+        return stream
+
+    def _throttle(self):
+        """
+        Block until every stream has fewer than `max_size` records unread by
+        its slowest consumer.
+
+        Lag is measured from the records every producer has written to the
+        stream. With a single producer, the state file is only consulted
+        once the last known lag says the stream may be full.
+        """
+        for id_ in self.ids:
+            if self.producers > 1:
+                # the other producers may have written records since we did
+                self._sent[id_] = self._stream(id_).get(_WRITTEN)
+            while self._sent[id_] - self._consumed[id_] >= self.max_size:
+                cursors = self._stream(id_).cursors()
+                consumed = min(x[0] for x in cursors) if cursors else 0
+                if consumed == self._consumed[id_]:
+                    time.sleep(self.THROTTLE_INTERVAL)
+                self._consumed[id_] = consumed
+
+    def send(self, data, key=b'NULL'):
+        self.send_many((data,), key=key)
+
+    def send_many(self, items, key=b'NULL'):
+        if key == self.INIT:
+            for id_ in self.ids:
+                self._stream(id_)
+            return
+        if len(self.ids) > 1:
+            items = list(items)
+        if key == self.DONE:
+            for id_ in self.ids:
+                self._stream(id_).append((_DONE, x) for x in items)
+            return
+        if self.max_size is not None:
+            self._throttle()
+        kind = _DATA if key == b'NULL' else _KEYED
+        prefix = _KEY.pack(len(key)) + key if kind == _KEYED else b''
+        for id_ in self.ids:
+            encode = self._codec(id_).encode
+            records = [(kind, prefix + encode(x)) for x in items]
+            stream = self._stream(id_)
+            if stream.append(records):
+                stream.trim()
+            self._sent[id_] += len(records)
+
+    def _release(self):
+        if self.producers == 1:
+            return True
+        last = True
+        for id_ in self.ids:
+            last = self._stream(id_).finish() >= self.producers and last
+        return last
+
+    def backlog(self):
+        total = 0
+        for id_ in self.ids:
+            stream = self._stream(id_)
+            cursors = stream.cursors()
+            consumed = min(x[0] for x in cursors) if cursors else 0
+            total += stream.get(_WRITTEN) - consumed
+        return total
+
+    def done(self):
+        return all(self._stream(x).get(_ENDED) == _ENDED_OK for x in self.ids)
+
+    def reset(self):
+        for id_ in self.ids:
+            self._stream(id_).reset()
+
+    def _claim(self, stream, cursor, position, count):
+        """
+        Read up to `count` of the next records of `stream`.
+
+        Returns
+        -------
+        Tuple[List[Tuple[int, bytes]], Tuple[int, int], bool]
+            The records, our position after them and whether the end of the
+            stream was reached.
+        """
+        if self.group is None:
+            records, offset, done = stream.read(position[1], count)
+            return records, (position[0] + len(records), offset), done
+        # the group shares a position
+        with cursor.locked():
+            total, offset = cursor.get()
+            records, offset, done = stream.read(offset, count)
+            position = (total + len(records), offset)
+            cursor.set(*position)
+        return records, position, done
+
+    def _pull(self, max_size, max_wait):
+        """
+        Pull lists of up to `max_size` records along with their keys, see
+        `pull_batches`. Our position in each stream is saved once a list has
+        been processed.
+        """
+        active = collections.deque(self.ids)
+        decoders = {x: self._codec(x).decode for x in self.ids}
+
+        # name of our position in each stream
+        if self.group is not None:
+            reader = self.group
+        elif self.resumable:
+            reader = self.name
+        else:
+            reader = uuid.uuid4().hex
+        cursors = {x: self._stream(x).cursor(reader) for x in self.ids}
+        positions = {x: cursors[x].get() for x in self.ids}
+
+        batch = []  # type: List[Tuple[bytes, Any]]
+        # streams read from since the last batch, and whether they're done
+        read = {}  # type: Dict[str, bool]
+        deadline = None
+        delay = 0.0005
+        try:
+            while active:
+                found = False
+                for _ in range(len(active)):
+                    if len(batch) >= max_size:
+                        break
+                    id_ = active.popleft()
+                    stream = self._stream(id_)
+                    records, positions[id_], done = self._claim(
+                        stream, cursors[id_], positions[id_],
+                        min(self.READ_COUNT, max_size - len(batch)))
+                    if not done:
+                        # allows for round robin
+                        active.append(id_)
+                    read[id_] = done
+                    for kind, payload in records:
+                        found = True
+                        key = b'NULL'
+                        if kind == _KEYED:
+                            size = _KEY.unpack_from(payload)[0] + _KEY.size
+                            key = payload[_KEY.size:size]
+                            payload = payload[size:]
+                        batch.append((key, decoders[id_](payload)))
+
+                if batch and deadline is None:
+                    deadline = time.monotonic() + max_wait
+                if batch and (len(batch) >= max_size or not active or (
+                        not found and time.monotonic() >= deadline)):
+                    yield batch
+                    batch = []
+                    deadline = None
+
+                if not batch:
+                    for id_, done in read.items():
+                        stream = self._stream(id_)
+                        if self.group is None:
+                            # once they've been processed
+                            cursors[id_].set(*positions[id_])
+                        if stream.rolled or done:
+                            # we may have been the last to read a segment
+                            stream.trim()
+                        if done and not self.resumable \
+                                and self.group is None:
+                            # we won't read it again
+                            stream.remove_cursor(reader)
+                    read.clear()
+
+                if found:
+                    delay = 0.0005
+                elif active:
+                    wait = delay
+                    if deadline is not None:
+                        wait = min(wait, max(deadline - time.monotonic(), 0))
+                    time.sleep(wait)
+                    delay = min(delay * 2, self.POLL_INTERVAL)
+        finally:
+            for cursor in cursors.values():
+                cursor.close()
+            self.close()
+
+    def pull(self):
+        for batch in self._pull(self.READ_COUNT, 0.0):
+            for key, data in batch:
+                self.key = key
+                yield data
+
+    def pull_batches(self, max_size, max_wait=0.0):
+        for batch in self._pull(max_size, max_wait):
+            self.key = batch[-1][0]
+            yield [x[1] for x in batch]
+
+    def delete(self):
+        self.close()
+        for id_ in self.ids:
+            shutil.rmtree(self._path(id_), ignore_errors=True)
+
+    def close(self):
+        for stream in self._streams.values():
+            stream.close()
+        self._streams.clear()
+
+    def stop(self, failed=False):
+        super(SegmentEdge, self).stop(failed=failed)
+        for stream in self._streams.values():
+            stream.trim()
+        self.close()
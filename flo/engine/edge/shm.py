@@ -0,0 +1,524 @@
+import os
+import mmap
+import time
+import errno
+import fcntl
+import select
+import struct
+import hashlib
+import tempfile
+import contextlib
+import collections
+
+from .base import AbstractRemoteEdge
+
+from typing import *
+
+
+# header offsets of the head position, tail position, records written,
+# records read, the flag set while a consumer is waiting, the number of
+# producers that have finished and the position of the last `DONE` record
+# plus one
+_HEADER_SIZE = 64
+_HEAD, _TAIL, _WRITTEN, _READ, _WAITING, _FINISHED, _ENDED = \
+    0, 8, 16, 24, 32, 40, 48
+
+# payload length, kind
+_RECORD = struct.Struct('<IB')
+# data with a key other than the default, prefixed by the key's length
+_DATA, _INIT, _DONE, _KEYED = 0, 1, 2, 3
+_KEY = struct.Struct('<H')
+
+_U64 = struct.Struct('<Q')
+
+
+def _default_root():
+    if os.path.isdir('/dev/shm'):
+        return os.path.join('/dev/shm', 'flo')
+    return os.path.join(tempfile.gettempdir(), 'flo')
+
+
+class _Ring(object):
+    """
+    Ring buffer of length-prefixed records stored in a memory mapped file,
+    with a fifo beside it used to wake waiting consumers.
+
+    The positions in the header only ever increase; they're taken modulo the
+    capacity when indexing into the buffer. Consumers hold an exclusive
+    `flock` on the file while reading so multiple consumers can compete for
+    records. Likewise, when `shared` producers hold an exclusive `flock` on a
+    lock file beside it while writing.
+    """
+
+    # maximum seconds the producer sleeps while waiting for the buffer to drain
+    BACKOFF = 0.05
+
+    def __init__(self, path, capacity, shared=False):
+        self.path, self.fifo, self.lock = self.files(path)
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            os.mkfifo(self.fifo, 0o600)
+        except FileExistsError:
+            pass
+
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(self.fd, fcntl.LOCK_EX)
+        try:
+            # the first to open the file sizes it. the zero filled header is an
+            # empty ring.
+            size = os.fstat(self.fd).st_size
+            if not size:
+                size = _HEADER_SIZE + capacity
+                os.ftruncate(self.fd, size)
+        finally:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+        self.mmap = mmap.mmap(self.fd, size)
+        self.capacity = size - _HEADER_SIZE
+
+        self._reader = None  # type: int
+        self._writer = None  # type: int
+        self._lock = None  # type: int
+        # position and number of the records we've read but not committed
+        self._claimed = None  # type: Optional[int]
+        self._claims = 0
+        if shared:
+            self._lock = os.open(self.lock, os.O_RDWR | os.O_CREAT, 0o600)
+
+    def close(self):
+        self.mmap.close()
+        os.close(self.fd)
+        for fd in (self._reader, self._writer, self._lock):
+            if fd is not None:
+                os.close(fd)
+
+    @staticmethod
+    def files(path):
+        """
+        Paths of the files making up the ring at `path`.
+        """
+        return path, path + '.fifo', path + '.lock'
+
+    @classmethod
+    def remove(cls, path):
+        """
+        Remove the files of the ring at `path`, if there are any.
+        """
+        for x in cls.files(path):
+            try:
+                os.unlink(x)
+            except FileNotFoundError:
+                pass
+
+    def _get(self, offset):
+        return _U64.unpack_from(self.mmap, offset)[0]
+
+    def _set(self, offset, value):
+        _U64.pack_into(self.mmap, offset, value)
+
+    def _copy_in(self, pos, data):
+        data = memoryview(data)
+        start = _HEADER_SIZE + pos % self.capacity
+        first = min(len(data), _HEADER_SIZE + self.capacity - start)
+        self.mmap[start:start + first] = data[:first]
+        if first < len(data):
+            rest = len(data) - first
+            self.mmap[_HEADER_SIZE:_HEADER_SIZE + rest] = data[first:]
+
+    def _copy_out(self, pos, size):
+        start = _HEADER_SIZE + pos % self.capacity
+        first = min(size, _HEADER_SIZE + self.capacity - start)
+        data = self.mmap[start:start + first]
+        if first < size:
+            data += self.mmap[_HEADER_SIZE:_HEADER_SIZE + size - first]
+        return data
+
+    @property
+    def lag(self):
+        return self._get(_WRITTEN) - self._get(_READ)
+
+    def readable(self):
+        return self._get(_HEAD) > self._get(_TAIL)
+
+    def notify(self):
+        """
+        Wake any consumer waiting on this ring.
+        """
+        if not self.mmap[_WAITING]:
+            return
+        self.mmap[_WAITING] = 0
+        if self._writer is None:
+            try:
+                self._writer = os.open(
+                    self.fifo, os.O_WRONLY | os.O_NONBLOCK)
+            except OSError as e:
+                # no consumer has the fifo open
+                if e.errno == errno.ENXIO:
+                    return
+                raise
+        try:
+            os.write(self._writer, b'\0')
+        except (BlockingIOError, BrokenPipeError):
+            pass
+
+    @contextlib.contextmanager
+    def _writing(self):
+        if self._lock is None:
+            yield
+            return
+        fcntl.flock(self._lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock, fcntl.LOCK_UN)
+
+    def finish(self):
+        """
+        Record that a producer has finished writing.
+
+        Returns
+        -------
+        int
+            Number of producers that have finished.
+        """
+        with self._writing():
+            finished = self._get(_FINISHED) + 1
+            self._set(_FINISHED, finished)
+        return finished
+
+    def write(self, records, max_size=None):
+        """
+        Append `records`, blocking while the ring is full.
+
+        Parameters
+        ----------
+        records : Iterable[Tuple[int, bytes]]
+            Record kind and payload pairs.
+        max_size : Optional[int]
+            Also block while this many records are unread.
+        """
+        with self._writing():
+            self._write(records, max_size)
+
+    def _write(self, records, max_size):
+        for kind, payload in records:
+            size = _RECORD.size + len(payload)
+            if size > self.capacity:
+                raise ValueError(
+                    'Record of {} bytes is larger than the {} byte buffer '
+                    '{!r}'.format(size, self.capacity, self.path))
+
+            head = self._get(_HEAD)
+            delay = 0.0005
+            while head + size - self._get(_TAIL) > self.capacity \
+                    or (max_size is not None and self.lag >= max_size):
+                self.notify()
+                time.sleep(delay)
+                delay = min(delay * 2, self.BACKOFF)
+
+            self._copy_in(head, _RECORD.pack(len(payload), kind))
+            self._copy_in(head + _RECORD.size, payload)
+            self._set(_HEAD, head + size)
+            self._set(_WRITTEN, self._get(_WRITTEN) + 1)
+            if kind == _DONE:
+                self._set(_ENDED, head + 1)
+
+        self.notify()
+
+    def ended(self):
+        """
+        Get the data of the `DONE` record ending the ring, or None when it
+        hasn't ended.
+        """
+        ended = self._get(_ENDED)
+        if not ended:
+            return None
+        length, kind = _RECORD.unpack(self._copy_out(ended - 1, _RECORD.size))
+        if kind != _DONE \
+                or ended - 1 + _RECORD.size + length != self._get(_HEAD):
+            return None
+        return self._copy_out(ended - 1 + _RECORD.size, length)
+
+    def reset(self):
+        """
+        Remove the `DONE` record ending the ring, if any, and forget the
+        producers that have finished, so it can be written to again.
+        """
+        with self._writing():
+            if self.ended() is not None:
+                self._set(_HEAD, self._get(_ENDED) - 1)
+                self._set(_WRITTEN, self._get(_WRITTEN) - 1)
+            self._set(_ENDED, 0)
+            self._set(_FINISHED, 0)
+
+    def read(self, count, defer=False):
+        """
+        Consume up to `count` data records.
+
+        A `DONE` record is left in place so any other consumers see it too.
+        When `defer`, the records are only removed once they're `commit`ted,
+        so they're read again if we fail before then. Only a ring's sole
+        consumer may defer.
+
+        Returns
+        -------
+        Tuple[List[Tuple[int, bytes]], bool]
+            Kind and payload of the records read and whether the end of the
+            stream was reached.
+        """
+        records = []
+        done = False
+        fcntl.flock(self.fd, fcntl.LOCK_EX)
+        try:
+            head = self._get(_HEAD)
+            tail = self._claimed
+            if tail is None:
+                tail = self._get(_TAIL)
+            read = 0
+            while tail < head and len(records) < count:
+                length, kind = _RECORD.unpack(
+                    self._copy_out(tail, _RECORD.size))
+                if kind == _DONE:
+                    done = True
+                    break
+                if kind in (_DATA, _KEYED):
+                    records.append(
+                        (kind, self._copy_out(tail + _RECORD.size, length)))
+                tail += _RECORD.size + length
+                read += 1
+            if read and defer:
+                self._claimed = tail
+                self._claims += read
+            elif read:
+                self._set(_TAIL, tail)
+                self._set(_READ, self._get(_READ) + read)
+        finally:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+        return records, done
+
+    def commit(self):
+        """
+        Remove the records we've read with `defer`.
+        """
+        if self._claimed is None:
+            return
+        fcntl.flock(self.fd, fcntl.LOCK_EX)
+        try:
+            self._set(_TAIL, self._claimed)
+            self._set(_READ, self._get(_READ) + self._claims)
+        finally:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+        self._claimed = None
+        self._claims = 0
+
+    def reader(self):
+        """
+        File descriptor that becomes readable once the producer notifies us.
+        """
+        if self._reader is None:
+            # opening read-write means we never see EOF when producers close
+            self._reader = os.open(self.fifo, os.O_RDWR | os.O_NONBLOCK)
+        return self._reader
+
+    def drain(self):
+        try:
+            while os.read(self._reader, 4096):
+                pass
+        except BlockingIOError:
+            pass
+
+
+class SharedMemoryEdge(AbstractRemoteEdge):
+    """
+    Edge backed by ring buffers in memory mapped files, so processes on the
+    same host can exchange records without an external service.
+
+    Each stream is a fixed size file under `root` (`/dev/shm/flo` when
+    available). Consumers of a stream always compete for its records, as if
+    they were all in the same `group`, and its files are only removed by
+    `delete`, as other consumers may not have opened it yet when one reads
+    its `DONE` marker.
+
+    A `resumable` consumer, which is assumed to be the only consumer of its
+    streams, only removes records once it has processed them, so pulling
+    again after a failure resumes from the first batch it hadn't finished.
+    """
+
+    # consumers always compete
+    BROADCAST = False
+
+    # bytes per stream buffer
+    CAPACITY = 16 * 1024 * 1024
+
+    # records read from a stream per lock acquisition
+    READ_COUNT = 64
+
+    # seconds a consumer waits between checks if it misses a notification
+    POLL_INTERVAL = 0.1
+
+    _KINDS = {
+        AbstractRemoteEdge.INIT: _INIT,
+        AbstractRemoteEdge.DONE: _DONE,
+    }
+
+    def __init__(self, *args, capacity=None, root=None, **kwargs):
+        super(SharedMemoryEdge, self).__init__(*args, **kwargs)
+        self.capacity = capacity or self.CAPACITY
+        self.root = root or os.environ.get('FLO_SHM_DIR') or _default_root()
+        self._rings = {}  # type: Dict[str, _Ring]
+
+    def _path(self, id_):
+        return os.path.join(self.root, hashlib.sha1(id_.encode()).hexdigest())
+
+    def _ring(self, id_):
+        ring = self._rings.get(id_)
+        if ring is None:
+            ring = self._rings[id_] = _Ring(
+                self._path(id_), self.capacity, shared=self.producers > 1)
+        return ring
+
+    def send(self, data, key=b'NULL'):
+        self.send_many((data,), key=key)
+
+    def send_many(self, items, key=b'NULL'):
+        if len(self.ids) > 1:
+            items = list(items)
+        kind = self._KINDS.get(key, _DATA if key == b'NULL' else _KEYED)
+        prefix = _KEY.pack(len(key)) + key if kind == _KEYED else b''
+        for id_ in self.ids:
+            if kind in (_DATA, _KEYED):
+                encode = self._codec(id_).encode
+                records = ((kind, prefix + encode(x)) for x in items)
+                max_size = self.max_size
+            else:
+                # markers carry their data as is
+                records = ((kind, x) for x in items)
+                max_size = None
+            self._ring(id_).write(records, max_size=max_size)
+
+    @property
+    def resumable(self):
+        """
+        Whether we only remove records once we've processed them. Consumers
+        in a group, or without a `name`, may be competing for the records.
+        """
+        return self.name is not None and self.group is None
+
+    def backlog(self):
+        return sum(self._ring(x).lag for x in self.ids)
+
+    def done(self):
+        try:
+            for id_ in self.ids:
+                if not os.path.exists(self._path(id_)) \
+                        or self._ring(id_).ended() != b'NULL':
+                    return False
+            return True
+        finally:
+            self.close()
+
+    def reset(self):
+        try:
+            for id_ in self.ids:
+                if os.path.exists(self._path(id_)):
+                    self._ring(id_).reset()
+        finally:
+            self.close()
+
+    def _release(self):
+        last = True
+        for id_ in self.ids:
+            last = self._ring(id_).finish() >= self.producers and last
+        return last
+
+    def _wait(self, rings, timeout=None):
+        readers = [x.reader() for x in rings]
+        for ring in rings:
+            ring.mmap[_WAITING] = 1
+        # check again in case a record arrived before the flags were set
+        if any(x.readable() for x in rings):
+            return
+        if timeout is None:
+            timeout = self.POLL_INTERVAL
+        ready, _, _ = select.select(
+            readers, [], [], min(timeout, self.POLL_INTERVAL))
+        for ring in rings:
+            if ring.reader() in ready:
+                ring.drain()
+
+    def _pull(self, max_size, max_wait):
+        """
+        Pull lists of up to `max_size` records along with their keys, see
+        `pull_batches`.
+        """
+        active = collections.deque(self.ids)
+        decoders = {x: self._codec(x).decode for x in self.ids}
+        defer = self.resumable
+
+        batch = []  # type: List[Tuple[bytes, Any]]
+        deadline = None
+        try:
+            while active:
+                found = False
+                for _ in range(len(active)):
+                    if len(batch) >= max_size:
+                        break
+                    id_ = active.popleft()
+                    records, done = self._ring(id_).read(
+                        min(self.READ_COUNT, max_size - len(batch)),
+                        defer=defer)
+                    if not done:
+                        # allows for round robin
+                        active.append(id_)
+                    for kind, payload in records:
+                        found = True
+                        key = b'NULL'
+                        if kind == _KEYED:
+                            size = _KEY.unpack_from(payload)[0] + _KEY.size
+                            key = payload[_KEY.size:size]
+                            payload = payload[size:]
+                        batch.append((key, decoders[id_](payload)))
+
+                if batch and deadline is None:
+                    deadline = time.monotonic() + max_wait
+                if batch and (len(batch) >= max_size or not active or (
+                        not found and time.monotonic() >= deadline)):
+                    yield batch
+                    batch = []
+                    deadline = None
+                    # it's been processed
+                    for ring in self._rings.values():
+                        ring.commit()
+                elif not found and active:
+                    timeout = None
+                    if deadline is not None:
+                        timeout = max(deadline - time.monotonic(), 0)
+                    self._wait([self._ring(x) for x in active], timeout)
+        finally:
+            self.close()
+
+    def pull(self):
+        for batch in self._pull(self.READ_COUNT, 0.0):
+            for key, data in batch:
+                self.key = key
+                yield data
+
+    def pull_batches(self, max_size, max_wait=0.0):
+        for batch in self._pull(max_size, max_wait):
+            self.key = batch[-1][0]
+            yield [x[1] for x in batch]
+
+    def delete(self):
+        self.close()
+        for id_ in self.ids:
+            _Ring.remove(self._path(id_))
+
+    def close(self):
+        for ring in self._rings.values():
+            ring.close()
+        self._rings.clear()
+
+    def stop(self, failed=False):
+        super(SharedMemoryEdge, self).stop(failed=failed)
+        self.close()
@@ -0,0 +1,49 @@
+import asyncio
+import inspect
+
+from .base import AbstractRunner
+from ..edge.aio import AsyncInMemoryEdge
+from ...exceptions import RunnerExecutionError
+
+from typing import *
+
+
+if TYPE_CHECKING:
+    from ...api import Node
+
+
+class AsyncioRunner(AbstractRunner):
+    """
+    Runner that executes `async def` nodes concurrently on a single event
+    loop.
+
+    Nodes iterate their in ports with `async for` and `await` their out port
+    sends. Edges must be asynchronous, e.g. `AsyncInMemoryEdge` or
+    `AsyncRedisEdge`. Synchronous nodes can still be connected to them by
+    running those on a `LocalRunner` (`InMemoryEdge`) or any `RedisEdge`
+    runner respectively.
+    """
+
+    DEFAULT_EDGE = AsyncInMemoryEdge
+
+    FUSIBLE = False
+
+    def execute(self):
+        for node in self.instances():
+            if not inspect.iscoroutinefunction(node.fn):
+                raise TypeError(
+                    '{!r} can only execute coroutine functions, not '
+                    '{!r}'.format(self, node))
+        asyncio.run(self._execute())
+
+    async def _execute(self):
+        nodes = self.instances()
+        results = await asyncio.gather(
+            *(x.call_async() for x in nodes), return_exceptions=True)
+
+        errors = {}  # type: Dict[Node, BaseException]
+        for node, result in zip(nodes, results):
+            if isinstance(result, BaseException):
+                errors[node] = result
+        if errors:
+            raise RunnerExecutionError(self, errors)
@@ -1,5 +1,6 @@
+import importlib
+
 from ..edge.base import AbstractBaseEdge
-from ..edge.redis import RedisEdge
 
 from typing import *
 
@@ -8,6 +9,31 @@ if TYPE_CHECKING:
     from ...api import Node
 
 
+class _LazyEdge(object):
+    """
+    Edge class attribute that's imported on first access, so the backends of
+    runners that aren't used are never imported, e.g. `redis`.
+    """
+
+    def __init__(self, path: str):
+        """
+        Parameters
+        ----------
+        path : str
+            Module and name of the edge class, relative to this package, e.g.
+            '..edge.redis.RedisEdge'.
+        """
+        self.path = path
+        self._edge = None  # type: Optional[Type[AbstractBaseEdge]]
+
+    def __get__(self, instance, owner):
+        if self._edge is None:
+            module, name = self.path.rsplit('.', 1)
+            self._edge = getattr(
+                importlib.import_module(module, __package__), name)
+        return self._edge
+
+
 class AbstractRunner(object):
     """
     Abstract Runner object.
@@ -17,6 +43,9 @@ class AbstractRunner(object):
 
     DEFAULT_EDGE = None  # type: Type[AbstractBaseEdge]
 
+    # whether chains of our nodes may be executed as one, see `Graph.optimize`
+    FUSIBLE = True
+
     def __init__(
             self,
             edge: Type[AbstractBaseEdge] = None,
@@ -27,8 +56,16 @@ class AbstractRunner(object):
     def edge(
             self,
             *ids,
+            **options
     ) -> AbstractBaseEdge:
-        return self._edge(*ids)
+        return self._edge(*ids, **options)
+
+    def __getstate__(self):
+        # Nodes reference their runner, so avoid pickling every other node
+        # along with each of them.
+        state = self.__dict__.copy()
+        state['nodes'] = []
+        return state
 
     def add(
             self,
@@ -39,6 +76,13 @@ class AbstractRunner(object):
             if n not in self.nodes:
                 self.nodes.append(n)
 
+    def instances(self) -> List['Node']:
+        """
+        Get the nodes to execute, with any replicated nodes expanded into each
+        of their replicas.
+        """
+        return [x for node in self.nodes for x in node.instances()]
+
     def execute(self) -> None:
         """
         Entrypoint for executing the runner.
@@ -53,6 +97,12 @@ class AbstractRunner(object):
         """
         raise NotImplementedError
 
+    def shutdown(self) -> None:
+        """
+        Release any resources the runner holds onto between `execute` calls.
+        """
+        pass
+
 
 class AbstractRemoteRunner(AbstractRunner):
     """
@@ -60,4 +110,4 @@ class AbstractRemoteRunner(AbstractRunner):
     separate processes.
     """
 
-    DEFAULT_EDGE = RedisEdge
+    DEFAULT_EDGE = _LazyEdge('..edge.redis.RedisEdge')
@@ -0,0 +1,167 @@
+import os
+import threading
+import functools
+import collections
+
+import greenlet
+
+from .base import AbstractRunner
+from .utils import ordered
+from ..edge.local import InMemoryEdge
+from ...exceptions import RunnerExecutionError
+
+from typing import *
+
+
+if TYPE_CHECKING:
+    from ...api import Node
+
+
+_local = threading.local()
+
+
+class _Hub(object):
+    """
+    Runs node greenlets on a single thread, resuming each once something it's
+    parked on changes.
+    """
+
+    def __init__(self):
+        self.greenlet = None  # type: greenlet.greenlet
+        self._ready = collections.deque()
+        self._cond = threading.Condition()
+
+    def schedule(self, glet):
+        """
+        Queue `glet` to be resumed. Safe to call from any thread.
+        """
+        with self._cond:
+            self._ready.append(glet)
+            self._cond.notify()
+
+    def park(self):
+        """
+        Suspend the current greenlet until it's scheduled again.
+        """
+        self.greenlet.switch()
+
+    def run(self, nodes, errors):
+        self.greenlet = greenlet.getcurrent()
+        _local.hub = self
+
+        def _run(node):
+            try:
+                node()
+            except Exception as e:
+                errors[node] = e
+
+        running = set()
+        for node in nodes:
+            glet = greenlet.greenlet(functools.partial(_run, node))
+            running.add(glet)
+            self.schedule(glet)
+
+        try:
+            while running:
+                with self._cond:
+                    while not self._ready:
+                        self._cond.wait()
+                    glet = self._ready.popleft()
+                if glet.dead:
+                    continue
+                glet.switch()
+                if glet.dead:
+                    running.discard(glet)
+        finally:
+            _local.hub = None
+
+
+class _Parker(object):
+    """
+    `InMemoryEdge` waiter that parks the current greenlet rather than blocking
+    the thread.
+    """
+
+    def __init__(self, hub, lock):
+        self.hub = hub
+        self.lock = lock
+        self.greenlet = greenlet.getcurrent()
+        self.notified = False
+
+    def notify(self):
+        if not self.notified:
+            self.notified = True
+            self.hub.schedule(self.greenlet)
+
+    def wait(self):
+        self.lock.release()
+        try:
+            self.hub.park()
+        finally:
+            self.lock.acquire()
+            self.notified = False
+
+
+class CooperativeEdge(InMemoryEdge):
+    """
+    In-memory edge that parks nodes run by a `CooperativeRunner` while they
+    wait, instead of blocking the thread they share.
+    """
+
+    def _waiter(self):
+        hub = getattr(_local, 'hub', None)
+        if hub is None or greenlet.getcurrent() is hub.greenlet:
+            return super(CooperativeEdge, self)._waiter()
+        return _Parker(hub, self._lock)
+
+    def pull_batches(self, max_size, max_wait=0.0):
+        # a parked node can't time out, so batches are only what's waiting
+        return super(CooperativeEdge, self).pull_batches(max_size)
+
+
+class CooperativeRunner(AbstractRunner):
+    """
+    Local runner that executes every node as a greenlet on a fixed number of
+    threads, so graphs can have far more nodes than threads.
+
+    Nodes only give up their thread while waiting on a `CooperativeEdge`.
+    Anything else that blocks (e.g. `time.sleep`, or other edges) holds up
+    every node sharing the thread.
+    """
+
+    DEFAULT_EDGE = CooperativeEdge
+
+    # the greenlets of a fused node's members aren't scheduled by our hubs
+    FUSIBLE = False
+
+    def __init__(
+            self,
+            edge=None,
+            threads: Optional[int] = None,
+    ):
+        """
+        Parameters
+        ----------
+        edge : Optional[Type[AbstractBaseEdge]]
+        threads : Optional[int]
+            Number of threads to spread the nodes across.
+        """
+        super(CooperativeRunner, self).__init__(edge=edge)
+        self.threads = threads or min(32, (os.cpu_count() or 1) + 4)
+
+    def execute(self):
+        nodes = ordered(self.instances())
+        count = min(self.threads, len(nodes))
+
+        errors = {}  # type: Dict[Node, Exception]
+        threads = []
+        for i in range(count):
+            thread = threading.Thread(
+                target=_Hub().run, args=(nodes[i::count], errors))
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            thread.join()
+
+        if errors:
+            raise RunnerExecutionError(self, errors)
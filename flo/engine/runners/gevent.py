@@ -8,6 +8,10 @@ from ...exceptions import RunnerExecutionError
 
 class GeventEdge(RedisEdge):
 
+    def _wait(self):
+        # Yield to other greenlets while blocked on backpressure.
+        gevent.sleep(self.THROTTLE_INTERVAL)
+
     def _pre_poll(self):
         # We want to avoid blocking so we sleep at the beginning of each edge
         # poll to ensure we don't spend all our time in the blocked xread call.
@@ -25,6 +29,9 @@ class GeventRunner(AbstractRemoteRunner):
 
     DEFAULT_EDGE = GeventEdge
 
+    # the greenlets of a fused node's members aren't scheduled by gevent
+    FUSIBLE = False
+
     def execute(self):
         errors = {}
 
@@ -33,7 +40,7 @@ class GeventRunner(AbstractRemoteRunner):
                 errors[n] = g.exception
 
         greenlets = []
-        for node in self.nodes:
+        for node in self.instances():
             greenlet = gevent.spawn(node)
             greenlet.rawlink(functools.partial(_check_error, node))
             greenlets.append(greenlet)
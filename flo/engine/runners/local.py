@@ -22,8 +22,9 @@ class LocalRunner(AbstractRunner):
 
         results = {}  # type: Dict[Node, Future]
         # NOTE: Only viable for a moderate # of nodes (< 1000?)
-        with ThreadPoolExecutor(max_workers=len(self.nodes)) as executor:
-            for node in self.nodes:
+        nodes = self.instances()
+        with ThreadPoolExecutor(max_workers=len(nodes)) as executor:
+            for node in nodes:
                 results[node] = executor.submit(node)
 
         errors = {}
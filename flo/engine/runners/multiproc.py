@@ -3,11 +3,27 @@ try:
 except ImportError:
     import pickle
 
+import os
+import queue
+import itertools
 import multiprocessing
 
+from tblib import pickling_support
+
 from .base import AbstractRemoteRunner
+from .utils import ordered
 from ...exceptions import RunnerExecutionError
 
+from typing import *
+
+
+if TYPE_CHECKING:
+    from ...api import Node
+
+
+# keep the tracebacks of exceptions raised by nodes in other processes
+pickling_support.install()
+
 
 class Process(multiprocessing.Process):
     def __init__(self, *args, **kwargs):
@@ -32,12 +48,21 @@ class Process(multiprocessing.Process):
         return self._exception
 
 
+def _run(runner, node):
+    """
+    Entrypoint of `SubProcessRunner` processes.
+    """
+    # nodes are shipped without their runner
+    node.set_runner(runner)
+    node()
+
+
 class SubProcessRunner(AbstractRemoteRunner):
 
     def execute(self):
         results = {}
-        for node in self.nodes:
-            proc = Process(target=node)
+        for node in self.instances():
+            proc = Process(target=_run, args=(self, node))
             results[node] = proc
             proc.start()
         for proc in results.values():
@@ -50,3 +75,181 @@ class SubProcessRunner(AbstractRemoteRunner):
                 errors[node] = e
         if errors:
             raise RunnerExecutionError(self, errors)
+
+
+def _dump_exception(e):
+    try:
+        return pickle.dumps(e, protocol=pickle.HIGHEST_PROTOCOL)
+    except Exception:
+        return pickle.dumps(RuntimeError(repr(e)))
+
+
+def _worker(tasks, results, registry, runner, cpu):
+    """
+    Entrypoint of `ProcessPoolRunner` worker processes.
+
+    Runs nodes from `tasks` until given `None`, putting each node's token and
+    any pickled exception onto `results`. Nodes are shipped without their
+    runner, which each worker is given once instead.
+    """
+    if cpu is not None:
+        os.sched_setaffinity(0, {cpu})
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        token, payload = task
+        try:
+            if payload is None:
+                node = registry[token]
+            else:
+                node = pickle.loads(payload)
+                node.set_runner(runner)
+            node()
+        except Exception as e:
+            results.put((token, _dump_exception(e)))
+        else:
+            results.put((token, None))
+
+
+class ProcessPoolRunner(AbstractRemoteRunner):
+    """
+    Runner that executes nodes on a fixed pool of worker processes, which are
+    kept alive across `execute` calls until `shutdown`.
+
+    Nodes are scheduled so upstream nodes are started before the nodes they
+    feed. Each worker runs one node at a time though, so a node whose
+    consumers are still queued behind it can block on `max_size`
+    backpressure forever. Make sure there are enough workers to run any
+    backpressured chain of nodes concurrently.
+
+    With a 'fork' context, nodes added before the pool starts are inherited
+    by the workers. Otherwise nodes are pickled, which requires their
+    functions to be importable or picklable by `dill`.
+    """
+
+    # seconds between checks that the workers are still alive
+    POLL_INTERVAL = 1.0
+
+    def __init__(
+            self,
+            edge=None,
+            workers: Optional[int] = None,
+            context: Optional[str] = None,
+            cpus: Optional[Sequence[int]] = None,
+    ):
+        """
+        Parameters
+        ----------
+        edge : Optional[Type[AbstractBaseEdge]]
+        workers : Optional[int]
+            Number of worker processes. Defaults to the number of CPUs, but
+            at least two so a producer and its consumer can stream
+            concurrently.
+        context : Optional[str]
+            Multiprocessing start method, e.g. 'fork', 'forkserver' or
+            'spawn'.
+        cpus : Optional[Sequence[int]]
+            Pin each worker to one of these CPUs, round robin.
+        """
+        super(ProcessPoolRunner, self).__init__(edge=edge)
+        self.workers = workers or max(os.cpu_count() or 1, 2)
+        self.context = context
+        self.cpus = cpus
+
+        self._pool = None  # type: List[multiprocessing.Process]
+        self._tasks = None  # type: multiprocessing.Queue
+        self._results = None  # type: multiprocessing.Queue
+        self._tokens = {}  # type: Dict[Node, int]
+        self._counter = itertools.count()
+        # nodes the workers inherited when they were forked
+        self._inherited = set()  # type: Set[int]
+
+    def __getstate__(self):
+        state = super(ProcessPoolRunner, self).__getstate__()
+        for k in ('_pool', '_tasks', '_results', '_counter'):
+            state.pop(k)
+        state['_tokens'] = {}
+        state['_inherited'] = set()
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._pool = self._tasks = self._results = None
+        self._counter = itertools.count()
+
+    def _token(self, node):
+        token = self._tokens.get(node)
+        if token is None:
+            token = self._tokens[node] = next(self._counter)
+        return token
+
+    def _start(self):
+        if self._pool is not None:
+            return
+
+        ctx = multiprocessing.get_context(self.context)
+
+        registry = {}
+        if ctx.get_start_method() == 'fork':
+            registry = {self._token(x): x for x in self.instances()}
+        self._inherited = set(registry)
+
+        self._tasks = ctx.Queue()
+        self._results = ctx.Queue()
+        self._pool = []
+        for i in range(self.workers):
+            cpu = self.cpus[i % len(self.cpus)] if self.cpus else None
+            proc = ctx.Process(
+                target=_worker,
+                args=(self._tasks, self._results, registry, self, cpu),
+                daemon=True)
+            proc.start()
+            self._pool.append(proc)
+
+    def execute(self):
+        self._start()
+        pool, tasks, results = self._pool, self._tasks, self._results
+
+        pending = {}  # type: Dict[int, Node]
+        for node in ordered(self.instances()):
+            token = self._token(node)
+            if token in self._inherited:
+                payload = None
+            else:
+                payload = pickle.dumps(node, protocol=pickle.HIGHEST_PROTOCOL)
+            pending[token] = node
+            tasks.put((token, payload))
+        # inherited nodes may have changed by the next execution
+        self._inherited = set()
+
+        errors = {}
+        while pending:
+            try:
+                token, e = results.get(timeout=self.POLL_INTERVAL)
+            except queue.Empty:
+                if all(x.is_alive() for x in pool):
+                    continue
+                # The pool can't be trusted once a worker dies mid-node.
+                self.shutdown()
+                for node in pending.values():
+                    errors[node] = RuntimeError('Worker process died')
+                break
+            node = pending.pop(token)
+            if e is not None:
+                errors[node] = pickle.loads(e)
+
+        if errors:
+            raise RunnerExecutionError(self, errors)
+
+    def shutdown(self):
+        if self._pool is None:
+            return
+        for proc in self._pool:
+            if proc.is_alive():
+                self._tasks.put(None)
+        for proc in self._pool:
+            proc.join(timeout=self.POLL_INTERVAL)
+            if proc.is_alive():
+                proc.terminate()
+        self._pool = self._tasks = self._results = None
@@ -4,6 +4,10 @@ from ...exceptions import RunnerCompatibilityError
 from typing import *
 
 
+if TYPE_CHECKING:
+    from ...api import Node
+
+
 def compatible(*runners: AbstractRunner):
     """
     Raises an error if `runners` are not compatible with each other.
@@ -31,3 +35,47 @@ def compatible(*runners: AbstractRunner):
             raise RunnerCompatibilityError(
                 'Runner {!r} edge is not compatible with '
                 '{!r}'.format(runner, edge))
+
+
+def ordered(nodes: Sequence['Node']) -> List['Node']:
+    """
+    Sort `nodes` so each one comes after any of `nodes` feeding its in ports.
+
+    Nodes are otherwise kept in their given order. Nodes that are part of a
+    cycle are left at the end.
+
+    Parameters
+    ----------
+    nodes : Sequence[Node]
+
+    Returns
+    -------
+    List[Node]
+    """
+    byid = {}
+    for node in nodes:
+        byid.setdefault(node.id, []).append(node)
+
+    upstream = {}
+    for node in nodes:
+        ids = set()
+        for name in node.inports:
+            for port in node.initializations.get(name, ()):
+                ids.add(port.id.rsplit('/', 1)[0])
+        upstream[node] = [x for i in ids for x in byid.get(i, ())
+                          if x is not node]
+
+    result = []
+    visited = set()
+    remaining = list(nodes)
+    while remaining:
+        ready = [x for x in remaining
+                 if all(u in visited for u in upstream[x])]
+        if not ready:
+            # cycle
+            ready = remaining
+        for node in ready:
+            visited.add(node)
+            result.append(node)
+        remaining = [x for x in remaining if x not in visited]
+    return result
@@ -13,6 +13,10 @@ class RunnerCompatibilityError(Exception):
     pass
 
 
+class GraphPlanError(FloError):
+    pass
+
+
 class RunnerExecutionError(FloError):
     def __init__(self, runner, errors):
         msg = ['Errors in {!r} execution:'.format(runner)]
@@ -0,0 +1,466 @@
+"""
+Metrics of executing nodes and their ports.
+
+Metrics are only collected once enabled, e.g.
+
+    registry = flo.metrics.enable()
+    graph.submit()
+    print(flo.metrics.prometheus(registry))
+
+When disabled, nodes use their edges directly and nothing is measured. Once
+enabled, nodes prepared afterwards record:
+
+- `flo_node_calls_total`, `flo_node_errors_total` and
+  `flo_node_seconds_total`: executions of each node's function and the wall
+  time they took, labeled by `node`.
+- `flo_records_in_total` and `flo_records_out_total`: records received and
+  sent by each port, labeled by `port`.
+- `flo_receive_wait_seconds`: a summary of how long a sample of the records
+  received by each in port were waited for. Nodes that spend a large part of
+  their time waiting are starved by whatever is upstream of them.
+- `flo_edge_backlog`: records waiting to be consumed by each in port, when
+  its edge can tell (see `AbstractBaseEdge.backlog`), and
+  `flo_edge_latency_seconds`: the time a record currently waits between
+  being sent and received, estimated from the backlog and the rate it's
+  consumed at. Both overcount when the edge's backlog includes records
+  already read, e.g. the length of a `RedisEdge` stream, which is only
+  trimmed every `TRIM_INTERVAL` records, and only once its number of
+  consumers is known (as it is for graphs that are submitted).
+
+Counters are only added to the registry every `SAMPLE_INTERVAL` records, and
+when a port's iteration ends, to keep the cost per record to a couple of
+integer operations.
+
+Metrics are collected per process. Nodes executed in other processes, e.g. by
+a `SubprocessRunner`, record to the registry of their own process.
+"""
+import time
+import inspect
+import threading
+import collections
+
+from typing import *
+
+
+if TYPE_CHECKING:
+    import logging
+    from .api import Node, _BasePort
+    from .engine.edge.base import AbstractBaseEdge
+
+
+# a metric's name and its sorted labels
+_Key = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+# number of records per port between updates of the registry
+SAMPLE_INTERVAL = 100
+
+
+class Registry(object):
+    """
+    In-process store of metrics, keyed by name and labels.
+    """
+
+    COUNTER = 'counter'
+    GAUGE = 'gauge'
+    SUMMARY = 'summary'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = \
+            collections.OrderedDict()  # type: Dict[_Key, float]
+        self._types = {}  # type: Dict[str, str]
+
+    def __repr__(self):
+        return '<{}({} metrics)>'.format(
+            self.__class__.__name__, len(self._values))
+
+    def inc(self, name, value=1, **labels):
+        """
+        Add `value` to the counter `name`.
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._types.setdefault(name, self.COUNTER)
+            self._values[key] = self._values.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        """
+        Set the gauge `name` to `value`.
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._types.setdefault(name, self.GAUGE)
+            self._values[key] = value
+
+    def observe(self, name, value, **labels):
+        """
+        Add an observation of `value` to the summary `name`, stored as its
+        `_count` and `_sum`.
+        """
+        labels = tuple(sorted(labels.items()))
+        with self._lock:
+            self._types.setdefault(name, self.SUMMARY)
+            for suffix, x in (('_count', 1), ('_sum', value)):
+                key = (name + suffix, labels)
+                self._values[key] = self._values.get(key, 0) + x
+
+    def get(self, name, **labels) -> Optional[float]:
+        """
+        Get the current value of a metric, or None if it hasn't been
+        recorded.
+        """
+        return self._values.get((name, tuple(sorted(labels.items()))))
+
+    def snapshot(self) -> Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float]:
+        """
+        Get a copy of every metric's current value, keyed by name and
+        labels.
+        """
+        with self._lock:
+            return self._values.copy()
+
+    def types(self) -> Dict[str, str]:
+        with self._lock:
+            return self._types.copy()
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+            self._types.clear()
+
+
+_registry = None  # type: Optional[Registry]
+
+
+def enable(registry: Optional[Registry] = None) -> Registry:
+    """
+    Start collecting metrics of nodes prepared from now on.
+
+    Parameters
+    ----------
+    registry : Optional[Registry]
+        Where to record metrics, by default a new registry.
+
+    Returns
+    -------
+    Registry
+    """
+    global _registry
+    _registry = registry or Registry()
+    return _registry
+
+
+def disable():
+    """
+    Stop collecting metrics of nodes prepared from now on.
+    """
+    global _registry
+    _registry = None
+
+
+def get() -> Optional[Registry]:
+    """
+    Get the registry metrics are being recorded to, if enabled.
+    """
+    return _registry
+
+
+def prometheus(registry: Optional[Registry] = None) -> str:
+    """
+    Dump the metrics of `registry`, by default the enabled one, in the
+    Prometheus text exposition format.
+    """
+    registry = registry or _registry
+    if registry is None:
+        return ''
+
+    types = registry.types()
+    lines = []
+    typed = set()
+    for (name, labels), value in sorted(registry.snapshot().items()):
+        base = name
+        if name not in types:
+            base = name.rsplit('_', 1)[0]
+        if base not in typed:
+            typed.add(base)
+            lines.append('# TYPE {} {}'.format(base, types.get(base)))
+        if labels:
+            name += '{{{}}}'.format(','.join(
+                '{}="{}"'.format(k, str(v).replace('\\', '\\\\')
+                                 .replace('"', '\\"'))
+                for k, v in labels))
+        lines.append('{} {!r}'.format(name, float(value)))
+    return '\n'.join(lines) + '\n' if lines else ''
+
+
+class LogSink(object):
+    """
+    Periodically log the metrics of a registry, along with the rate each
+    counter changed at since the last time.
+
+    e.g.
+        with flo.metrics.LogSink(interval=10):
+            graph.submit()
+    """
+
+    def __init__(
+            self,
+            registry: Optional[Registry] = None,
+            interval: float = 10.0,
+            logger: Optional['logging.Logger'] = None,
+    ):
+        """
+        Parameters
+        ----------
+        registry : Optional[Registry]
+            Registry to log, by default the one enabled when starting.
+        interval : float
+            Seconds between logs.
+        logger : Optional[logging.Logger]
+        """
+        self.registry = registry
+        self.interval = interval
+        if logger is None:
+            import logging
+            logger = logging.getLogger(__name__)
+        self.logger = logger
+        self._stop = threading.Event()
+        self._thread = None  # type: Optional[threading.Thread]
+        self._last = None  # type: Optional[Tuple[float, Dict]]
+
+    def start(self):
+        if self.registry is None:
+            self.registry = _registry or enable()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.emit()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.emit()
+
+    def emit(self):
+        """
+        Log the current metrics.
+        """
+        now = time.monotonic()
+        values = self.registry.snapshot()
+        types = self.registry.types()
+        previous = self._last
+        self._last = (now, values)
+
+        lines = []
+        for (name, labels), value in values.items():
+            line = '{}{{{}}} {:g}'.format(
+                name, ','.join('{}={}'.format(k, v) for k, v in labels),
+                value)
+            if previous is not None and types.get(name) == Registry.COUNTER:
+                elapsed = now - previous[0]
+                delta = value - previous[1].get((name, labels), 0)
+                if elapsed > 0:
+                    line += ' ({:g}/s)'.format(delta / elapsed)
+            lines.append(line)
+        if lines:
+            self.logger.info('flo metrics:\n%s', '\n'.join(lines))
+
+
+class _MeteredEdge(object):
+    """
+    Proxy of a port's edge that counts the records passing through it.
+    """
+
+    def __init__(
+            self,
+            edge: 'AbstractBaseEdge',
+            port: '_BasePort',
+            registry: Registry,
+    ):
+        self.edge = edge
+        self.port = port.id
+        self.registry = registry
+        # records sent since the registry was last updated
+        self._sent = 0
+
+    def __repr__(self):
+        return '<{}({!r})>'.format(self.__class__.__name__, self.edge)
+
+    def __getattr__(self, item):
+        return getattr(self.edge, item)
+
+    def _flush_sent(self):
+        count, self._sent = self._sent, 0
+        if count:
+            self.registry.inc('flo_records_out_total', count, port=self.port)
+
+    # keyword arguments are passed on, e.g. the `route` of a
+    # `PartitionedEdge`
+
+    def push(self, data, **kwargs):
+        self._sent += 1
+        if self._sent >= SAMPLE_INTERVAL:
+            self._flush_sent()
+        return self.edge.push(data, **kwargs)
+
+    def _counted(self, items):
+        for data in items:
+            self._sent += 1
+            yield data
+        self._flush_sent()
+
+    def push_many(self, items, **kwargs):
+        if hasattr(items, '__len__'):
+            self._sent += len(items)
+            self._flush_sent()
+        else:
+            # count generators as they're consumed rather than holding them
+            # in memory
+            items = self._counted(items)
+        return self.edge.push_many(items, **kwargs)
+
+    def stop(self, failed=False):
+        self._flush_sent()
+        return self.edge.stop(failed=failed)
+
+    def _sample(self, count, started, backlog):
+        self.registry.inc('flo_records_in_total', count, port=self.port)
+        if backlog is None:
+            return
+        self.registry.set('flo_edge_backlog', backlog, port=self.port)
+        total = self.registry.get('flo_records_in_total', port=self.port)
+        elapsed = time.monotonic() - started
+        if total and elapsed > 0:
+            self.registry.set('flo_edge_latency_seconds',
+                              backlog * elapsed / total, port=self.port)
+
+    def __iter__(self):
+        started = time.monotonic()
+        count = 0
+        records = iter(self.edge)
+        try:
+            while True:
+                if count < SAMPLE_INTERVAL - 1:
+                    try:
+                        data = next(records)
+                    except StopIteration:
+                        break
+                    count += 1
+                else:
+                    t = time.perf_counter()
+                    try:
+                        data = next(records)
+                    except StopIteration:
+                        break
+                    self.registry.observe('flo_receive_wait_seconds',
+                                          time.perf_counter() - t,
+                                          port=self.port)
+                    self._sample(count + 1, started, self._backlog())
+                    count = 0
+                yield data
+        finally:
+            if count:
+                self._sample(count, started, self._backlog())
+
+    def pull_batches(self, max_size, max_wait=0.0):
+        started = time.monotonic()
+        batches = self.edge.pull_batches(max_size, max_wait)
+        while True:
+            t = time.perf_counter()
+            try:
+                batch = next(batches)
+            except StopIteration:
+                break
+            self.registry.observe('flo_receive_wait_seconds',
+                                  time.perf_counter() - t, port=self.port)
+            self._sample(len(batch), started, self._backlog())
+            yield batch
+
+    def _backlog(self):
+        backlog = self.edge.backlog()
+        if inspect.isawaitable(backlog):
+            # can't wait for it outside of the node's event loop
+            backlog.close()
+            return None
+        return backlog
+
+    async def _abacklog(self):
+        backlog = self.edge.backlog()
+        if inspect.isawaitable(backlog):
+            backlog = await backlog
+        return backlog
+
+    async def __aiter__(self):
+        started = time.monotonic()
+        count = 0
+        records = self.edge.__aiter__()
+        try:
+            while True:
+                sample = count >= SAMPLE_INTERVAL - 1
+                t = time.perf_counter() if sample else None
+                try:
+                    data = await records.__anext__()
+                except StopAsyncIteration:
+                    break
+                if sample:
+                    self.registry.observe('flo_receive_wait_seconds',
+                                          time.perf_counter() - t,
+                                          port=self.port)
+                    self._sample(count + 1, started, await self._abacklog())
+                    count = 0
+                else:
+                    count += 1
+                yield data
+        finally:
+            if count:
+                self._sample(count, started, await self._abacklog())
+
+
+def instrument(
+        node: 'Node',
+        kwargs: Dict[str, Any],
+        registry: Registry,
+):
+    """
+    Have the ports of a prepared node record their metrics to `registry`.
+    """
+    from .api import _BasePort
+
+    for port in kwargs.values():
+        if isinstance(port, _BasePort) and port.edge is not None \
+                and not isinstance(port.edge, _MeteredEdge):
+            port.edge = _MeteredEdge(port.edge, port, registry)
+
+
+class timed(object):
+    """
+    Context manager recording an execution of `node` to `registry`.
+    """
+
+    __slots__ = ('node', 'registry', 'started')
+
+    def __init__(self, node: 'Node', registry: Registry):
+        self.node = node.id
+        self.registry = registry
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.registry.inc('flo_node_calls_total', node=self.node)
+        self.registry.inc('flo_node_seconds_total',
+                          time.perf_counter() - self.started, node=self.node)
+        if exc_type is not None:
+            self.registry.inc('flo_node_errors_total', node=self.node)
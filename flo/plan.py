@@ -0,0 +1,197 @@
+from .engine.runners.utils import ordered
+from .exceptions import GraphPlanError
+
+from typing import *
+
+
+if TYPE_CHECKING:
+    from .api import Node
+
+
+class Plan(object):
+    """
+    The structure of a graph's nodes, as implied by the connections of their
+    in ports.
+
+    See `Graph.plan`.
+    """
+
+    def __init__(
+            self,
+            nodes: Sequence['Node'],
+            costs: Optional[Mapping[str, float]] = None,
+    ):
+        """
+        Parameters
+        ----------
+        nodes : Sequence[Node]
+        costs : Optional[Mapping[str, float]]
+            Estimated cost (e.g. seconds taken by a previous execution) of
+            each node, by node id. Nodes not in it cost 1.
+        """
+        self.nodes = list(nodes)
+        self.costs = {x: (costs or {}).get(x.id, 1.0) for x in self.nodes}
+
+        byid = {x.id: x for x in self.nodes}
+
+        # nodes feeding and fed by each node
+        self.upstream = {
+            x: [] for x in self.nodes}  # type: Dict[Node, List[Node]]
+        self.downstream = {
+            x: [] for x in self.nodes}  # type: Dict[Node, List[Node]]
+        # in ports connected to nothing, or to nodes outside of the graph
+        self.dangling = []  # type: List[Tuple[Node, str]]
+
+        for node in self.nodes:
+            for name in node.inports:
+                ports = node.initializations.get(name)
+                if not ports:
+                    self.dangling.append((node, name))
+                    continue
+                for port in ports:
+                    parent = byid.get(port.id.rsplit('/', 1)[0])
+                    if parent is None:
+                        self.dangling.append((node, name))
+                    elif parent not in self.upstream[node]:
+                        self.upstream[node].append(parent)
+                        self.downstream[parent].append(node)
+
+        self.cycles = self._cycles()
+
+        # topological order and the level of each node, i.e. the length of
+        # the longest path from a source to it
+        self.order = []  # type: List[Node]
+        self.levels = {}  # type: Dict[Node, int]
+        # total cost of the costliest path to each node, and its previous node
+        self._paths = {}  # type: Dict[Node, Tuple[float, Optional[Node]]]
+        if not self.cycles:
+            self._sort()
+
+    def __repr__(self):
+        return '<{}({} nodes)>'.format(
+            self.__class__.__name__, len(self.nodes))
+
+    def _cycles(self) -> List[List['Node']]:
+        """
+        Find the strongly connected components of the graph that are cycles,
+        with Tarjan's algorithm.
+        """
+        index = {}
+        lowlink = {}
+        stack = []
+        onstack = set()
+        results = []
+
+        for root in self.nodes:
+            if root in index:
+                continue
+            # iterative, to not hit the recursion limit on deep graphs
+            work = [(root, iter(self.downstream[root]))]
+            index[root] = lowlink[root] = len(index)
+            stack.append(root)
+            onstack.add(root)
+            while work:
+                node, children = work[-1]
+                for child in children:
+                    if child not in index:
+                        index[child] = lowlink[child] = len(index)
+                        stack.append(child)
+                        onstack.add(child)
+                        work.append((child, iter(self.downstream[child])))
+                        break
+                    elif child in onstack:
+                        lowlink[node] = min(lowlink[node], index[child])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        lowlink[parent] = min(lowlink[parent], lowlink[node])
+                    if lowlink[node] == index[node]:
+                        component = []
+                        while True:
+                            x = stack.pop()
+                            onstack.discard(x)
+                            component.append(x)
+                            if x is node:
+                                break
+                        if len(component) > 1 \
+                                or node in self.downstream[node]:
+                            results.append(component[::-1])
+        return results
+
+    def _sort(self):
+        self.order = ordered(self.nodes)
+        for node in self.order:
+            level = 0
+            path = (0.0, None)
+            for parent in self.upstream[node]:
+                level = max(level, self.levels[parent] + 1)
+                if self._paths[parent][0] > path[0]:
+                    path = (self._paths[parent][0], parent)
+            self.levels[node] = level
+            self._paths[node] = (path[0] + self.costs[node], path[1])
+
+    @property
+    def sources(self) -> List['Node']:
+        """
+        Nodes without any upstream nodes.
+        """
+        return [x for x in self.nodes if not self.upstream[x]]
+
+    @property
+    def sinks(self) -> List['Node']:
+        """
+        Nodes without any downstream nodes.
+        """
+        return [x for x in self.nodes if not self.downstream[x]]
+
+    @property
+    def critical_path(self) -> List['Node']:
+        """
+        The costliest path through the graph, from a source to a sink. The
+        graph can't execute faster than the nodes on it.
+        """
+        if not self._paths:
+            return []
+        node = max(self.order, key=lambda x: self._paths[x][0])
+        path = []
+        while node is not None:
+            path.append(node)
+            node = self._paths[node][1]
+        return path[::-1]
+
+    @property
+    def cost(self) -> float:
+        """
+        Total cost of the `critical_path`.
+        """
+        return sum(self.costs[x] for x in self.critical_path)
+
+    def schedule(self) -> List['Node']:
+        """
+        Get the order to start the nodes in: downstream nodes first, so
+        they're consuming before their sources start producing, and those on
+        the `critical_path` first within each level.
+        """
+        critical = set(self.critical_path)
+        return sorted(
+            self.order,
+            key=lambda x: (-self.levels[x], x not in critical))
+
+    def validate(self):
+        """
+        Raises an error if the graph can't execute to completion.
+
+        Raises
+        ------
+        GraphPlanError
+        """
+        errors = []
+        for node, name in self.dangling:
+            errors.append('In port {!r} of {!r} is not connected to any node '
+                          'in the graph'.format(name, node))
+        for cycle in self.cycles:
+            errors.append('Cycle: {}'.format(
+                ' -> '.join(repr(x) for x in cycle + cycle[:1])))
+        if errors:
+            raise GraphPlanError('\n'.join(errors))
@@ -0,0 +1,380 @@
+"""
+Sampled tracing of records through a graph, exported as Chrome trace events
+(viewable in `chrome://tracing` or https://ui.perfetto.dev).
+
+Tracing is enabled for nodes prepared afterwards, e.g.
+
+    tracer = flo.tracing.enable(rate=0.01, path='/tmp/trace')
+    graph.submit()
+    tracer.export('trace.json')
+
+A sampled fraction of the records sent by nodes start a trace. Its context
+(the trace id, when and by which node the record was sent) travels with the
+record as its edge `key`. Records a node sends while handling a traced
+record continue the same trace, so a trace follows a record's lineage from
+node to node, across processes.
+
+Each hop of a traced record is recorded as:
+
+- a `queue` span on its in port's track, from when the record was sent to
+  when it was received,
+- a `compute` span on the receiving node's track, from when it received the
+  record to when it asked for the next one, and
+- a flow arrow from the sender to the receiver.
+
+Events are kept by each process. When `path` is given, every process also
+writes its events to a file in that directory, e.g. the processes of a
+`SubProcessRunner`, and `Tracer.export` gathers them.
+"""
+import os
+import json
+import time
+import random
+import hashlib
+import threading
+
+from typing import *
+
+
+if TYPE_CHECKING:
+    from .api import Node, _BasePort
+    from .engine.edge.base import AbstractBaseEdge
+
+
+# prefix of the edge keys of traced records
+PREFIX = b'<TRACE>'
+
+
+def _id(value: str) -> int:
+    """
+    Numeric id of `value` that's the same in every process.
+    """
+    return int(hashlib.md5(value.encode()).hexdigest()[:8], 16)
+
+
+class Tracer(object):
+    """
+    Collects the trace events of the current process.
+    """
+
+    def __init__(
+            self,
+            rate: float = 0.01,
+            path: Optional[str] = None,
+    ):
+        """
+        Parameters
+        ----------
+        rate : float
+            Fraction of records to start a trace with.
+        path : Optional[str]
+            Directory every process writes its events to.
+        """
+        self.rate = rate
+        self.path = path
+        self.events = []  # type: List[Dict[str, Any]]
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        # tracks we've named
+        self._tracks = set()  # type: Set[Tuple[int, int]]
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+
+    def __repr__(self):
+        return '<{}(rate={!r}, path={!r})>'.format(
+            self.__class__.__name__, self.rate, self.path)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        state['events'] = []
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def sample(self) -> bool:
+        return random.random() < self.rate
+
+    def _record(self, event):
+        pid = os.getpid()
+        with self._lock:
+            if pid != self._pid:
+                # we were forked, the events so far belong to the parent
+                self._pid = pid
+                self.events = []
+                self._tracks = set()
+            event['pid'] = pid
+            track = (pid, event['tid'])
+            if track not in self._tracks:
+                self._tracks.add(track)
+                self.events.append({
+                    'ph': 'M', 'name': 'thread_name', 'pid': pid,
+                    'tid': event['tid'], 'args': {'name': event.pop('track')},
+                })
+            else:
+                event.pop('track')
+            self.events.append(event)
+
+    def span(self, name, category, track, start, end, trace):
+        """
+        Record a span on `track` from `start` to `end` (seconds since the
+        epoch).
+        """
+        self._record({
+            'ph': 'X', 'name': name, 'cat': category,
+            'ts': start * 1e6, 'dur': max(end - start, 0.0) * 1e6,
+            'tid': _id(track), 'track': track, 'args': {'trace': trace},
+        })
+
+    def flow(self, phase, key, track, ts):
+        """
+        Record the start (`s`) or end (`f`) of the arrow of the hop of a
+        traced record with `key`.
+        """
+        event = {
+            'ph': phase, 'name': 'record', 'cat': 'flow',
+            'id': _id(key.decode()), 'ts': ts * 1e6, 'tid': _id(track),
+            'track': track,
+        }
+        if phase == 'f':
+            event['bp'] = 'e'
+        self._record(event)
+
+    def flush(self):
+        """
+        Write this process's events to `path`, if set.
+        """
+        if self.path is None:
+            return
+        with self._lock:
+            if os.getpid() != self._pid:
+                return
+            events, self.events = self.events, []
+            if events:
+                filename = os.path.join(
+                    self.path, '{}.json'.format(self._pid))
+                with open(filename, 'a') as f:
+                    for event in events:
+                        f.write(json.dumps(event) + '\n')
+
+    def gather(self) -> List[Dict[str, Any]]:
+        """
+        Get the events of every process.
+        """
+        self.flush()
+        with self._lock:
+            events = list(self.events)
+        if self.path is not None:
+            for name in sorted(os.listdir(self.path)):
+                if not name.endswith('.json'):
+                    continue
+                with open(os.path.join(self.path, name)) as f:
+                    events.extend(json.loads(x) for x in f if x.strip())
+        return events
+
+    def export(self, filename: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Get the events of every process in the Chrome trace event format,
+        optionally writing them to `filename`.
+        """
+        result = {'traceEvents': self.gather(), 'displayTimeUnit': 'ms'}
+        if filename is not None:
+            with open(filename, 'w') as f:
+                json.dump(result, f)
+        return result
+
+
+_tracer = None  # type: Optional[Tracer]
+
+
+def enable(
+        rate: float = 0.01,
+        path: Optional[str] = None,
+) -> Tracer:
+    """
+    Start tracing records sent by nodes prepared from now on.
+
+    Parameters
+    ----------
+    rate : float
+        Fraction of records to start a trace with.
+    path : Optional[str]
+        Directory every process writes its events to.
+
+    Returns
+    -------
+    Tracer
+    """
+    global _tracer
+    _tracer = Tracer(rate=rate, path=path)
+    return _tracer
+
+
+def disable():
+    """
+    Stop tracing records sent by nodes prepared from now on.
+    """
+    global _tracer
+    _tracer = None
+
+
+def get() -> Optional[Tracer]:
+    """
+    Get the tracer records are being traced with, if enabled.
+    """
+    return _tracer
+
+
+def _encode(trace, sent, node):
+    return PREFIX + '{}:{!r}:{}'.format(trace, sent, node).encode()
+
+
+def _decode(key):
+    trace, sent, node = key[len(PREFIX):].decode().split(':', 2)
+    return trace, float(sent), node
+
+
+class _State(object):
+    """
+    The trace of the record a node is currently handling.
+    """
+
+    __slots__ = ('node', 'trace', 'received')
+
+    def __init__(self, node):
+        self.node = node
+        self.trace = None  # type: Optional[str]
+        self.received = None  # type: Optional[float]
+
+
+class _TracedEdge(object):
+    """
+    Proxy of a port's edge that passes on and records the trace contexts of
+    the records going through it.
+    """
+
+    def __init__(
+            self,
+            edge: 'AbstractBaseEdge',
+            port: '_BasePort',
+            state: _State,
+            tracer: Tracer,
+    ):
+        self.edge = edge
+        self.port = port.id
+        self.state = state
+        self.tracer = tracer
+
+    def __repr__(self):
+        return '<{}({!r})>'.format(self.__class__.__name__, self.edge)
+
+    def __getattr__(self, item):
+        return getattr(self.edge, item)
+
+    # sending
+
+    def _context(self):
+        """
+        Key for the next record sent, or None if it isn't traced.
+        """
+        trace = self.state.trace
+        if trace is None:
+            if not self.tracer.sample():
+                return None
+            trace = os.urandom(8).hex()
+        sent = time.time()
+        key = _encode(trace, sent, self.state.node)
+        self.tracer.flow('s', key, self.state.node, sent)
+        return key
+
+    # keyword arguments are passed on, e.g. the `route` of a
+    # `PartitionedEdge`
+
+    def push(self, data, **kwargs):
+        key = self._context()
+        if key is None:
+            return self.edge.push(data, **kwargs)
+        # buffered along with the records around it
+        return self.edge.push(data, key=key, **kwargs)
+
+    def push_many(self, items, **kwargs):
+        key = self._context()
+        if key is None:
+            return self.edge.push_many(items, **kwargs)
+        return self.edge.push_many(items, key=key, **kwargs)
+
+    def stop(self, failed=False):
+        try:
+            return self.edge.stop(failed=failed)
+        finally:
+            self.tracer.flush()
+
+    # receiving
+
+    def _close(self, now):
+        """
+        End the compute span of the traced record being handled, if any.
+        """
+        state = self.state
+        if state.trace is not None:
+            self.tracer.span(state.node, 'compute', state.node,
+                             state.received, now, state.trace)
+            state.trace = None
+
+    def _receive(self, now):
+        self._close(now)
+        key = self.edge.key
+        if key[:len(PREFIX)] == PREFIX:
+            trace, sent, _ = _decode(key)
+            self.tracer.span(self.port, 'queue', self.port, sent, now, trace)
+            self.tracer.flow('f', key, self.state.node, now)
+            self.state.trace = trace
+            self.state.received = now
+
+    def _end(self):
+        self._close(time.time())
+        self.tracer.flush()
+
+    def __iter__(self):
+        try:
+            for data in self.edge:
+                self._receive(time.time())
+                yield data
+        finally:
+            self._end()
+
+    def pull_batches(self, max_size, max_wait=0.0):
+        try:
+            for batch in self.edge.pull_batches(max_size, max_wait):
+                # batches are traced by their last record
+                self._receive(time.time())
+                yield batch
+        finally:
+            self._end()
+
+    async def __aiter__(self):
+        try:
+            async for data in self.edge:
+                self._receive(time.time())
+                yield data
+        finally:
+            self._end()
+
+
+def instrument(
+        node: 'Node',
+        kwargs: Dict[str, Any],
+        tracer: Tracer,
+):
+    """
+    Have the ports of a prepared node trace the records going through them.
+    """
+    from .api import _BasePort
+
+    state = _State(node.id)
+    for port in kwargs.values():
+        if isinstance(port, _BasePort) and port.edge is not None \
+                and not isinstance(port.edge, _TracedEdge):
+            port.edge = _TracedEdge(port.edge, port, state, tracer)
@@ -45,9 +45,23 @@ setup(
         'tblib',
         'dill',
     ],
-    extras_require={'tests': [
-        'pytest',
-    ]},
+    extras_require={
+        'tests': [
+            'pytest',
+        ],
+        'msgpack': [
+            'msgpack',
+        ],
+        'lz4': [
+            'lz4',
+        ],
+        'cooperative': [
+            'greenlet',
+        ],
+        'numpy': [
+            'numpy',
+        ],
+    },
     classifiers=[
         # How mature is this project? Common values are
         #   3 - Alpha
@@ -1,5 +1,6 @@
 import os
 import time
+import shutil
 import collections
 import subprocess
 import pytest
@@ -8,18 +9,37 @@ import flo.engine.runners.local
 import flo.engine.runners.multiproc
 import flo.engine.edge.local
 import flo.engine.edge.redis
+import flo.engine.edge.shm
+import flo.engine.edge.segment
 
 
 _SUPPORTED = {
     flo.engine.runners.local.LocalRunner: [
         flo.engine.edge.local.InMemoryEdge,
         flo.engine.edge.redis.RedisEdge,
+        flo.engine.edge.shm.SharedMemoryEdge,
+        flo.engine.edge.segment.SegmentEdge,
     ],
     flo.engine.runners.multiproc.SubProcessRunner: [
         flo.engine.edge.redis.RedisEdge,
+        flo.engine.edge.shm.SharedMemoryEdge,
+        flo.engine.edge.segment.SegmentEdge,
+    ],
+    flo.engine.runners.multiproc.ProcessPoolRunner: [
+        flo.engine.edge.redis.RedisEdge,
+        flo.engine.edge.shm.SharedMemoryEdge,
+        flo.engine.edge.segment.SegmentEdge,
     ],
 }
 
+try:
+    import flo.engine.runners.cooperative
+    _SUPPORTED[flo.engine.runners.cooperative.CooperativeRunner] = [
+        flo.engine.runners.cooperative.CooperativeEdge,
+    ]
+except ImportError:
+    pass
+
 try:
     import flo.engine.runners.gevent
     _SUPPORTED[flo.engine.runners.gevent.GeventRunner] = [
@@ -50,6 +70,14 @@ def docker_redis():
     #    - doesn't support xadd
     #  It would be easy enough to make a mock client myself...
 
+    if shutil.which('docker') is None:
+        # fall back to the stand-in the benchmarks use
+        from flo.bench.server import StreamServer
+        with StreamServer() as server:
+            os.environ['FLO_REDIS_URL'] = server.url
+            yield
+        return
+
     # b'30f2b70c177ca2ee88d409cb27a2a8fd2661a4b344b12d200423b2ba6f3c1213'
     container_id = subprocess.check_output([
         'docker', 'run', '-d', '--rm',
@@ -100,10 +128,15 @@ def rlimit():
 @pytest.fixture(ids=_ALL_RUNNERS.keys(), params=_ALL_RUNNERS.values())
 def runner(request):
     runner, edge = request.param
-    yield runner(edge=edge)
+    runner = runner(edge=edge)
+    yield runner
+    runner.shutdown()
 
 
 @pytest.fixture(params=_COMPAT.keys())
 def runners_by_edge(request):
     edge = request.param
-    yield [x(edge=edge) for x in _COMPAT[edge]]
+    runners = [x(edge=edge) for x in _COMPAT[edge]]
+    yield runners
+    for runner in runners:
+        runner.shutdown()
@@ -38,3 +38,29 @@ def test_runner_compat():
 
     with pytest.raises(RunnerCompatibilityError):
         g.submit()
+
+
+def test_import_time():
+    import sys
+    import subprocess
+
+    # `-X importtime` reports each module imported, with its cumulative time
+    # in microseconds
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import flo.api'],
+        stderr=subprocess.PIPE, universal_newlines=True, check=True)
+    modules = {}
+    for line in result.stderr.splitlines():
+        if line.startswith('import time:') and '|' in line:
+            _, cumulative, name = line.split('|')
+            if cumulative.strip().isdigit():
+                modules[name.strip()] = int(cumulative)
+
+    # backends are only imported once they're used
+    for name in ('redis', 'dill', 'gevent', 'greenlet', 'tblib', 'asyncio'):
+        assert name not in modules
+    assert modules['flo.api'] < 1000000
+
+    # and nothing's lost by deferring them
+    from flo.engine.runners.base import AbstractRemoteRunner
+    assert AbstractRemoteRunner.DEFAULT_EDGE is RedisEdge
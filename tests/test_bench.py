@@ -0,0 +1,57 @@
+import redis
+
+from flo.bench import suite
+from flo.bench.server import StreamServer
+
+
+def test_stream_server():
+    with StreamServer() as server:
+        host, port, db = server.url.replace('/', ':').split(':')
+        # the default protocol is RESP3 in recent clients
+        for options in ({}, {'protocol': 2}):
+            client = redis.Redis(host=host, port=int(port), **options)
+            client.delete('s')
+
+            first = client.xadd('s', {'k': 'a'})
+            client.xadd('s', {'k': 'b'})
+            assert client.xlen('s') == 2
+            assert [x[1] for x in client.xrange('s')] == \
+                [{b'k': b'a'}, {b'k': b'b'}]
+
+            (key, entries), = client.xread({'s': first}, block=10)
+            assert [x[1] for x in entries] == [{b'k': b'b'}]
+            assert not client.xread({'s': '$'}, block=10)
+
+            client.xgroup_create('s', 'g', id='0')
+            (key, entries), = client.xreadgroup(
+                'g', 'c', {'s': '>'}, count=1)
+            assert [x[0] for x in entries] == [first]
+            assert client.xack('s', 'g', first) == 1
+
+            client.xtrim('s', minid=first, approximate=False)
+            assert client.xlen('s') == 2
+            client.xtrim('s', maxlen=1, approximate=False)
+            assert client.xlen('s') == 1
+
+            assert client.hincrby('h', 'f', 3) == 3
+            assert client.hvals('h') == [b'3']
+            client.delete('s', 'h')
+
+
+def test_bench():
+    results = suite.run(
+        records=200, topologies=['chain', 'fan_in'],
+        runners=['LocalRunner(InMemoryEdge)', 'LocalRunner(RedisEdge)'],
+        timeout=60)
+
+    assert len(results['results']) == 4
+    for result in results['results']:
+        assert 'error' not in result
+        assert result['records'] == 200
+        assert result['records_per_sec'] > 0
+        assert 0 < result['latency_p50'] <= result['latency_p99']
+
+    assert suite.compare(results, results) == []
+    slower = {'results': [dict(x, records_per_sec=x['records_per_sec'] * 2)
+                          for x in results['results']]}
+    assert len(suite.compare(results, slower)) == 4
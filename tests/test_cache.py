@@ -0,0 +1,113 @@
+import ast
+
+import pytest
+
+import flo.api
+import flo.cache
+from flo.engine.runners.local import LocalRunner
+from flo.engine.runners.multiproc import SubProcessRunner
+from flo.engine.edge.local import InMemoryEdge
+from flo.engine.edge.redis import RedisEdge
+
+
+@pytest.fixture
+def store(tmp_path):
+    try:
+        yield flo.cache.enable(str(tmp_path / 'cache'))
+    finally:
+        flo.cache.disable()
+
+
+def source(values: list, outflow: flo.api.Out[int]):
+    outflow.send_many(values)
+
+
+def square(log: str, inflow: flo.api.In[int], outflow: flo.api.Out[int]):
+    with open(log, 'a') as f:
+        f.write('.')
+    for x in inflow:
+        outflow.send(x * x)
+
+
+def capture(path: str, inflow: flo.api.In[int]):
+    with open(path, 'w') as f:
+        f.write(repr(sorted(inflow)))
+
+
+def _run(runner, tmp_path, values):
+    runner_cls, edge_cls = runner
+    # a new runner for each graph
+    log = str(tmp_path / 'log')
+    output = str(tmp_path / 'output')
+
+    # with a new graph id each run
+    g = flo.api.Graph(default_runner=runner_cls(edge_cls))
+    n1 = g.add(source, 'source').init(values=values)
+    n2 = g.add(square, 'square').init(log=log, inflow=n1['outflow'])
+    n2.cached()
+    g.add(capture, 'capture').init(path=output, inflow=n2['outflow'])
+    g.submit(timeout=30)
+
+    with open(output) as f:
+        result = ast.literal_eval(f.read())
+    with open(log) as f:
+        return result, len(f.read())
+
+
+@pytest.mark.parametrize('runner', [
+    (LocalRunner, InMemoryEdge), (SubProcessRunner, RedisEdge)],
+    ids=['LocalRunner', 'SubProcessRunner'])
+def test_cache(store, tmp_path, runner):
+
+    assert _run(runner, tmp_path, [1, 2, 3]) == ([1, 4, 9], 1)
+    # the same inputs replay what was sent
+    assert _run(runner, tmp_path, [1, 2, 3]) == ([1, 4, 9], 1)
+    # in the same order, as the port has a single producer
+    assert _run(runner, tmp_path, [3, 2, 1]) == ([1, 4, 9], 2)
+    assert _run(runner, tmp_path, [1, 2, 4]) == ([1, 4, 16], 3)
+    assert _run(runner, tmp_path, [1, 2, 4]) == ([1, 4, 16], 3)
+
+    store.invalidate('square')
+    assert _run(runner, tmp_path, [1, 2, 4]) == ([1, 4, 16], 4)
+    store.invalidate()
+    assert _run(runner, tmp_path, [1, 2, 4]) == ([1, 4, 16], 5)
+
+
+def test_cache_eviction(store, tmp_path):
+    runner = (LocalRunner, InMemoryEdge)
+
+    _run(runner, tmp_path, [1])
+    size = store.size()
+    store.max_size = int(size * 2.5)
+    _run(runner, tmp_path, [2])
+    _run(runner, tmp_path, [1])
+    _run(runner, tmp_path, [3])
+    assert store.size() <= store.max_size
+    # the least recently used was evicted
+    assert _run(runner, tmp_path, [1]) == ([1], 3)
+    assert _run(runner, tmp_path, [2]) == ([4], 4)
+
+
+def test_cache_producers(store, tmp_path):
+    log = str(tmp_path / 'log')
+    output = str(tmp_path / 'output')
+
+    def run(left, right):
+        g = flo.api.Graph(default_runner=LocalRunner(InMemoryEdge))
+        n1 = g.add(source, 'left').init(values=left)
+        n2 = g.add(source, 'right').init(values=right)
+        n3 = g.add(square, 'square').init(
+            log=log, inflow=[n1['outflow'], n2['outflow']])
+        n3.cached()
+        g.add(capture, 'capture').init(path=output, inflow=n3['outflow'])
+        g.submit(timeout=30)
+        with open(output) as f:
+            result = ast.literal_eval(f.read())
+        with open(log) as f:
+            return result, len(f.read())
+
+    assert run([1, 2], [3]) == ([1, 4, 9], 1)
+    # the order of the records of a port with several producers varies, so
+    # it's ignored
+    assert run([3], [2, 1]) == ([1, 4, 9], 1)
+    assert run([3], [2, 4]) == ([4, 9, 16], 2)
@@ -0,0 +1,50 @@
+import typing
+import pytest
+
+from flo.engine.edge import codecs
+
+
+@pytest.mark.parametrize('type_, name, value', [
+    (bytes, 'bytes', b'\x00raw'),
+    (int, 'int64', -42),
+    (float, 'float64', 1.5),
+    (typing.Any, 'pickle', {'a': [1, 2]}),
+    (None, 'pickle', ('x', None)),
+])
+def test_type_default(type_, name, value):
+    codec = codecs.get(type_=type_)
+    assert codec.name == name
+    assert codec.decode(codec.encode(value)) == value
+
+
+@pytest.mark.parametrize('type_, value', [
+    (bytes, 'text'),
+    (int, 1.5),
+    (int, True),
+    (int, 2 ** 64),
+    (float, 1),
+])
+def test_type_mismatch(type_, value):
+    codec = codecs.get(type_=type_, port='graph/node/outflow')
+    # rather than converting it, or a `struct.error`
+    with pytest.raises(TypeError, match='graph/node/outflow'):
+        codec.encode(value)
+
+
+def test_override():
+    assert codecs.get('pickle', bytes).name == 'pickle'
+
+    with pytest.raises(ValueError):
+        codecs.get('nope')
+
+
+def test_compressed():
+    codec = codecs.Compressed('pickle', threshold=100)
+
+    small = 'x'
+    large = 'x' * 10000
+
+    assert codec.decode(codec.encode(small)) == small
+    encoded = codec.encode(large)
+    assert len(encoded) < 1000
+    assert codec.decode(encoded) == large
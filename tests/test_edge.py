@@ -0,0 +1,571 @@
+import os
+import sys
+import time
+import uuid
+import threading
+import subprocess
+
+import pytest
+
+from flo.engine.edge.local import InMemoryEdge
+from flo.engine.edge.redis import RedisEdge, AsyncRedisEdge
+from flo.engine.edge.shm import SharedMemoryEdge
+from flo.engine.edge.segment import SegmentEdge
+from flo.engine.edge.partition import partition
+
+
+def _ids(count):
+    return [str(uuid.uuid4()) for _ in range(count)]
+
+
+def test_inmemory_round_robin():
+
+    left, right = _ids(2)
+
+    lhs = InMemoryEdge(left)
+    rhs = InMemoryEdge(right)
+
+    lhs.start()
+    rhs.start()
+    for i in range(3):
+        lhs.send('l{}'.format(i))
+    for i in range(2):
+        rhs.send('r{}'.format(i))
+    lhs.stop()
+    rhs.stop()
+
+    result = list(InMemoryEdge(left, right))
+
+    assert result == ['l0', 'r0', 'l1', 'r1', 'l2']
+
+
+def test_inmemory_broadcast():
+
+    id_, = _ids(1)
+
+    producer = InMemoryEdge(id_, consumers=2)
+    producer.start()
+    for i in range(5):
+        producer.send(i)
+    producer.stop()
+
+    lhs = InMemoryEdge(id_, name='lhs')
+    rhs = InMemoryEdge(id_, name='rhs')
+
+    # one buffer, only discarded once both have read it
+    assert list(lhs) == list(range(5))
+    assert producer.backlog() == 5
+    assert list(rhs) == list(range(5))
+    assert producer.backlog() == 0
+    assert producer.done()
+
+    InMemoryEdge(id_).delete()
+
+
+def test_inmemory_backlog():
+
+    left, right = _ids(2)
+
+    # one stream holding just its INIT marker, the other ended
+    lhs = InMemoryEdge(left)
+    rhs = InMemoryEdge(right, consumers=2)
+    lhs.start()
+    rhs.start()
+    for i in range(3):
+        rhs.send(i)
+    rhs.stop()
+
+    consumer = InMemoryEdge(left, right, name='lhs')
+    assert consumer.backlog() == 3
+
+    records = iter(InMemoryEdge(right, name='lhs'))
+    assert next(records) == 0
+    # the record being processed is still left to do
+    assert consumer.backlog() == 3
+    assert next(records) == 1
+    assert consumer.backlog() == 2
+    assert list(records) == [2]
+    # read by this consumer but not by the other one yet
+    assert consumer.backlog() == 0
+    assert InMemoryEdge(left, right, name='rhs').backlog() == 3
+
+    InMemoryEdge(left, right).delete()
+
+
+def test_inmemory_blocking_pull():
+
+    id_, = _ids(1)
+
+    result = []
+
+    def consume():
+        result.extend(InMemoryEdge(id_))
+
+    consumer = threading.Thread(target=consume)
+    consumer.start()
+
+    # An idle consumer should be parked rather than spinning.
+    start = time.process_time()
+    time.sleep(0.5)
+    assert time.process_time() - start < 0.1
+
+    producer = InMemoryEdge(id_)
+    producer.start()
+    for i in range(1000):
+        producer.send(i)
+    producer.stop()
+
+    consumer.join(timeout=5)
+    assert not consumer.is_alive()
+    assert result == list(range(1000))
+
+
+def test_inmemory_max_size():
+
+    id_, = _ids(1)
+
+    producer = InMemoryEdge(id_, max_size=5)
+
+    def produce():
+        producer.start()
+        for i in range(100):
+            producer.send(i)
+        producer.stop()
+
+    thread = threading.Thread(target=produce)
+    thread.start()
+
+    time.sleep(0.2)
+    # the producer should be blocked waiting on the consumer
+    assert thread.is_alive()
+    assert len(InMemoryEdge._state[id_].records) <= 5
+
+    result = list(InMemoryEdge(id_))
+
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+    assert result == list(range(100))
+
+
+def test_inmemory_batching():
+
+    id_, = _ids(1)
+
+    producer = InMemoryEdge(id_, batch_size=10, batch_latency=0.1)
+    producer.start()
+
+    def buffered():
+        return [v for k, v in InMemoryEdge._state[id_].records
+                if k != InMemoryEdge.INIT]
+
+    for i in range(5):
+        producer.push(i)
+    assert buffered() == []
+
+    # flushed once the latency bound passes
+    time.sleep(0.3)
+    assert buffered() == list(range(5))
+
+    # flushed once the batch fills up
+    for i in range(5, 15):
+        producer.push(i)
+    assert buffered() == list(range(15))
+
+    producer.push_many(range(15, 20))
+    producer.stop()
+
+    assert list(InMemoryEdge(id_)) == list(range(20))
+
+
+@pytest.mark.parametrize(
+    'edge_cls', [InMemoryEdge, RedisEdge, SharedMemoryEdge, SegmentEdge])
+def test_batches(edge_cls):
+
+    id_, = _ids(1)
+
+    producer = edge_cls(id_)
+    producer.start()
+    producer.send_many(range(25))
+
+    batches = edge_cls(id_).pull_batches(10, max_wait=0.2)
+    # whatever's waiting, up to the size
+    assert next(batches) == list(range(10))
+    assert next(batches) == list(range(10, 20))
+
+    # topped up with what arrives while waiting
+    def produce():
+        time.sleep(0.05)
+        producer.send_many(range(25, 28))
+        producer.stop()
+
+    thread = threading.Thread(target=produce)
+    thread.start()
+    assert next(batches) == list(range(20, 28))
+    assert list(batches) == []
+    thread.join()
+
+    producer.delete()
+
+
+def test_shm_wraparound(tmpdir):
+
+    id_, = _ids(1)
+
+    # small enough that the records wrap around the buffer many times
+    producer = SharedMemoryEdge(id_, capacity=256, root=str(tmpdir))
+
+    def produce():
+        producer.start()
+        producer.send_many(range(500))
+        for i in range(500, 1000):
+            producer.send(i)
+        producer.stop()
+
+    thread = threading.Thread(target=produce)
+    thread.start()
+
+    result = list(SharedMemoryEdge(id_, capacity=256, root=str(tmpdir)))
+
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+    assert result == list(range(1000))
+    producer.delete()
+    assert not tmpdir.listdir()
+
+
+def test_shm_consumers(tmpdir):
+
+    id_, = _ids(1)
+
+    producer = SharedMemoryEdge(id_, root=str(tmpdir))
+    producer.start()
+    producer.send_many(range(5))
+    producer.stop()
+
+    assert list(SharedMemoryEdge(id_, root=str(tmpdir))) == list(range(5))
+
+    # another consumer that only opens the stream after the end was read
+    result = []
+    thread = threading.Thread(
+        target=lambda: result.extend(SharedMemoryEdge(id_, root=str(tmpdir))),
+        daemon=True)
+    thread.start()
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+    assert result == []
+
+    producer.delete()
+    assert not tmpdir.listdir()
+
+
+def test_segments(tmpdir):
+
+    id_, = _ids(1)
+    root = str(tmpdir)
+
+    producer = SegmentEdge(id_, root=root, segment_size=100, consumers=1)
+    producer.start()
+    producer.send_many(range(20))
+    path = producer._path(id_)
+    segments = [x for x in os.listdir(path) if x.endswith('.seg')]
+    assert len(segments) > 1
+
+    # a named consumer resumes after the last batch it finished processing
+    consumer = SegmentEdge(id_, root=root, name='consumer')
+    consumer.READ_COUNT = 5
+    pulled = consumer.pull()
+    assert [next(pulled) for _ in range(7)] == list(range(7))
+    pulled.close()
+    consumer = SegmentEdge(id_, root=root, name='consumer')
+    pulled = consumer.pull()
+    assert [next(pulled) for _ in range(15)] == list(range(5, 20))
+
+    # and follows the segments as records are appended
+    result = []
+    thread = threading.Thread(target=lambda: result.extend(pulled))
+    thread.start()
+    producer.send_many(range(20, 40))
+    producer.stop()
+    thread.join(timeout=5)
+    assert result == list(range(20, 40))
+
+    # the segments it has read are removed
+    assert min(segments) not in os.listdir(path)
+
+    assert producer.done()
+    producer.reset()
+    assert not producer.done()
+
+    producer.delete()
+    assert not os.path.exists(path)
+
+
+def test_segment_producers(tmpdir):
+
+    id_, = _ids(1)
+    root = str(tmpdir)
+
+    lhs, rhs = [SegmentEdge(id_, root=root, max_size=6, producers=2)
+                for _ in range(2)]
+    lhs.start()
+    rhs.start()
+    lhs.send_many(range(6))
+
+    # the other producer's records count towards the lag too
+    thread = threading.Thread(target=rhs.send_many, args=(range(6, 8),))
+    thread.start()
+    time.sleep(0.2)
+    assert thread.is_alive()
+
+    result = []
+    consumer = threading.Thread(
+        target=lambda: result.extend(SegmentEdge(id_, root=root)),
+        daemon=True)
+    consumer.start()
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+    lhs.stop()
+    rhs.stop()
+    consumer.join(timeout=5)
+    assert sorted(result) == list(range(8))
+
+    lhs.delete()
+
+
+def test_redis_trim():
+
+    id_, = _ids(1)
+
+    producer = RedisEdge(id_, consumers=1)
+    producer.TRIM_INTERVAL = 10
+    consumer = iter(RedisEdge(id_).pull(block=100))
+
+    producer.start()
+    producer.send_many(range(10))
+    assert [next(consumer) for _ in range(10)] == list(range(10))
+
+    # only the last record read is kept once the stream is trimmed
+    producer.send_many(range(10, 20))
+    assert producer.db.xlen(id_) == 11
+
+    producer.stop()
+    assert list(consumer) == list(range(10, 20))
+
+    producer.delete()
+    assert not producer.db.exists(id_, id_ + ':readers', id_ + ':positions')
+
+
+def test_redis_max_size():
+
+    id_, = _ids(1)
+
+    producer = RedisEdge(id_, max_size=5)
+
+    def produce():
+        producer.start()
+        producer.send_many(range(100))
+        producer.stop()
+
+    thread = threading.Thread(target=produce)
+    thread.start()
+
+    time.sleep(0.2)
+    # a single batch is throttled too
+    assert thread.is_alive()
+    assert producer.db.xlen(id_) <= 5
+
+    result = list(RedisEdge(id_))
+
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+    assert result == list(range(100))
+
+    # filling the stream doesn't block once everything has been sent
+    producer.start()
+    producer.send_many(range(4))
+    producer.stop()
+
+    producer.delete()
+
+
+def test_redis_producers():
+
+    id_, = _ids(1)
+
+    lhs, rhs = [RedisEdge(id_, max_size=6, producers=2) for _ in range(2)]
+    lhs.start()
+    rhs.start()
+    lhs.send_many(range(4))
+
+    # the other producer's records count towards the lag too
+    thread = threading.Thread(target=rhs.send_many, args=(range(4, 8),))
+    thread.start()
+    time.sleep(0.2)
+    assert thread.is_alive()
+    assert rhs.db.xlen(id_) <= 6
+
+    result = []
+    consumer = threading.Thread(
+        target=lambda: result.extend(RedisEdge(id_)), daemon=True)
+    consumer.start()
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+    lhs.stop()
+    rhs.stop()
+    consumer.join(timeout=5)
+    assert sorted(result) == list(range(8))
+
+    lhs.delete()
+
+
+def test_redis_chunks():
+    numpy = pytest.importorskip('numpy')
+
+    id_, = _ids(1)
+
+    producer = RedisEdge(id_, consumers=1)
+    producer.TRIM_INTERVAL = 3
+    producer.CHUNK_THRESHOLD = 1000
+    producer.CHUNK_SIZE = 3000
+    consumer = iter(RedisEdge(id_).pull(block=100))
+
+    # the data of large arrays is sent in chunks, small ones inline
+    arrays = [numpy.arange(1000, dtype='f8'), numpy.arange(10)]
+    producer.start()
+    producer.send(arrays)
+    assert producer.db.hlen(id_ + ':chunks') == 3
+    producer.send_many([arrays[0] * 2, arrays[1]])
+    assert producer.db.hlen(id_ + ':chunks') == 6
+
+    result = next(consumer)
+    assert [x.tolist() for x in result] == [x.tolist() for x in arrays]
+    # reassembled into a buffer of its own
+    assert result[0].flags.writeable
+    assert next(consumer).tolist() == (arrays[0] * 2).tolist()
+    assert next(consumer).tolist() == arrays[1].tolist()
+
+    # and the chunks are trimmed along with the records
+    producer.send_many(range(3))
+    assert producer.db.hlen(id_ + ':chunks') == 0
+
+    producer.stop()
+    assert list(consumer) == list(range(3))
+
+    producer.delete()
+    assert not producer.db.exists(id_ + ':chunks')
+
+    # or along with those discarded beyond `max_len`
+    producer = RedisEdge(id_, max_len=1)
+    producer.TRIM_INTERVAL = 3
+    producer.CHUNK_THRESHOLD = 1000
+    producer.start()
+    producer.send_many([arrays[0]] * 3)
+    # (each of the records left has a single chunk)
+    left = [x for _, x in producer.db.xrange(id_) if RedisEdge.CHUNKS in x]
+    assert producer.db.hlen(id_ + ':chunks') == len(left)
+    producer.delete()
+
+
+def test_redis_chunks_async():
+    import asyncio
+    numpy = pytest.importorskip('numpy')
+
+    id_, = _ids(1)
+
+    producer = RedisEdge(id_)
+    producer.CHUNK_THRESHOLD = 1000
+    producer.CHUNK_SIZE = 3000
+
+    # records sent in chunks are reassembled by asynchronous consumers too
+    array = numpy.arange(1000, dtype='f8')
+    producer.start()
+    producer.send_many([array, numpy.arange(10)])
+    producer.stop()
+
+    async def pull():
+        return [x async for x in AsyncRedisEdge(id_).pull(block=100)]
+
+    result = asyncio.run(pull())
+    assert [x.tolist() for x in result] == [
+        array.tolist(), list(range(10))]
+
+    producer.delete()
+
+    # and sent in chunks by asynchronous producers
+    async def send():
+        producer = AsyncRedisEdge(id_)
+        producer.CHUNK_THRESHOLD = 1000
+        producer.CHUNK_SIZE = 3000
+        await producer.start()
+        await producer.send(array)
+        await producer.stop()
+
+    asyncio.run(send())
+    assert RedisEdge(id_).db.hlen(id_ + ':chunks') == 3
+    assert [x.tolist() for x in RedisEdge(id_)] == [array.tolist()]
+
+    producer.delete()
+
+
+def test_redis_clients(monkeypatch):
+    import multiprocessing
+    import flo.engine.edge.redis
+
+    manager = flo.engine.edge.redis._ClientManager()
+    monkeypatch.setattr(flo.engine.edge.redis, '_manager', manager)
+
+    pings = []
+    ping = flo.engine.edge.redis.redis.Redis.ping
+    monkeypatch.setattr(
+        flo.engine.edge.redis.redis.Redis, 'ping',
+        lambda self: pings.append(self) or ping(self))
+
+    # edges share a client, which is only checked once in a while
+    edges = [RedisEdge(str(uuid.uuid4())) for _ in range(10)]
+    assert len(set(id(x.db) for x in edges)) == 1
+    assert len(pings) == 1
+    manager._checked.clear()
+    RedisEdge(str(uuid.uuid4()))
+    assert len(pings) == 2
+
+    # forked processes get their own
+    ctx = multiprocessing.get_context('fork')
+    results = ctx.Queue()
+
+    def child():
+        results.put(len(manager.clients))
+        RedisEdge(str(uuid.uuid4()))
+        results.put(len(manager.clients))
+
+    proc = ctx.Process(target=child)
+    proc.start()
+    proc.join()
+    assert [results.get(), results.get()] == [0, 1]
+    assert len(manager.clients) == 1
+
+    flo.engine.edge.redis.configure(max_connections=2)
+    try:
+        db = RedisEdge(str(uuid.uuid4())).db
+        assert db.connection_pool.max_connections == 2
+        assert db is not edges[0].db
+    finally:
+        flo.engine.edge.redis.configure()
+
+
+def test_partition_keys():
+
+    keys = ['user1', b'user1', 7, ('user1', 7, (b'x', -1))]
+    indexes = [partition(x, 5) for x in keys]
+
+    # the same in a process with different hashing
+    script = (
+        'from flo.engine.edge.partition import partition\n'
+        'print([partition(x, 5) for x in {!r}])'.format(keys))
+    env = dict(os.environ, PYTHONHASHSEED='1')
+    output = subprocess.check_output([sys.executable, '-c', script], env=env)
+    assert output.decode().strip() == repr(indexes)
+
+    # keys whose repr could differ between processes
+    for key in (object(), {'a', 'b'}, 1.5, ('user1', None)):
+        with pytest.raises(TypeError):
+            partition(key, 5)
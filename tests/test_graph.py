@@ -1,8 +1,10 @@
 import pytest
 import typing
 import multiprocessing
+import time
 
 import flo.api
+import flo.engine.edge.codecs
 import flo.exceptions
 
 
@@ -202,9 +204,699 @@ def test_multi_runners(runners_by_edge):
 
     expected = list(range(10)) + list(range(5))
 
-    result = []
-    while not state.empty():
-        result.append(state.get())
+    # `empty()` can race the queue's feeder thread, so get each expected item
+    result = [state.get(timeout=5) for _ in expected]
 
     # order not guaranteed
     assert sorted(expected) == sorted(result)
+
+
+def test_max_size(runner):
+
+    def init(arg: int, outflow: flo.api.Out[int]):
+        for i in range(arg):
+            outflow.send(i)
+
+    state = multiprocessing.Queue()
+
+    def capture(inflow: flo.api.In[int]):
+        for i in inflow:
+            state.put(i)
+
+    g = flo.api.Graph(default_runner=runner)
+
+    n1 = g.add(init).init(arg=50)
+    n1['outflow'].configure(max_size=2)
+    g.add(capture).init(inflow=n1['outflow'])
+
+    g.submit(timeout=30)
+
+    expected = list(range(50))
+    result = [state.get() for _ in expected]
+
+    assert expected == result
+
+
+def test_send_many(runner):
+
+    def init(arg: int, outflow: flo.api.Out[int]):
+        outflow.send_many(range(arg))
+
+    def double(inflow: flo.api.In[int], outflow: flo.api.Out[int]):
+        for i in inflow:
+            outflow.send(i * 2)
+
+    state = multiprocessing.Queue()
+
+    def capture(inflow: flo.api.In[int]):
+        for i in inflow:
+            state.put(i)
+
+    g = flo.api.Graph(default_runner=runner)
+
+    n1 = g.add(init).init(arg=50)
+    n2 = g.add(double).init(inflow=n1['outflow'])
+    n2['outflow'].configure(batch_size=8, batch_latency=0.01)
+    g.add(capture).init(inflow=n2['outflow'])
+
+    g.submit(timeout=30)
+
+    expected = [i * 2 for i in range(50)]
+    result = [state.get() for _ in expected]
+
+    assert expected == result
+
+
+def test_codecs(runner):
+
+    def init(arg: int, outflow: flo.api.Out[float], raw: flo.api.Out[bytes]):
+        for i in range(arg):
+            outflow.send(i / 2.0)
+            raw.send(str(i).encode())
+
+    state = multiprocessing.Queue()
+
+    def capture(inflow: flo.api.In[typing.Any]):
+        for i in inflow:
+            state.put(i)
+
+    g = flo.api.Graph(default_runner=runner)
+
+    n1 = g.add(init).init(arg=10)
+    n1['raw'].configure(codec=flo.engine.edge.codecs.Compressed('bytes'))
+    g.add(capture).init(inflow=(n1['outflow'], n1['raw']))
+
+    g.submit(timeout=30)
+
+    expected = [i / 2.0 for i in range(10)] + [str(i).encode()
+                                               for i in range(10)]
+    result = [state.get() for _ in expected]
+
+    assert sorted(expected, key=repr) == sorted(result, key=repr)
+
+
+def test_replicas(runner):
+
+    def init(arg: int, outflow: flo.api.Out[int]):
+        for i in range(arg):
+            outflow.send(i)
+
+    def square(inflow: flo.api.In[int], outflow: flo.api.Out[int]):
+        import time
+        for x in inflow:
+            time.sleep(0.001)
+            outflow.send(x * x)
+
+    state = multiprocessing.Queue()
+
+    def capture(inflow: flo.api.In[int]):
+        for i in inflow:
+            state.put(i)
+
+    g = flo.api.Graph(default_runner=runner)
+
+    n1 = g.add(init).init(arg=50)
+    n2 = g.add(square, replicas=3).init(inflow=n1['outflow'])
+    g.add(capture).init(inflow=n2['outflow'])
+
+    g.submit(timeout=60)
+
+    # every record is processed by exactly one replica
+    expected = [i * i for i in range(50)]
+    result = sorted(state.get(timeout=5) for _ in expected)
+    assert expected == result
+    assert state.empty()
+
+
+@pytest.mark.parametrize('fanout', [
+    flo.api.Out.BROADCAST, flo.api.Out.PARTITIONED])
+def test_fanout(runner, fanout):
+
+    def init(arg: int, outflow: flo.api.Out[int]):
+        for i in range(arg):
+            outflow.send(i)
+
+    state = multiprocessing.Queue()
+
+    def capture(inflow: flo.api.In[int], name: str):
+        for i in inflow:
+            state.put((name, i))
+
+    g = flo.api.Graph(default_runner=runner)
+
+    n1 = g.add(init).init(arg=20)
+    n1['outflow'].configure(fanout=fanout)
+    g.add(capture, 'a').init(inflow=n1['outflow'], name='a')
+    g.add(capture, 'b').init(inflow=n1['outflow'], name='b')
+
+    if fanout == flo.api.Out.BROADCAST and not runner._edge.BROADCAST:
+        with pytest.raises(ValueError):
+            g.get_runners()
+        return
+
+    g.submit(timeout=60)
+
+    if fanout == flo.api.Out.BROADCAST:
+        # each consumer gets every record, in order
+        result = [state.get(timeout=5) for _ in range(40)]
+        for name in 'ab':
+            assert [i for x, i in result if x == name] == list(range(20))
+    else:
+        # each record goes to exactly one consumer
+        result = [state.get(timeout=5)[1] for _ in range(20)]
+        assert sorted(result) == list(range(20))
+    assert state.empty()
+
+
+def test_partition(runner):
+
+    def init(arg: int, outflow: flo.api.Out[typing.Tuple[str, int]]):
+        for i in range(arg):
+            user = 'user{}'.format(i % 7)
+            outflow.send((user, i), key=user)
+
+    state = multiprocessing.Queue()
+
+    def count(inflow: flo.api.In[typing.Tuple[str, int]]):
+        counts = {}
+        for user, _ in inflow:
+            counts[user] = counts.get(user, 0) + 1
+        for item in counts.items():
+            state.put(item)
+
+    g = flo.api.Graph(default_runner=runner)
+
+    n1 = g.add(init).init(arg=70)
+    n2 = g.add(count).init(inflow=n1['outflow'].partition(3))
+    assert len(n2.instances()) == 3
+
+    g.submit(timeout=60)
+
+    # each user's records all went to the same replica
+    result = sorted(state.get(timeout=5) for _ in range(7))
+    assert result == [('user{}'.format(i), 10) for i in range(7)]
+    assert state.empty()
+
+
+def test_batches(runner):
+
+    def init(arg: int, outflow: flo.api.Out[int]):
+        outflow.send_many(range(arg))
+
+    state = multiprocessing.Queue()
+
+    def total(inflow: flo.api.In[int]):
+        # so the records are waiting by the time we read them
+        time.sleep(0.5)
+        sizes = []
+        result = 0
+        for batch in inflow.batches(max_size=100):
+            sizes.append(len(batch))
+            result += sum(batch)
+        state.put((result, sizes))
+
+    g = flo.api.Graph(default_runner=runner)
+
+    n1 = g.add(init).init(arg=1000)
+    g.add(total).init(inflow=n1['outflow'])
+
+    g.submit(timeout=60)
+
+    result, sizes = state.get(timeout=5)
+    assert result == sum(range(1000))
+    # each batch is filled with what's waiting
+    assert sizes == [100] * 10
+
+
+def test_batches_array():
+    numpy = pytest.importorskip('numpy')
+
+    def init(arg: int, outflow: flo.api.Out[float]):
+        for i in range(arg):
+            outflow.send(float(i))
+
+    batches = []
+
+    def capture(inflow: flo.api.In[float]):
+        batches.extend(inflow.batches(max_size=64, array=True))
+
+    g = flo.api.Graph()
+
+    n1 = g.add(init).init(arg=1000)
+    g.add(capture).init(inflow=n1['outflow'])
+
+    g.submit(timeout=60)
+
+    assert all(x.dtype == numpy.float64 and len(x) <= 64 for x in batches)
+    assert numpy.concatenate(batches).sum() == sum(range(1000))
+
+
+def test_plan():
+
+    def init(outflow: flo.api.Out[int]):
+        pass
+
+    def merge(left: flo.api.In[int], right: flo.api.In[int],
+              outflow: flo.api.Out[int]):
+        pass
+
+    def relay(inflow: flo.api.In[int], outflow: flo.api.Out[int]):
+        pass
+
+    g = flo.api.Graph('plan')
+    n1 = g.add(init, 'a').init()
+    n2 = g.add(init, 'b').init()
+    n3 = g.add(merge).init(left=n1['outflow'], right=n2['outflow'])
+    n4 = g.add(relay).init(inflow=n3['outflow'])
+
+    plan = g.plan(costs={'plan/b': 5.0})
+    assert plan.sources == [n1, n2]
+    assert plan.sinks == [n4]
+    assert [plan.levels[x] for x in (n1, n2, n3, n4)] == [0, 0, 1, 2]
+    assert plan.critical_path == [n2, n3, n4]
+    assert plan.cost == 7.0
+    # consumers start before their sources
+    assert plan.schedule() == [n4, n3, n2, n1]
+    plan.validate()
+
+    n3.init(left=n1['outflow'], right=n4['outflow'])
+    plan = g.plan()
+    assert plan.cycles == [[n3, n4]]
+    with pytest.raises(flo.exceptions.GraphPlanError):
+        g.submit()
+
+
+def test_plan_dangling():
+
+    def init(outflow: flo.api.Out[int]):
+        pass
+
+    def capture(inflow: flo.api.In[int]):
+        pass
+
+    other = flo.api.Graph().add(init).init()
+
+    g = flo.api.Graph()
+    n1 = g.add(capture).init(inflow=other['outflow'])
+    assert g.plan().dangling == [(n1, 'inflow')]
+    with pytest.raises(flo.exceptions.GraphPlanError):
+        g.submit()
+
+
+def test_fusion(runner):
+
+    def init(arg: int, outflow: flo.api.Out[int]):
+        for i in range(arg):
+            outflow.send(i)
+
+    def double(inflow: flo.api.In[int], outflow: flo.api.Out[int]):
+        for x in inflow:
+            outflow.send(x * 2)
+
+    state = multiprocessing.Queue()
+
+    def capture(inflow: flo.api.In[int]):
+        for i in inflow:
+            state.put(i)
+
+    g = flo.api.Graph(default_runner=runner, fuse=True)
+
+    n1 = g.add(init).init(arg=20)
+    n2 = g.add(double).init(inflow=n1['outflow'])
+    n3 = g.add(double).init(inflow=n2['outflow'])
+    g.add(capture).init(inflow=n3['outflow'])
+
+    nodes = g.optimize()
+    if runner.FUSIBLE:
+        assert len(nodes) == 1
+        assert isinstance(nodes[0], flo.api.FusedNode)
+        assert nodes[0].nodes == list(g.nodes.values())
+
+    g.submit(timeout=60)
+
+    expected = [i * 4 for i in range(20)]
+    result = sorted(state.get(timeout=5) for _ in expected)
+    assert expected == result
+
+
+def test_fusion_fan_in():
+    from flo.engine.runners.local import LocalRunner
+
+    def init(arg: int, outflow: flo.api.Out[int]):
+        for i in range(arg):
+            outflow.send(i)
+
+    def double(inflow: flo.api.In[int], outflow: flo.api.Out[int]):
+        calls.append('double')
+        for x in inflow:
+            outflow.send(x * 2)
+
+    def capture(inflow: flo.api.In[int]):
+        calls.append('capture')
+        state.extend(inflow)
+
+    results = []
+    for fuse in (False, True):
+        calls = []
+        state = []
+
+        g = flo.api.Graph(default_runner=LocalRunner(), fuse=fuse)
+        l1 = g.add(init).init(arg=10)
+        r1 = g.add(init).init(arg=5)
+        # fed by both branches, so fused into neither
+        n2 = g.add(double).init(inflow=(l1['outflow'], r1['outflow']))
+        g.add(capture).init(inflow=n2['outflow'])
+        g.submit(timeout=30)
+
+        results.append((sorted(calls), sorted(state)))
+
+    assert results[0] == results[1]
+    assert results[1][0] == ['capture', 'double']
+
+
+def test_fusion_thread():
+    import threading
+    from flo.engine.runners.local import LocalRunner
+
+    pytest.importorskip('greenlet')
+
+    threads = set()
+    sent = []
+    state = []
+
+    def init(arg: int, outflow: flo.api.Out[int]):
+        threads.add(threading.get_ident())
+        for i in range(arg):
+            sent.append(i)
+            outflow.send(i)
+
+    def first(inflow: flo.api.In[int], outflow: flo.api.Out[int]):
+        threads.add(threading.get_ident())
+        for x in inflow:
+            outflow.send(x)
+            # the rest aren't pulled
+            break
+
+    def capture(inflow: flo.api.In[int]):
+        threads.add(threading.get_ident())
+        state.extend(inflow)
+
+    g = flo.api.Graph(default_runner=LocalRunner(), fuse=True)
+    n1 = g.add(init).init(arg=10)
+    n2 = g.add(first).init(inflow=n1['outflow'])
+    g.add(capture).init(inflow=n2['outflow'])
+    g.submit(timeout=30)
+
+    # records are handed along on one thread, and nodes upstream of one
+    # that stops pulling still run to the end
+    assert len(threads) == 1
+    assert state == [0]
+    assert sent == list(range(10))
+
+    def fail(inflow: flo.api.In[int], outflow: flo.api.Out[int]):
+        for x in inflow:
+            if x == 3:
+                raise ValueError(x)
+            outflow.send(x)
+
+    del sent[:], state[:]
+    g = flo.api.Graph(default_runner=LocalRunner(), fuse=True)
+    n1 = g.add(init).init(arg=10)
+    n2 = g.add(fail).init(inflow=n1['outflow'])
+    g.add(capture).init(inflow=n2['outflow'])
+    with pytest.raises(flo.exceptions.GraphExecutionError):
+        g.submit(timeout=30)
+    assert state == [0, 1, 2]
+    assert sent == [0, 1, 2, 3]
+
+
+def test_cleanup(tmpdir, monkeypatch):
+    from flo.engine.runners.local import LocalRunner
+    from flo.engine.edge.local import InMemoryEdge
+    from flo.engine.edge.shm import SharedMemoryEdge
+
+    monkeypatch.setenv('FLO_SHM_DIR', str(tmpdir))
+
+    def init(arg: int, outflow: flo.api.Out[int]):
+        for i in range(arg):
+            outflow.send(i)
+
+    def passthrough(inflow: flo.api.In[int], outflow: flo.api.Out[int]):
+        for x in inflow:
+            outflow.send(x)
+
+    for edge in (InMemoryEdge, SharedMemoryEdge):
+        g = flo.api.Graph(default_runner=LocalRunner(edge=edge))
+        n1 = g.add(init).init(arg=10)
+        # replicas leave their streams to be cleaned up by the graph
+        n2 = g.add(passthrough, replicas=2).init(inflow=n1['outflow'])
+        # nobody consumes this one
+        g.add(passthrough).init(inflow=n2['outflow'])
+        g.submit(timeout=30)
+
+        assert not [x for x in InMemoryEdge._state if x.startswith(g.id)]
+        assert not tmpdir.listdir()
+
+
+@pytest.mark.parametrize('edge', [
+    'InMemoryEdge', 'RedisEdge', 'SharedMemoryEdge', 'SegmentEdge'])
+def test_resume(edge, tmpdir, monkeypatch):
+    from flo.engine.runners.local import LocalRunner
+    from flo.engine.edge import local, redis, shm, segment
+
+    monkeypatch.setenv('FLO_SHM_DIR', str(tmpdir.join('shm')))
+    monkeypatch.setenv('FLO_SEGMENT_DIR', str(tmpdir.join('segment')))
+    monkeypatch.setattr(redis.RedisEdge, 'CHECKPOINT_INTERVAL', 10)
+    monkeypatch.setattr(shm.SharedMemoryEdge, 'READ_COUNT', 10)
+    monkeypatch.setattr(segment.SegmentEdge, 'READ_COUNT', 10)
+    edge = {
+        'InMemoryEdge': local.InMemoryEdge,
+        'RedisEdge': redis.RedisEdge,
+        'SharedMemoryEdge': shm.SharedMemoryEdge,
+        'SegmentEdge': segment.SegmentEdge,
+    }[edge]
+
+    calls = []
+    failed = []
+    state = []
+
+    def init(arg: int, outflow: flo.api.Out[int]):
+        calls.append(arg)
+        outflow.send_many(range(arg))
+
+    def flaky(inflow: flo.api.In[int], outflow: flo.api.Out[int]):
+        for x in inflow:
+            if x == 55 and not failed:
+                failed.append(x)
+                raise ValueError(x)
+            outflow.send(x)
+
+    def capture(inflow: flo.api.In[int]):
+        state.extend(inflow)
+
+    g = flo.api.Graph(default_runner=LocalRunner(edge=edge))
+    n1 = g.add(init).init(arg=100)
+    n2 = g.add(flaky).init(inflow=n1['outflow'])
+    g.add(capture).init(inflow=n2['outflow'])
+
+    with pytest.raises(flo.exceptions.GraphExecutionError):
+        g.submit(timeout=30)
+    assert state == list(range(55))
+
+    g.submit(timeout=30, resume=True)
+
+    # the finished node isn't run again and the rest pick up from their
+    # last checkpoint
+    assert calls == [100]
+    assert sorted(set(state)) == list(range(100))
+    assert len(state) < 110
+
+
+@pytest.mark.parametrize('edge', [
+    'InMemoryEdge', 'RedisEdge', 'SharedMemoryEdge', 'SegmentEdge'])
+def test_submit_after_failure(edge, tmpdir, monkeypatch):
+    from flo.engine.runners.local import LocalRunner
+    from flo.engine.edge import local, redis, shm, segment
+
+    monkeypatch.setenv('FLO_SHM_DIR', str(tmpdir.join('shm')))
+    monkeypatch.setenv('FLO_SEGMENT_DIR', str(tmpdir.join('segment')))
+    edge = {
+        'InMemoryEdge': local.InMemoryEdge,
+        'RedisEdge': redis.RedisEdge,
+        'SharedMemoryEdge': shm.SharedMemoryEdge,
+        'SegmentEdge': segment.SegmentEdge,
+    }[edge]
+
+    failed = []
+    state = []
+
+    def init(arg: int, outflow: flo.api.Out[int]):
+        outflow.send_many(range(arg))
+
+    def flaky(inflow: flo.api.In[int], outflow: flo.api.Out[int]):
+        for x in inflow:
+            if x == 55 and not failed:
+                failed.append(x)
+                raise ValueError(x)
+            outflow.send(x)
+
+    def capture(inflow: flo.api.In[int]):
+        state.extend(inflow)
+
+    g = flo.api.Graph(default_runner=LocalRunner(edge=edge))
+    n1 = g.add(init).init(arg=100)
+    n2 = g.add(flaky).init(inflow=n1['outflow'])
+    g.add(capture).init(inflow=n2['outflow'])
+
+    with pytest.raises(flo.exceptions.GraphExecutionError):
+        g.submit(timeout=30)
+    del state[:]
+
+    # without resuming, the streams of the failed submission are discarded
+    g.submit(timeout=30)
+    assert state == list(range(100))
+
+
+def test_pool_reuse():
+    import os
+    from flo.engine.runners.local import LocalRunner
+    from flo.engine.runners.multiproc import ProcessPoolRunner
+    from flo.engine.edge.shm import SharedMemoryEdge
+
+    def pid(arg: int, outflow: flo.api.Out[int]):
+        for _ in range(arg):
+            outflow.send(os.getpid())
+
+    pool = ProcessPoolRunner(edge=SharedMemoryEdge, workers=2)
+
+    try:
+        results = []
+        for _ in range(2):
+            # runners execute every node they've been given
+            pool.nodes = []
+            local = LocalRunner(edge=SharedMemoryEdge)
+
+            state = []
+
+            def capture(inflow: flo.api.In[int]):
+                for i in inflow:
+                    state.append(i)
+
+            g = flo.api.Graph()
+            n1 = g.add(pid).set_runner(pool).init(arg=3)
+            g.add(capture).set_runner(local).init(inflow=n1['outflow'])
+            g.submit(timeout=30)
+
+            assert len(state) == 3
+            results.extend(state)
+
+        # both executions ran on the same warm workers
+        workers = set(x.pid for x in pool._pool)
+        assert set(results) <= workers
+    finally:
+        pool.shutdown()
+
+
+def test_cooperative_chain():
+    cooperative = pytest.importorskip('flo.engine.runners.cooperative')
+
+    def init(arg: int, outflow: flo.api.Out[int]):
+        for i in range(arg):
+            outflow.send(i)
+
+    def passthrough(inflow: flo.api.In[int], outflow: flo.api.Out[int]):
+        for x in inflow:
+            outflow.send(x)
+
+    state = []
+
+    def capture(inflow: flo.api.In[int]):
+        for i in inflow:
+            state.append(i)
+
+    g = flo.api.Graph(default_runner=cooperative.CooperativeRunner(threads=4))
+
+    # far more nodes than could comfortably each have their own thread
+    node = g.add(init).init(arg=10)
+    for _ in range(2000):
+        node = g.add(passthrough).init(inflow=node['outflow'])
+        node['outflow'].configure(max_size=2)
+    g.add(capture).init(inflow=node['outflow'])
+
+    g.submit(timeout=120)
+
+    assert state == list(range(10))
+
+
+def _async_edges():
+    from flo.engine.edge.aio import AsyncInMemoryEdge
+    from flo.engine.edge.redis import AsyncRedisEdge
+    return [AsyncInMemoryEdge, AsyncRedisEdge]
+
+
+@pytest.mark.parametrize('edge', _async_edges())
+def test_asyncio(edge):
+    import asyncio
+    from flo.engine.runners.aio import AsyncioRunner
+
+    async def init(arg: int, outflow: flo.api.Out[int]):
+        for i in range(arg):
+            await outflow.send(i)
+
+    async def double(inflow: flo.api.In[int], outflow: flo.api.Out[int]):
+        async for x in inflow:
+            await asyncio.sleep(0.001)
+            await outflow.send(x * 2)
+
+    state = []
+
+    async def capture(inflow: flo.api.In[int]):
+        async for i in inflow:
+            state.append(i)
+
+    g = flo.api.Graph(default_runner=AsyncioRunner(edge=edge))
+
+    # many concurrent nodes on the one loop
+    doubled = []
+    for _ in range(50):
+        n1 = g.add(init).init(arg=10)
+        n1['outflow'].configure(max_size=3)
+        n2 = g.add(double).init(inflow=n1['outflow'])
+        n2['outflow'].configure(batch_size=4, batch_latency=0.01)
+        doubled.append(n2['outflow'])
+    g.add(capture).init(inflow=doubled)
+
+    g.submit(timeout=30)
+
+    assert sorted(state) == sorted([i * 2 for i in range(10)] * 50)
+
+
+def test_asyncio_local_interop():
+    from flo.engine.edge.aio import AsyncInMemoryEdge
+    from flo.engine.edge.local import InMemoryEdge
+    from flo.engine.runners.aio import AsyncioRunner
+    from flo.engine.runners.local import LocalRunner
+
+    async def init(arg: int, outflow: flo.api.Out[int]):
+        for i in range(arg):
+            await outflow.send(i)
+
+    state = []
+
+    def capture(inflow: flo.api.In[int]):
+        for i in inflow:
+            state.append(i)
+
+    g = flo.api.Graph()
+
+    n1 = g.add(init) \
+        .set_runner(AsyncioRunner(edge=AsyncInMemoryEdge)) \
+        .init(arg=20)
+    n1['outflow'].configure(max_size=2)
+    g.add(capture) \
+        .set_runner(LocalRunner(edge=InMemoryEdge)) \
+        .init(inflow=n1['outflow'])
+
+    g.submit(timeout=30)
+
+    assert state == list(range(20))
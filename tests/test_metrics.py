@@ -0,0 +1,82 @@
+import pytest
+
+import flo.api
+import flo.metrics
+from flo.engine.runners.local import LocalRunner
+from flo.engine.edge.local import InMemoryEdge
+
+
+@pytest.fixture
+def registry():
+    try:
+        yield flo.metrics.enable()
+    finally:
+        flo.metrics.disable()
+
+
+def _graph(count):
+
+    def init(arg: int, outflow: flo.api.Out[int]):
+        for i in range(arg):
+            outflow.send(i)
+
+    def capture(inflow: flo.api.In[int]):
+        for _ in inflow:
+            pass
+
+    g = flo.api.Graph('metrics', default_runner=LocalRunner(InMemoryEdge))
+    n1 = g.add(init, 'init').init(arg=count)
+    n2 = g.add(capture, 'capture').init(inflow=n1['outflow'])
+    return g, n1, n2
+
+
+def test_metrics(registry):
+
+    g, n1, n2 = _graph(250)
+    g.submit(timeout=30)
+
+    outflow = n1['outflow'].id
+    inflow = n2.inports['inflow'].id
+
+    assert registry.get('flo_records_out_total', port=outflow) == 250
+    assert registry.get('flo_records_in_total', port=inflow) == 250
+    assert registry.get('flo_receive_wait_seconds_count', port=inflow) == 2
+    assert registry.get('flo_edge_backlog', port=inflow) is not None
+    for node in (n1, n2):
+        assert registry.get('flo_node_calls_total', node=node.id) == 1
+        assert registry.get('flo_node_seconds_total', node=node.id) > 0
+
+    text = flo.metrics.prometheus(registry)
+    assert '# TYPE flo_records_in_total counter' in text
+    assert '# TYPE flo_receive_wait_seconds summary' in text
+    assert 'flo_records_in_total{{port="{}"}} 250.0'.format(inflow) in text
+
+
+def test_metrics_disabled():
+
+    g, n1, n2 = _graph(10)
+    g.submit(timeout=30)
+
+    # nodes use their edges directly
+    assert isinstance(n1['outflow'].edge, InMemoryEdge)
+    assert isinstance(n2.inports['inflow'].edge, InMemoryEdge)
+
+
+def test_metrics_send_many(registry):
+
+    def init(arg: int, outflow: flo.api.Out[int]):
+        # counted as it's consumed
+        outflow.send_many(i for i in range(arg))
+        outflow.send_many(list(range(arg)))
+
+    def capture(inflow: flo.api.In[int]):
+        for _ in inflow:
+            pass
+
+    g = flo.api.Graph('metrics', default_runner=LocalRunner(InMemoryEdge))
+    n1 = g.add(init, 'init').init(arg=250)
+    g.add(capture, 'capture').init(inflow=n1['outflow'])
+    g.submit(timeout=30)
+
+    assert registry.get(
+        'flo_records_out_total', port=n1['outflow'].id) == 500
@@ -11,3 +11,71 @@ def test_call():
     node = flo.api.Node(fn).init(arg1=1)
     node()
     assert state == [1]
+
+
+def double(inflow: flo.api.In[int], outflow: flo.api.Out[int]):
+    for i in inflow:
+        outflow.send(i * 2)
+
+
+def test_pickle():
+    import pickle
+    from flo.engine.runners.local import LocalRunner
+
+    def chain(count):
+        runner = LocalRunner()
+        nodes = [flo.api.Node(double, 'n0').init(inflow=[])]
+        for i in range(1, count):
+            nodes.append(flo.api.Node(double, 'n{}'.format(i)).init(
+                inflow=nodes[-1]['outflow']))
+        runner.add(*nodes)
+        return nodes
+
+    small, large = chain(2)[-1], chain(50)[-1]
+    payload = pickle.dumps(large)
+    # neither the runner nor any other node is shipped along, the node ids
+    # are just a little longer
+    assert len(payload) - len(pickle.dumps(small)) < 10
+
+    node = pickle.loads(payload)
+    assert node.fn is double
+    assert node.runner is None
+    assert node.initializations['inflow'][0].id == 'n48/outflow'
+
+    # closures fall back to dill
+    state = []
+
+    def fn(arg1: int):
+        state.append(arg1)
+
+    node = pickle.loads(pickle.dumps(flo.api.Node(fn).init(arg1=1)))
+    assert node.fn is not fn
+    node()
+    assert node.initializations == {'arg1': 1}
+
+
+def test_failed_stop():
+    import pytest
+    from flo.engine.edge.local import InMemoryEdge
+
+    class BrokenEdge(InMemoryEdge):
+        stopped = []
+
+        def stop(self, failed=False):
+            self.stopped.append(failed)
+            raise RuntimeError('stop')
+
+    def fn(error: BaseException, outflow: flo.api.Out[int]):
+        raise error
+
+    # the node's own error isn't hidden by the edge's
+    node = flo.api.Node(fn).init(error=ValueError('fn'))
+    with pytest.raises(ValueError, match='fn'):
+        node(edges={'outflow': BrokenEdge('failed')})
+    assert BrokenEdge.stopped == [True]
+
+    # and streams aren't marked as failed when the node is interrupted
+    node = flo.api.Node(fn).init(error=KeyboardInterrupt())
+    with pytest.raises(KeyboardInterrupt):
+        node(edges={'outflow': BrokenEdge('interrupted')})
+    assert BrokenEdge.stopped == [True]
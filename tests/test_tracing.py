@@ -0,0 +1,103 @@
+import json
+
+import pytest
+
+import flo.api
+import flo.tracing
+from flo.engine.runners.local import LocalRunner
+from flo.engine.edge.local import InMemoryEdge
+from flo.engine.edge.redis import RedisEdge
+from flo.engine.edge.shm import SharedMemoryEdge
+
+
+@pytest.fixture
+def tracer(tmp_path):
+    try:
+        yield flo.tracing.enable(rate=1.0, path=str(tmp_path / 'trace'))
+    finally:
+        flo.tracing.disable()
+
+
+def _graph(edge_cls, count):
+
+    def init(arg: int, outflow: flo.api.Out[int]):
+        for i in range(arg):
+            outflow.send(i)
+
+    def double(inflow: flo.api.In[int], outflow: flo.api.Out[int]):
+        for x in inflow:
+            outflow.send(x * 2)
+
+    def capture(inflow: flo.api.In[int]):
+        for _ in inflow:
+            pass
+
+    g = flo.api.Graph('tracing', default_runner=LocalRunner(edge_cls))
+    n1 = g.add(init, 'init').init(arg=count)
+    n2 = g.add(double, 'double').init(inflow=n1['outflow'])
+    n3 = g.add(capture, 'capture').init(inflow=n2['outflow'])
+    return g, n1, n2, n3
+
+
+@pytest.mark.parametrize('edge_cls', [
+    InMemoryEdge, SharedMemoryEdge, RedisEdge])
+def test_tracing(tracer, tmp_path, edge_cls):
+
+    g, n1, n2, n3 = _graph(edge_cls, 5)
+    g.submit(timeout=30)
+
+    filename = str(tmp_path / 'trace.json')
+    tracer.export(filename)
+    with open(filename) as f:
+        events = json.load(f)['traceEvents']
+
+    spans = [x for x in events if x['ph'] == 'X']
+    names = {x['args']['name'] for x in events if x['ph'] == 'M'}
+    assert {n2.id, n3.id, n2.inports['inflow'].id,
+            n3.inports['inflow'].id} <= names
+
+    compute = {}
+    for span in spans:
+        assert span['dur'] >= 0
+        if span['cat'] == 'compute':
+            compute.setdefault(span['args']['trace'], []).append(span['name'])
+    # every record's trace is continued by the records derived from it
+    assert len(compute) == 5
+    assert all(sorted(x) == sorted([n2.id, n3.id]) for x in compute.values())
+    assert sum(x['cat'] == 'queue' for x in spans) == 10
+
+    starts = {x['id'] for x in events if x['ph'] == 's'}
+    ends = {x['id'] for x in events if x['ph'] == 'f'}
+    assert len(starts) == 10 and starts == ends
+
+
+def test_tracing_sampled(tracer):
+    tracer.rate = 0.0
+
+    g, n1, n2, n3 = _graph(InMemoryEdge, 5)
+    g.submit(timeout=30)
+    assert tracer.export()['traceEvents'] == []
+
+
+def test_tracing_batched(tracer):
+
+    def fn(outflow: flo.api.Out[int]):
+        pass
+
+    node = flo.api.Node(fn, 'batched')
+    port = node['outflow']
+    edge = port.edge = InMemoryEdge(port.id, batch_size=10)
+    flo.tracing.instrument(node, {'outflow': port}, tracer)
+
+    port.edge.start()
+    for i in range(3):
+        port.edge.push(i)
+    # traced records are buffered like any other
+    assert len(edge._batch) == 3
+    port.edge.stop()
+
+    consumer = InMemoryEdge(port.id)
+    for i, data in enumerate(consumer):
+        assert data == i
+        assert consumer.key.startswith(flo.tracing.PREFIX)
+    assert i == 2